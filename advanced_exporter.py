@@ -2,14 +2,108 @@
 進階匯出模組 - 支援多種格式匯出
 支援格式：YOLO、COCO、Pascal VOC、JSON
 v2.1.3 更新：提升座標精確度至12位小數點
+v2.2.0 更新：增量匯出，依匯出清單指紋只重寫有變動的標註檔
+v2.3.0 更新：WebDataset 分片匯出（tar 分片 + 索引檔）
+v2.4.0 更新：欄式資料表匯出（NumPy .npz），統計報告改由欄式陣列計算
+v2.5.0 更新：統一標註陣列表示（(N,5) [class_id, x, y, w, h] + ID 陣列），各匯出器直接使用
+v2.6.0 更新：匯出進度回報與取消（供背景匯出工作使用），增量匯出定期保存清單以便續傳
 """
 
 import os
+import io
 import json
+import hashlib
+import tarfile
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+import numpy as np
+
+
+# 增量匯出清單檔名（存放於各格式輸出目錄）
+MANIFEST_FILENAME = '.export_manifest.json'
+MANIFEST_VERSION = 1
+MANIFEST_CHECKPOINT_INTERVAL = 200  # 每處理幾張圖片保存一次清單
+
+# WebDataset 分片設定
+DEFAULT_SHARD_SIZE = 256 * 1024 * 1024  # 每個分片上限 256MB
+SHARD_INDEX_FILENAME = 'index.json'
+TAR_BLOCK_SIZE = 512
+TAR_FORMAT = tarfile.PAX_FORMAT  # PAX：長檔名與 UTF-8 檔名
+
+# 欄式資料表設定
+COLUMNAR_ANNOTATIONS_FILENAME = 'annotations.npz'
+COLUMNAR_IMAGES_FILENAME = 'images.npz'
+ANNOTATION_SOURCES = ['manual', 'ai_prediction']  # source 欄位代碼對應
+
+# 各逐圖格式對應的標註檔副檔名
+PER_IMAGE_FORMAT_EXTENSIONS = {
+    'YOLO': '.txt',
+    'Pascal VOC': '.xml',
+    'JSON': '.json'
+}
+
+
+def _parse_annotation(item: Any, index: int) -> Tuple[float, float, float, float, float, int, float, int]:
+    """解析單筆標註，回傳 (class_id, x, y, w, h, id, confidence, source)"""
+    if 'rect' in item and 'class_id' in item:
+        # annotator.py格式：{'id': int, 'rect': QRect, 'class_id': int, 'class_name': str}
+        qrect = item['rect']
+        class_id, bbox = item['class_id'], (qrect.x(), qrect.y(), qrect.width(), qrect.height())
+    elif 'class' in item and 'bbox' in item:
+        class_id, bbox = item['class'], item['bbox']
+    elif 'class' in item and 'x' in item:
+        # 專案檔格式：{'class', 'x', 'y', 'width', 'height'}
+        class_id, bbox = item['class'], (item['x'], item['y'], item['width'], item['height'])
+    else:
+        raise ValueError(f"無法辨識的標註格式: {item}")
+    
+    confidence = item.get('confidence')
+    source = item.get('source', 'manual')
+    return (
+        class_id, bbox[0], bbox[1], bbox[2], bbox[3],
+        item.get('id', index + 1),
+        np.nan if confidence is None else confidence,
+        ANNOTATION_SOURCES.index(source) if source in ANNOTATION_SOURCES else 0
+    )
+
+
+def build_export_image_data(image_path: str, annotations: List) -> Optional[Dict]:
+    """
+    將一張圖片的標註轉為匯出用的統一陣列表示，無有效標註時回傳 None
+    
+    回傳 {'path', 'annotations': (N,5) float64 [class_id, x, y, w, h],
+          'ids': (N,) int32, 'confidence': (N,) float32（未知為 NaN）, 'source': (N,) uint8}
+    """
+    rows = []
+    for index, item in enumerate(annotations):
+        if not hasattr(item, 'get'):
+            continue
+        try:
+            rows.append(_parse_annotation(item, index))
+        except ValueError:
+            continue
+    if not rows:
+        return None
+    
+    columns = np.array(rows, dtype=np.float64)
+    return {
+        'path': image_path,
+        'annotations': np.ascontiguousarray(columns[:, :5]),
+        'ids': columns[:, 5].astype(np.int32),
+        'confidence': columns[:, 6].astype(np.float32),
+        'source': columns[:, 7].astype(np.uint8)
+    }
+
+
+def as_box_array(annotations: Any) -> np.ndarray:
+    """取得 (N,5) 標註陣列；已是陣列時直接回傳，舊的字典清單則轉換一次"""
+    if isinstance(annotations, np.ndarray):
+        return annotations.reshape(-1, 5)
+    image_data = build_export_image_data('', annotations)
+    return image_data['annotations'] if image_data else np.empty((0, 5), dtype=np.float64)
 
 
 class AdvancedExporter:
@@ -27,34 +121,38 @@ class AdvancedExporter:
             7: {'zh': '跑車', 'en': 'sports_car'}
         }
         
-    def export_yolo(self, image_path: str, annotations: List, output_dir: str) -> bool:
+    def build_yolo_label(self, annotations: Any, img_width: int, img_height: int) -> str:
+        """產生YOLO標註文字內容"""
+        boxes = as_box_array(annotations)
+        
+        # 整張圖片一次向量化轉換為YOLO格式（中心點座標，相對尺寸）
+        normalized = np.empty((len(boxes), 4), dtype=np.float64)
+        normalized[:, 0:2] = boxes[:, 1:3] + boxes[:, 3:5] / 2
+        normalized[:, 2:4] = boxes[:, 3:5]
+        normalized /= np.array([img_width, img_height, img_width, img_height], dtype=np.float64)
+        
+        return ''.join(
+            f"{class_id} {center_x:.12f} {center_y:.12f} {width:.12f} {height:.12f}\n"
+            for class_id, (center_x, center_y, width, height)
+            in zip(boxes[:, 0].astype(np.int64).tolist(), normalized.tolist())
+        )
+    
+    def export_yolo(self, image_path: str, annotations: List, output_dir: str,
+                    image_size: Optional[Tuple[int, int]] = None) -> bool:
         """匯出YOLO格式"""
         try:
-            from PIL import Image
-            
             # 確保輸出目錄存在
             os.makedirs(output_dir, exist_ok=True)
             
             # 取得圖片尺寸
-            img = Image.open(image_path)
-            img_width, img_height = img.size
+            img_width, img_height = image_size or self._read_image_size(image_path)
             
             # 建立輸出檔案路徑
             base_name = os.path.splitext(os.path.basename(image_path))[0]
             output_path = os.path.join(output_dir, f"{base_name}.txt")
             
             with open(output_path, 'w', encoding='utf-8') as f:
-                for rect in annotations:
-                    class_id = rect['class']
-                    x, y, w, h = rect['bbox']
-                    
-                    # 轉換為YOLO格式（中心點座標，相對尺寸）
-                    center_x = (x + w / 2) / img_width
-                    center_y = (y + h / 2) / img_height
-                    width = w / img_width
-                    height = h / img_height
-                    
-                    f.write(f"{class_id} {center_x:.12f} {center_y:.12f} {width:.12f} {height:.12f}\n")
+                f.write(self.build_yolo_label(annotations, img_width, img_height))
                     
             return True
         except Exception as e:
@@ -97,14 +195,11 @@ class AdvancedExporter:
             
             # 處理每張圖片
             for img_id, img_data in enumerate(images_data, 1):
-                from PIL import Image
-                
                 image_path = img_data['path']
                 annotations = img_data['annotations']
                 
                 # 取得圖片資訊
-                img = Image.open(image_path)
-                img_width, img_height = img.size
+                img_width, img_height = self._read_image_size(image_path)
                 
                 # 添加圖片資訊
                 coco_format["images"].append({
@@ -115,9 +210,8 @@ class AdvancedExporter:
                 })
                 
                 # 添加標註
-                for rect in annotations:
-                    class_id = rect['class']
-                    x, y, w, h = rect['bbox']
+                for class_id, x, y, w, h in as_box_array(annotations).tolist():
+                    class_id = int(class_id)
                     
                     coco_format["annotations"].append({
                         "id": annotation_id,
@@ -139,14 +233,12 @@ class AdvancedExporter:
             print(f"COCO匯出錯誤: {e}")
             return False
     
-    def export_pascal_voc(self, image_path: str, annotations: List, output_dir: str) -> bool:
+    def export_pascal_voc(self, image_path: str, annotations: List, output_dir: str,
+                          image_size: Optional[Tuple[int, int]] = None) -> bool:
         """匯出Pascal VOC格式"""
         try:
-            from PIL import Image
-            
             # 取得圖片資訊
-            img = Image.open(image_path)
-            img_width, img_height = img.size
+            img_width, img_height = image_size or self._read_image_size(image_path)
             img_depth = 3  # RGB
             
             # 建立XML結構
@@ -176,11 +268,11 @@ class AdvancedExporter:
             ET.SubElement(annotation, "segmented").text = "0"
             
             # 物件
-            for rect in annotations:
+            for class_id, x, y, w, h in as_box_array(annotations).tolist():
                 obj = ET.SubElement(annotation, "object")
                 
                 # 類別名稱
-                class_id = rect['class']
+                class_id = int(class_id)
                 class_name = self.vehicle_classes[class_id]['en']
                 ET.SubElement(obj, "name").text = class_name
                 
@@ -191,7 +283,6 @@ class AdvancedExporter:
                 
                 # 邊界框
                 bbox = ET.SubElement(obj, "bndbox")
-                x, y, w, h = rect['bbox']
                 ET.SubElement(bbox, "xmin").text = str(int(x))
                 ET.SubElement(bbox, "ymin").text = str(int(y))
                 ET.SubElement(bbox, "xmax").text = str(int(x + w))
@@ -218,58 +309,61 @@ class AdvancedExporter:
             print(f"Pascal VOC匯出錯誤: {e}")
             return False
     
-    def export_json(self, image_path: str, annotations: List, output_dir: str) -> bool:
-        """匯出JSON格式"""
-        try:
-            from PIL import Image
+    def build_json_label(self, image_path: str, annotations: List, img_width: int, img_height: int) -> Dict:
+        """產生自訂JSON標註資料"""
+        json_data = {
+            "image": {
+                "file_name": os.path.basename(image_path),
+                "width": img_width,
+                "height": img_height,
+                "path": image_path
+            },
+            "annotations": [],
+            "metadata": {
+                "created_date": datetime.now().isoformat(),
+                "created_by": "YOLO Annotator",
+                "format_version": "1.0"
+            }
+        }
+        
+        # 添加標註
+        for idx, (class_id, x, y, w, h) in enumerate(as_box_array(annotations).tolist()):
+            class_id = int(class_id)
             
-            # 取得圖片資訊
-            img = Image.open(image_path)
-            img_width, img_height = img.size
+            # 計算精確的中心點座標（保持高精確度）
+            center_x = round(x + w / 2, 12)
+            center_y = round(y + h / 2, 12)
             
-            # 建立JSON結構
-            json_data = {
-                "image": {
-                    "file_name": os.path.basename(image_path),
-                    "width": img_width,
-                    "height": img_height,
-                    "path": image_path
+            annotation_data = {
+                "id": idx + 1,
+                "class_id": class_id,
+                "class_name_zh": self.vehicle_classes[class_id]['zh'],
+                "class_name_en": self.vehicle_classes[class_id]['en'],
+                "bbox": {
+                    "x": round(x, 12),
+                    "y": round(y, 12),
+                    "width": round(w, 12),
+                    "height": round(h, 12)
                 },
-                "annotations": [],
-                "metadata": {
-                    "created_date": datetime.now().isoformat(),
-                    "created_by": "YOLO Annotator",
-                    "format_version": "1.0"
+                "area": round(w * h, 12),
+                "center": {
+                    "x": center_x,
+                    "y": center_y
                 }
             }
+            json_data["annotations"].append(annotation_data)
+        
+        return json_data
+    
+    def export_json(self, image_path: str, annotations: List, output_dir: str,
+                    image_size: Optional[Tuple[int, int]] = None) -> bool:
+        """匯出JSON格式"""
+        try:
+            # 取得圖片資訊
+            img_width, img_height = image_size or self._read_image_size(image_path)
             
-            # 添加標註
-            for idx, rect in enumerate(annotations):
-                class_id = rect['class']
-                x, y, w, h = rect['bbox']
-                
-                # 計算精確的中心點座標（保持高精確度）
-                center_x = round(x + w / 2, 12)
-                center_y = round(y + h / 2, 12)
-                
-                annotation_data = {
-                    "id": idx + 1,
-                    "class_id": class_id,
-                    "class_name_zh": self.vehicle_classes[class_id]['zh'],
-                    "class_name_en": self.vehicle_classes[class_id]['en'],
-                    "bbox": {
-                        "x": round(x, 12),
-                        "y": round(y, 12),
-                        "width": round(w, 12),
-                        "height": round(h, 12)
-                    },
-                    "area": round(w * h, 12),
-                    "center": {
-                        "x": center_x,
-                        "y": center_y
-                    }
-                }
-                json_data["annotations"].append(annotation_data)
+            # 建立JSON結構
+            json_data = self.build_json_label(image_path, annotations, img_width, img_height)
             
             # 儲存JSON檔案
             base_name = os.path.splitext(os.path.basename(image_path))[0]
@@ -283,6 +377,269 @@ class AdvancedExporter:
             print(f"JSON匯出錯誤: {e}")
             return False
     
+    def _split_for_path(self, image_path: str, val_ratio: float) -> str:
+        """依路徑雜湊決定訓練/驗證分組（同一路徑每次結果相同）"""
+        if val_ratio <= 0:
+            return 'train'
+        bucket = int(hashlib.sha1(image_path.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return 'val' if bucket < val_ratio else 'train'
+    
+    @staticmethod
+    def _tar_member(name: str, data: bytes, mtime: float) -> Tuple[tarfile.TarInfo, bytes, int]:
+        """
+        建立記憶體中位元組資料的 tar 成員，回傳 (檔頭, 資料, 在分片中佔用的位元組數)
+        
+        佔用大小以實際編碼的檔頭計算（含長檔名或 UTF-8 檔名所需的 PAX 延伸檔頭）並對齊區塊；
+        檔頭無法編碼時在此拋出例外，尚未寫入分片。
+        """
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(mtime)
+        header = info.tobuf(TAR_FORMAT, tarfile.ENCODING, 'surrogateescape')
+        return info, data, len(header) + -(-len(data) // TAR_BLOCK_SIZE) * TAR_BLOCK_SIZE
+    
+    def export_webdataset(self, images_data: List[Dict], output_dir: str,
+                          max_shard_size: int = DEFAULT_SHARD_SIZE, val_ratio: float = 0.0,
+                          progress_callback: Optional[Callable[[int, int], None]] = None,
+                          cancel_check: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        匯出 WebDataset 分片格式
+        
+        每個樣本以相同鍵值將圖片原始位元組、YOLO 標註（.txt）與 JSON 標註（.json）
+        逐一寫入大小受限的 tar 分片，不產生中間檔案，並輸出 index.json 索引。
+        val_ratio > 0 時依路徑雜湊切分 train/val，各自獨立編號分片。
+        cancel_check 回傳 True 時中止（已寫入的分片保留並列入索引）。
+        回傳 {'samples', 'shards', 'splits', 'errors', 'cancelled'} 統計。
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        
+        stats = {'samples': 0, 'shards': 0, 'splits': {}, 'errors': [], 'cancelled': False}
+        index = {
+            'format': 'webdataset',
+            'version': 1,
+            'created_date': datetime.now().isoformat(),
+            'max_shard_size': max_shard_size,
+            'val_ratio': val_ratio,
+            'classes': {str(class_id): info['en'] for class_id, info in sorted(self.vehicle_classes.items())},
+            'shards': [],
+            'samples': []
+        }
+        
+        # 移除上次匯出的舊分片，避免殘留未列入索引的分片
+        for filename in os.listdir(output_dir):
+            if filename.endswith('.tar') and filename.split('-')[0] in ('train', 'val'):
+                try:
+                    os.remove(os.path.join(output_dir, filename))
+                except OSError as e:
+                    print(f"移除舊分片錯誤: {filename}, {e}")
+        
+        # 每個分組各自維護目前開啟的分片
+        writers = {}
+        
+        def close_shard(split):
+            writer = writers.pop(split, None)
+            if writer is None:
+                return
+            writer['tar'].close()
+            os.replace(writer['tmp_path'], writer['path'])
+            index['shards'].append({
+                'name': os.path.basename(writer['path']),
+                'split': split,
+                'samples': writer['samples'],
+                'bytes': os.path.getsize(writer['path'])
+            })
+            stats['shards'] += 1
+        
+        def open_shard(split, shard_number):
+            shard_name = f"{split}-{shard_number:06d}.tar"
+            shard_path = os.path.join(output_dir, shard_name)
+            tmp_path = shard_path + '.tmp'
+            writers[split] = {
+                'tar': tarfile.open(tmp_path, 'w', format=TAR_FORMAT),
+                'path': shard_path,
+                'tmp_path': tmp_path,
+                'number': shard_number,
+                'size': 0,
+                'samples': 0
+            }
+            return writers[split]
+        
+        try:
+            for sample_index, img_data in enumerate(images_data):
+                if cancel_check and cancel_check():
+                    stats['cancelled'] = True
+                    break
+                
+                image_path = img_data['path']
+                annotations = img_data['annotations']
+                
+                try:
+                    img_width, img_height = self._read_image_size(image_path)
+                    image_stat = os.stat(image_path)
+                    
+                    yolo_bytes = self.build_yolo_label(annotations, img_width, img_height).encode('utf-8')
+                    json_bytes = json.dumps(
+                        self.build_json_label(image_path, annotations, img_width, img_height),
+                        ensure_ascii=False
+                    ).encode('utf-8')
+                    
+                    # WebDataset 鍵值不可包含句點
+                    stem = os.path.splitext(os.path.basename(image_path))[0].replace('.', '_')
+                    key = f"{sample_index:08d}_{stem}"
+                    image_ext = os.path.splitext(image_path)[1].lower().lstrip('.') or 'jpg'
+                    
+                    # 先讀入圖片並編碼所有成員的檔頭，任一步驟失敗時分片不受影響（樣本全部寫入或全部不寫入）
+                    with open(image_path, 'rb') as f:
+                        image_bytes = f.read()
+                    members = [
+                        self._tar_member(f"{key}.{image_ext}", image_bytes, image_stat.st_mtime),
+                        self._tar_member(f"{key}.txt", yolo_bytes, image_stat.st_mtime),
+                        self._tar_member(f"{key}.json", json_bytes, image_stat.st_mtime),
+                    ]
+                    sample_size = sum(size for _, _, size in members)
+                    
+                    split = self._split_for_path(image_path, val_ratio)
+                    writer = writers.get(split)
+                    if writer is None:
+                        next_number = stats['splits'].get(split, {}).get('shards', 0)
+                        writer = open_shard(split, next_number)
+                    elif writer['samples'] and writer['size'] + sample_size > max_shard_size:
+                        next_number = writer['number'] + 1
+                        close_shard(split)
+                        writer = open_shard(split, next_number)
+                    
+                    split_stats = stats['splits'].setdefault(split, {'samples': 0, 'shards': 0})
+                    split_stats['shards'] = writer['number'] + 1
+                    
+                    for info, data, _ in members:
+                        writer['tar'].addfile(info, io.BytesIO(data))
+                    
+                    writer['size'] += sample_size
+                    writer['samples'] += 1
+                    split_stats['samples'] += 1
+                    stats['samples'] += 1
+                    
+                    index['samples'].append({
+                        'key': key,
+                        'split': split,
+                        'shard': os.path.basename(writer['path']),
+                        'image': os.path.basename(image_path),
+                        'width': img_width,
+                        'height': img_height,
+                        'annotations': len(annotations)
+                    })
+                except Exception as e:
+                    error_msg = f"{image_path}: {e}"
+                    print(f"WebDataset匯出錯誤: {error_msg}")
+                    stats['errors'].append(error_msg)
+                
+                if progress_callback:
+                    progress_callback(sample_index + 1, len(images_data))
+        finally:
+            for split in list(writers.keys()):
+                close_shard(split)
+        
+        index['splits'] = stats['splits']
+        index_path = os.path.join(output_dir, SHARD_INDEX_FILENAME)
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        
+        return stats
+    
+    def _image_arrays(self, img_data: Dict) -> Dict:
+        """取得圖片資料的統一陣列表示（舊的字典清單會即時轉換）"""
+        if isinstance(img_data['annotations'], np.ndarray) and 'confidence' in img_data:
+            return img_data
+        return build_export_image_data(img_data['path'], img_data['annotations']) or {
+            'path': img_data['path'],
+            'annotations': np.empty((0, 5), dtype=np.float64),
+            'ids': np.empty(0, dtype=np.int32),
+            'confidence': np.empty(0, dtype=np.float32),
+            'source': np.empty(0, dtype=np.uint8)
+        }
+    
+    def build_annotation_table(self, images_data: List[Dict],
+                               read_image_sizes: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """
+        將標註轉為欄式資料表（連續型別陣列），回傳 (標註表, 圖片表)
+        
+        標註表：image_id, annotation_id, class_id, x, y, w, h, confidence, source
+        圖片表：image_id, path, file_name, width, height, annotation_count
+        未知信心值為 NaN，source 為 ANNOTATION_SOURCES 的索引。
+        read_image_sizes 為 False 時不讀取圖片檔頭，寬高填 0。
+        """
+        arrays = [self._image_arrays(img_data) for img_data in images_data]
+        counts = np.fromiter((len(item['annotations']) for item in arrays),
+                             dtype=np.int32, count=len(arrays))
+        
+        if arrays:
+            boxes = np.concatenate([item['annotations'] for item in arrays]).astype(np.float32)
+            ids = np.concatenate([item['ids'] for item in arrays]).astype(np.int32)
+            confidence = np.concatenate([item['confidence'] for item in arrays]).astype(np.float32)
+            source = np.concatenate([item['source'] for item in arrays]).astype(np.uint8)
+        else:
+            boxes = np.empty((0, 5), dtype=np.float32)
+            ids = np.empty(0, dtype=np.int32)
+            confidence = np.empty(0, dtype=np.float32)
+            source = np.empty(0, dtype=np.uint8)
+        
+        widths = np.zeros(len(images_data), dtype=np.int32)
+        heights = np.zeros(len(images_data), dtype=np.int32)
+        if read_image_sizes:
+            for index, img_data in enumerate(images_data):
+                widths[index], heights[index] = self._read_image_size(img_data['path'])
+        
+        paths = [img_data['path'] for img_data in images_data]
+        annotation_table = {
+            'image_id': np.repeat(np.arange(len(images_data), dtype=np.int32), counts),
+            'annotation_id': ids,
+            'class_id': boxes[:, 0].astype(np.int32),
+            'x': np.ascontiguousarray(boxes[:, 1]),
+            'y': np.ascontiguousarray(boxes[:, 2]),
+            'w': np.ascontiguousarray(boxes[:, 3]),
+            'h': np.ascontiguousarray(boxes[:, 4]),
+            'confidence': confidence,
+            'source': source
+        }
+        image_table = {
+            'image_id': np.arange(len(images_data), dtype=np.int32),
+            'path': np.array(paths, dtype=str),
+            'file_name': np.array([os.path.basename(path) for path in paths], dtype=str),
+            'width': widths,
+            'height': heights,
+            'annotation_count': counts
+        }
+        return annotation_table, image_table
+    
+    def export_columnar(self, images_data: List[Dict], output_dir: str,
+                        tables: Optional[Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]] = None) -> bool:
+        """匯出欄式資料表（annotations.npz 標註表 + images.npz 圖片表）"""
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            
+            if tables is None:
+                tables = self.build_annotation_table(images_data, read_image_sizes=True)
+            annotation_table, image_table = tables
+            
+            # 不壓縮，讀取時可直接取得連續陣列
+            np.savez(os.path.join(output_dir, COLUMNAR_ANNOTATIONS_FILENAME),
+                     source_names=np.array(ANNOTATION_SOURCES, dtype=str), **annotation_table)
+            np.savez(os.path.join(output_dir, COLUMNAR_IMAGES_FILENAME), **image_table)
+            
+            return True
+        except Exception as e:
+            print(f"欄式資料表匯出錯誤: {e}")
+            return False
+    
+    @staticmethod
+    def load_columnar(output_dir: str) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """載入欄式資料表，回傳 (標註表, 圖片表)"""
+        with np.load(os.path.join(output_dir, COLUMNAR_ANNOTATIONS_FILENAME)) as data:
+            annotations = {key: data[key] for key in data.files}
+        with np.load(os.path.join(output_dir, COLUMNAR_IMAGES_FILENAME)) as data:
+            images = {key: data[key] for key in data.files}
+        return annotations, images
+    
     def export_classes_file(self, output_dir: str, language: str = 'both') -> bool:
         """匯出類別檔案"""
         try:
@@ -308,8 +665,202 @@ class AdvancedExporter:
             print(f"類別檔案匯出錯誤: {e}")
             return False
     
-    def generate_export_report(self, export_results: Dict, output_dir: str) -> bool:
-        """生成匯出統計報告"""
+    def _read_image_size(self, image_path: str) -> Tuple[int, int]:
+        """讀取圖片尺寸（只解析檔頭，不解碼像素）"""
+        from PIL import Image
+        
+        with Image.open(image_path) as img:
+            return img.size
+    
+    def _class_table_fingerprint(self) -> str:
+        """計算類別表指紋，類別變動時所有標註檔需重寫"""
+        payload = json.dumps(
+            sorted((class_id, info['zh'], info['en']) for class_id, info in self.vehicle_classes.items()),
+            ensure_ascii=False
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def annotation_fingerprint(self, annotations: Any, image_size: Tuple[int, int]) -> str:
+        """計算單張圖片標註指紋（標註內容 + 圖片尺寸）"""
+        digest = hashlib.sha1(np.asarray(image_size, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(as_box_array(annotations), dtype=np.float64).tobytes())
+        return digest.hexdigest()
+    
+    def load_export_manifest(self, output_dir: str) -> Dict:
+        """載入匯出清單，不存在或版本不符時回傳空清單"""
+        manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        try:
+            if os.path.exists(manifest_path):
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == MANIFEST_VERSION:
+                    return manifest
+        except Exception as e:
+            print(f"載入匯出清單錯誤: {e}")
+        return {'version': MANIFEST_VERSION, 'format': None, 'class_table': None, 'images': {}}
+    
+    def save_export_manifest(self, manifest: Dict, output_dir: str) -> bool:
+        """保存匯出清單（先寫暫存檔再取代，避免中斷時損毀）"""
+        manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+        try:
+            tmp_path = manifest_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, manifest_path)
+            return True
+        except Exception as e:
+            print(f"保存匯出清單錯誤: {e}")
+            return False
+    
+    def _get_image_size_cached(self, image_path: str, entry: Optional[Dict]) -> Tuple[int, int, float, int]:
+        """取得圖片尺寸，檔案未變動時沿用清單中的紀錄"""
+        stat = os.stat(image_path)
+        if (entry and entry.get('mtime') == stat.st_mtime and
+                entry.get('file_size') == stat.st_size and 'width' in entry):
+            return entry['width'], entry['height'], stat.st_mtime, stat.st_size
+        width, height = self._read_image_size(image_path)
+        return width, height, stat.st_mtime, stat.st_size
+    
+    def incremental_export(self, images_data: List[Dict], output_dir: str, fmt: str = 'YOLO',
+                           progress_callback: Optional[Callable[[int, int], None]] = None,
+                           scope_paths: Optional[List[str]] = None,
+                           cancel_check: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        增量匯出逐圖格式（YOLO / Pascal VOC / JSON）
+        
+        只重寫標註、類別表或圖片尺寸有變動的標註檔，並刪除孤立標註檔：
+        圖片檔已不存在，或圖片屬於本次匯出範圍 scope_paths 但已無標註。
+        範圍外且仍存在的圖片紀錄會原樣保留。
+        cancel_check 回傳 True 時中止，已完成的圖片記入清單，再次匯出即從中斷處續傳。
+        回傳 {'written', 'skipped', 'deleted', 'failed', 'total', 'cancelled'} 統計。
+        """
+        if fmt not in PER_IMAGE_FORMAT_EXTENSIONS:
+            raise ValueError(f"不支援增量匯出的格式: {fmt}")
+        
+        export_funcs = {
+            'YOLO': self.export_yolo,
+            'Pascal VOC': self.export_pascal_voc,
+            'JSON': self.export_json
+        }
+        export_func = export_funcs[fmt]
+        extension = PER_IMAGE_FORMAT_EXTENSIONS[fmt]
+        
+        os.makedirs(output_dir, exist_ok=True)
+        manifest = self.load_export_manifest(output_dir)
+        old_entries = manifest.get('images', {})
+        
+        # 類別表或格式變動時，舊指紋全部失效
+        class_table = self._class_table_fingerprint()
+        if manifest.get('class_table') != class_table or manifest.get('format') != fmt:
+            old_entries = {path: dict(entry, fingerprint=None) for path, entry in old_entries.items()}
+        
+        stats = {'written': 0, 'skipped': 0, 'deleted': 0, 'failed': 0,
+                 'total': len(images_data), 'cancelled': False}
+        new_entries = {}
+        
+        def save_checkpoint():
+            # 未處理的舊紀錄原樣保留，中斷後可續傳
+            checkpoint_entries = dict(old_entries)
+            checkpoint_entries.update(new_entries)
+            manifest.update({
+                'version': MANIFEST_VERSION,
+                'format': fmt,
+                'class_table': class_table,
+                'updated': datetime.now().isoformat(),
+                'images': checkpoint_entries
+            })
+            self.save_export_manifest(manifest, output_dir)
+        
+        for index, img_data in enumerate(images_data):
+            if cancel_check and cancel_check():
+                stats['cancelled'] = True
+                break
+            
+            image_path = img_data['path']
+            annotations = img_data['annotations']
+            entry = old_entries.get(image_path)
+            
+            try:
+                width, height, mtime, file_size = self._get_image_size_cached(image_path, entry)
+                fingerprint = self.annotation_fingerprint(annotations, (width, height))
+                
+                base_name = os.path.splitext(os.path.basename(image_path))[0]
+                label_file = f"{base_name}{extension}"
+                label_path = os.path.join(output_dir, label_file)
+                
+                if (entry and entry.get('fingerprint') == fingerprint and
+                        entry.get('label_file') == label_file and os.path.exists(label_path)):
+                    stats['skipped'] += 1
+                    new_entries[image_path] = entry
+                elif export_func(image_path, annotations, output_dir, image_size=(width, height)):
+                    stats['written'] += 1
+                    new_entries[image_path] = {
+                        'label_file': label_file,
+                        'fingerprint': fingerprint,
+                        'width': width,
+                        'height': height,
+                        'mtime': mtime,
+                        'file_size': file_size
+                    }
+                else:
+                    stats['failed'] += 1
+                    self._keep_failed_entry(new_entries, image_path, entry)
+            except Exception as e:
+                print(f"增量匯出 {image_path} 錯誤: {e}")
+                stats['failed'] += 1
+                self._keep_failed_entry(new_entries, image_path, entry)
+            
+            if progress_callback:
+                progress_callback(index + 1, len(images_data))
+            if (index + 1) % MANIFEST_CHECKPOINT_INTERVAL == 0:
+                save_checkpoint()
+        
+        if stats['cancelled']:
+            save_checkpoint()
+            return stats
+        
+        # 範圍外且圖片仍存在的紀錄原樣保留
+        scope = set(scope_paths) if scope_paths is not None else set()
+        for image_path, entry in old_entries.items():
+            if image_path not in new_entries and image_path not in scope and os.path.exists(image_path):
+                new_entries[image_path] = entry
+        
+        # 刪除孤立的標註檔（圖片已移除或已無標註；匯出失敗的圖片已保留舊紀錄，不會被刪除）
+        live_label_files = {entry['label_file'] for entry in new_entries.values()}
+        for image_path, entry in old_entries.items():
+            if image_path in new_entries:
+                continue
+            label_file = entry.get('label_file')
+            if not label_file or label_file in live_label_files:
+                continue
+            label_path = os.path.join(output_dir, label_file)
+            try:
+                if os.path.exists(label_path):
+                    os.remove(label_path)
+                    stats['deleted'] += 1
+            except Exception as e:
+                print(f"刪除孤立標註檔錯誤: {label_path}, {e}")
+        
+        manifest.update({
+            'version': MANIFEST_VERSION,
+            'format': fmt,
+            'class_table': class_table,
+            'updated': datetime.now().isoformat(),
+            'images': new_entries
+        })
+        self.save_export_manifest(manifest, output_dir)
+        
+        return stats
+    
+    @staticmethod
+    def _keep_failed_entry(new_entries: Dict, image_path: str, entry: Optional[Dict]):
+        """匯出失敗時保留舊紀錄（指紋清除，下次重新匯出），避免仍有效的標註檔被當成孤立檔刪除"""
+        if entry:
+            new_entries[image_path] = dict(entry, fingerprint=None)
+    
+    def generate_export_report(self, export_results: Dict, output_dir: str,
+                               table: Optional[Dict[str, np.ndarray]] = None) -> bool:
+        """生成匯出統計報告（提供欄式標註表時，類別與框尺寸統計直接由陣列計算）"""
         try:
             report = {
                 "export_summary": {
@@ -325,7 +876,24 @@ class AdvancedExporter:
             }
             
             # 統計各類別數量
-            class_counts = export_results.get('class_counts', {})
+            if table is not None:
+                class_ids, counts = np.unique(table['class_id'], return_counts=True)
+                class_counts = dict(zip(class_ids.tolist(), counts.tolist()))
+                
+                # 標註框尺寸分布
+                if table['w'].size:
+                    report["box_statistics"] = {
+                        column: {
+                            "mean": float(values.mean()),
+                            "median": float(np.median(values)),
+                            "min": float(values.min()),
+                            "max": float(values.max())
+                        }
+                        for column, values in (('width', table['w']), ('height', table['h']),
+                                               ('area', table['w'] * table['h']))
+                    }
+            else:
+                class_counts = export_results.get('class_counts', {})
             for class_id, count in class_counts.items():
                 class_info = self.vehicle_classes.get(class_id, {'zh': '未知', 'en': 'unknown'})
                 report["class_statistics"][f"class_{class_id}"] = {
@@ -344,17 +912,38 @@ class AdvancedExporter:
             print(f"報告生成錯誤: {e}")
             return False
     
-    def batch_export(self, images_data: List[Dict], output_dir: str, formats: List[str]) -> Dict:
-        """批次匯出多種格式"""
+    def batch_export(self, images_data: List[Dict], output_dir: str, formats: List[str],
+                     incremental: bool = True, scope_paths: Optional[List[str]] = None,
+                     export_options: Optional[Dict] = None,
+                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                     cancel_check: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        批次匯出多種格式（逐圖格式預設使用增量匯出，scope_paths 見 incremental_export）
+        
+        export_options 可指定 WebDataset 的 'max_shard_size'（位元組）與 'val_ratio'。
+        progress_callback(current, total) 回報所有格式合計的進度（每格式 len(images_data) 步）；
+        cancel_check 回傳 True 時停止匯出，results['cancelled'] 為 True。
+        """
+        export_options = export_options or {}
         results = {
             'total_images': len(images_data),
             'total_annotations': 0,
             'formats': formats,
             'format_results': {},
             'class_counts': {},
-            'errors': []
+            'errors': [],
+            'cancelled': False
         }
         
+        steps_per_format = len(images_data)
+        total_steps = steps_per_format * len(formats)
+        
+        def format_progress(format_index):
+            if not progress_callback:
+                return None
+            offset = format_index * steps_per_format
+            return lambda current, total: progress_callback(offset + current, total_steps)
+        
         # 確保輸出目錄存在
         os.makedirs(output_dir, exist_ok=True)
         
@@ -365,43 +954,80 @@ class AdvancedExporter:
             os.makedirs(fmt_dir, exist_ok=True)
             format_dirs[fmt] = fmt_dir
         
-        # 統計標註數量和類別
-        for img_data in images_data:
-            annotations = img_data['annotations']
-            results['total_annotations'] += len(annotations)
-            
-            for ann in annotations:
-                class_id = ann['class']
-                results['class_counts'][class_id] = results['class_counts'].get(class_id, 0) + 1
+        # 統計標註數量和類別（欄式陣列一次計算）
+        tables = self.build_annotation_table(images_data, read_image_sizes='Columnar' in formats)
+        table = tables[0]
+        results['total_annotations'] = int(table['class_id'].size)
+        class_ids, counts = np.unique(table['class_id'], return_counts=True)
+        results['class_counts'] = dict(zip(class_ids.tolist(), counts.tolist()))
         
         # 匯出各種格式
-        for fmt in formats:
+        incremental_stats = {}
+        shard_counts = {}
+        for format_index, fmt in enumerate(formats):
+            if cancel_check and cancel_check():
+                results['cancelled'] = True
+                break
+            
             success_count = 0
             fmt_dir = format_dirs[fmt]
+            on_progress = format_progress(format_index)
             
             try:
-                if fmt == 'YOLO':
-                    for img_data in images_data:
-                        if self.export_yolo(img_data['path'], img_data['annotations'], fmt_dir):
-                            success_count += 1
+                if fmt in PER_IMAGE_FORMAT_EXTENSIONS:
+                    if incremental:
+                        stats = self.incremental_export(images_data, fmt_dir, fmt,
+                                                        progress_callback=on_progress,
+                                                        scope_paths=scope_paths,
+                                                        cancel_check=cancel_check)
+                        success_count = stats['written'] + stats['skipped']
+                        incremental_stats[fmt] = stats
+                        if stats['cancelled']:
+                            results['cancelled'] = True
+                    else:
+                        export_func = {
+                            'YOLO': self.export_yolo,
+                            'Pascal VOC': self.export_pascal_voc,
+                            'JSON': self.export_json
+                        }[fmt]
+                        for index, img_data in enumerate(images_data):
+                            if cancel_check and cancel_check():
+                                results['cancelled'] = True
+                                break
+                            if export_func(img_data['path'], img_data['annotations'], fmt_dir):
+                                success_count += 1
+                            if on_progress:
+                                on_progress(index + 1, steps_per_format)
                     # 匯出類別檔案
                     self.export_classes_file(fmt_dir)
                     
                 elif fmt == 'COCO':
                     if self.export_coco(images_data, fmt_dir):
                         success_count = len(images_data)
-                    
-                elif fmt == 'Pascal VOC':
-                    for img_data in images_data:
-                        if self.export_pascal_voc(img_data['path'], img_data['annotations'], fmt_dir):
-                            success_count += 1
+                    if on_progress:
+                        on_progress(steps_per_format, steps_per_format)
+                
+                elif fmt == 'Columnar':
+                    if self.export_columnar(images_data, fmt_dir, tables=tables):
+                        success_count = len(images_data)
+                    if on_progress:
+                        on_progress(steps_per_format, steps_per_format)
                     # 匯出類別檔案
                     self.export_classes_file(fmt_dir)
-                    
-                elif fmt == 'JSON':
-                    for img_data in images_data:
-                        if self.export_json(img_data['path'], img_data['annotations'], fmt_dir):
-                            success_count += 1
+                
+                elif fmt == 'WebDataset':
+                    shard_stats = self.export_webdataset(
+                        images_data, fmt_dir,
+                        max_shard_size=export_options.get('max_shard_size', DEFAULT_SHARD_SIZE),
+                        val_ratio=export_options.get('val_ratio', 0.0),
+                        progress_callback=on_progress,
+                        cancel_check=cancel_check
+                    )
+                    success_count = shard_stats['samples']
+                    if shard_stats['cancelled']:
+                        results['cancelled'] = True
+                    shard_counts[fmt] = shard_stats['shards']
+                    results['errors'].extend(shard_stats['errors'])
                     # 匯出類別檔案
                     self.export_classes_file(fmt_dir)
                 
@@ -410,6 +1036,14 @@ class AdvancedExporter:
                     'total': len(images_data),
                     'output_dir': fmt_dir
                 }
+                if fmt in incremental_stats:
+                    results['format_results'][fmt].update({
+                        'written': incremental_stats[fmt]['written'],
+                        'skipped': incremental_stats[fmt]['skipped'],
+                        'deleted': incremental_stats[fmt]['deleted']
+                    })
+                if fmt in shard_counts:
+                    results['format_results'][fmt]['shards'] = shard_counts[fmt]
                 
             except Exception as e:
                 error_msg = f"{fmt}格式匯出錯誤: {str(e)}"
@@ -419,8 +1053,11 @@ class AdvancedExporter:
                     'total': len(images_data),
                     'error': error_msg
                 }
+            
+            if results['cancelled']:
+                break
         
         # 生成匯出報告
-        self.generate_export_report(results, output_dir)
+        self.generate_export_report(results, output_dir, table=table)
         
         return results
@@ -15,6 +15,8 @@ from PyQt5.QtCore import QThread, pyqtSignal, QObject
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import QMessageBox
 
+from frame_cache import shared_frame_cache
+
 try:
     import torch
     from ultralytics import YOLO
@@ -23,6 +25,29 @@ except ImportError:
     YOLO_AVAILABLE = False
     print("警告: YOLOv8未安裝，AI功能將被禁用")
 
+
+def cached_frame_bgr(image_path: str) -> Optional[np.ndarray]:
+    """
+    由畫面快取取得 BGR 圖片（記憶體映射，不複製像素），未啟用或無法快取時回傳 None
+    
+    回傳的是 BGRX 檔案前三個通道的唯讀、非連續檢視：可直接做為 OpenCV 與模型的輸入，
+    但不可原地修改（例如 cv2.rectangle 繪製）；需要修改時先以 img.copy() 取得可寫入的連續陣列。
+    """
+    frame_cache = shared_frame_cache()
+    if frame_cache is None:
+        return None
+    try:
+        return frame_cache.load_bgr(image_path)
+    except Exception as e:
+        print(f"畫面快取錯誤: {image_path}, {e}")
+        return None
+
+
+def read_image_bgr(image_path: str) -> Optional[np.ndarray]:
+    """讀取 BGR 圖片（啟用畫面快取時不需重新解碼，此時為唯讀陣列，見 cached_frame_bgr）"""
+    image = cached_frame_bgr(image_path)
+    return image if image is not None else cv2.imread(image_path)
+
 class AIPredictor(QThread):
     """AI預測執行緒"""
     prediction_completed = pyqtSignal(str, list)  # 圖片路徑, 預測結果
@@ -77,6 +102,12 @@ class AIPredictor(QThread):
         """添加要處理的圖片"""
         self.image_paths = image_paths
 
+    @staticmethod
+    def prediction_source(image_path: str):
+        """模型輸入：啟用畫面快取時傳入記憶體映射的唯讀 BGR 陣列（模型只讀取不修改），否則由模型自行讀取檔案"""
+        image = cached_frame_bgr(image_path)
+        return image if image is not None else image_path
+
     def run(self):
         """執行AI預測"""
         if not self.model or not self.image_paths:
@@ -88,7 +119,7 @@ class AIPredictor(QThread):
             try:
                 # 執行預測 (使用更精確的參數)
                 results = self.model.predict(
-                    image_path, 
+                    self.prediction_source(image_path),
                     conf=self.confidence_threshold,  # 更低的信心度閾值
                     iou=self.iou_threshold,          # 更嚴格的IoU閾值
                     device=self.device,
@@ -177,7 +208,7 @@ class SmartAnnotationOptimizer:
         """使用多重邊緣檢測技術優化邊界框，使其更貼緊車輛"""
         try:
             # 讀取圖片
-            img = cv2.imread(image_path)
+            img = read_image_bgr(image_path)
             if img is None:
                 return bbox
                 
@@ -197,8 +228,8 @@ class SmartAnnotationOptimizer:
             search_x2 = min(img.shape[1], x + w + margin_x)
             search_y2 = min(img.shape[0], y + h + margin_y)
             
-            # 裁剪搜索區域
-            roi = img[search_y1:search_y2, search_x1:search_x2]
+            # 裁剪搜索區域（圖片可能是畫面快取的唯讀檢視，只複製搜索區域再處理）
+            roi = img[search_y1:search_y2, search_x1:search_x2].copy()
             
             # 多重邊緣檢測方法
             gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
@@ -503,7 +534,7 @@ class AIAssistant(QObject):
     def preprocess_single_image(self, image_path: str) -> bool:
         """單張圖片的車輛檢測預處理"""
         try:
-            img = cv2.imread(image_path)
+            img = read_image_bgr(image_path)
             if img is None:
                 self.status_updated.emit(f"無法讀取圖片: {image_path}")
                 return False
@@ -0,0 +1,161 @@
+"""
+標註歷程模組 - 撤銷／重做（命令模式，只記錄變動內容）
+
+每個操作記錄為一個小型命令物件（新增、刪除、移動／調整大小前後座標、類別變更、AI 批次接受），
+不保存整份標註清單的快照。命令以標註ID套用到標註器，撤銷與重做的成本只與該操作涉及的標註數有關。
+每張圖片各有一個撤銷堆疊，長度上限於建立時指定，超過時捨棄最舊的紀錄；更換圖片清單時清除所有紀錄。
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import QRect
+
+DEFAULT_HISTORY_SIZE = 200  # 每張圖片保留的撤銷步數
+
+
+class AnnotationCommand(ABC):
+    """標註操作命令基底類別（undo / redo 以 record=False 呼叫標註器，避免再次記錄）"""
+
+    __slots__ = ()
+
+    description = ''
+
+    @abstractmethod
+    def undo(self, annotator):
+        """還原此操作"""
+
+    @abstractmethod
+    def redo(self, annotator):
+        """重新套用此操作"""
+
+
+class AddAnnotationsCommand(AnnotationCommand):
+    """新增標註（手動繪製一個框，或一次接受多個 AI 預測）"""
+
+    __slots__ = ('items', 'description')
+
+    def __init__(self, items: List, description: str = '新增標註'):
+        self.items = [item.copy() for item in items]  # 保存副本，標註之後的編輯不影響紀錄
+        self.description = description
+
+    def undo(self, annotator):
+        for item in self.items:
+            annotator.delete_rect_by_id(item['id'], record=False)
+
+    def redo(self, annotator):
+        annotator.add_rects([item.copy() for item in self.items], record=False)
+
+
+class DeleteAnnotationsCommand(AnnotationCommand):
+    """刪除標註（單一刪除或清除全部）"""
+
+    __slots__ = ('items', 'description')
+
+    def __init__(self, items: List, description: str = '刪除標註'):
+        self.items = [item.copy() for item in items]
+        self.description = description
+
+    def undo(self, annotator):
+        annotator.add_rects([item.copy() for item in self.items], record=False)
+
+    def redo(self, annotator):
+        for item in self.items:
+            annotator.delete_rect_by_id(item['id'], record=False)
+
+
+class EditRectCommand(AnnotationCommand):
+    """移動或調整標註框大小（一次拖曳合併為一筆，只保存前後座標）"""
+
+    __slots__ = ('rect_id', 'before', 'after')
+
+    description = '調整標註框'
+
+    def __init__(self, rect_id: int, before: QRect, after: QRect):
+        self.rect_id = rect_id
+        self.before: Tuple[int, int, int, int] = before.getRect()
+        self.after: Tuple[int, int, int, int] = after.getRect()
+
+    def undo(self, annotator):
+        annotator.set_rect_geometry(self.rect_id, QRect(*self.before), record=False)
+
+    def redo(self, annotator):
+        annotator.set_rect_geometry(self.rect_id, QRect(*self.after), record=False)
+
+
+class ChangeClassCommand(AnnotationCommand):
+    """變更標註類別"""
+
+    __slots__ = ('rect_id', 'before', 'after')
+
+    description = '變更類別'
+
+    def __init__(self, rect_id: int, before: int, after: int):
+        self.rect_id = rect_id
+        self.before = before
+        self.after = after
+
+    def undo(self, annotator):
+        annotator.set_rect_class(self.rect_id, self.before, record=False)
+
+    def redo(self, annotator):
+        annotator.set_rect_class(self.rect_id, self.after, record=False)
+
+
+class AnnotationHistory:
+    """各圖片的撤銷／重做堆疊 {圖片路徑: (撤銷 deque, 重做 list)}"""
+
+    def __init__(self, history_size: int = DEFAULT_HISTORY_SIZE):
+        self.history_size = history_size
+        self.stacks: Dict[str, Tuple[deque, list]] = {}
+
+    def _stacks(self, image_path: str) -> Tuple[deque, list]:
+        stacks = self.stacks.get(image_path)
+        if stacks is None:
+            stacks = (deque(maxlen=self.history_size), [])
+            self.stacks[image_path] = stacks
+        return stacks
+
+    def push(self, image_path: str, command: AnnotationCommand):
+        """記錄新操作（清除該圖片的重做堆疊）"""
+        if not image_path:
+            return
+        undo_stack, redo_stack = self._stacks(image_path)
+        undo_stack.append(command)
+        redo_stack.clear()
+
+    def undo(self, image_path: str, annotator) -> Optional[AnnotationCommand]:
+        """撤銷該圖片最近一次操作，回傳被撤銷的命令（沒有可撤銷時回傳 None）"""
+        stacks = self.stacks.get(image_path)
+        if not stacks or not stacks[0]:
+            return None
+        command = stacks[0].pop()
+        command.undo(annotator)
+        stacks[1].append(command)
+        return command
+
+    def redo(self, image_path: str, annotator) -> Optional[AnnotationCommand]:
+        """重做該圖片最近一次撤銷的操作，回傳被重做的命令"""
+        stacks = self.stacks.get(image_path)
+        if not stacks or not stacks[1]:
+            return None
+        command = stacks[1].pop()
+        command.redo(annotator)
+        stacks[0].append(command)
+        return command
+
+    def can_undo(self, image_path: str) -> bool:
+        stacks = self.stacks.get(image_path)
+        return bool(stacks and stacks[0])
+
+    def can_redo(self, image_path: str) -> bool:
+        stacks = self.stacks.get(image_path)
+        return bool(stacks and stacks[1])
+
+    def clear(self, image_path: Optional[str] = None):
+        """清除指定圖片（未指定時為全部）的歷程"""
+        if image_path is None:
+            self.stacks.clear()
+        else:
+            self.stacks.pop(image_path, None)
@@ -0,0 +1,249 @@
+"""
+標註儲存模組 - 以連續 NumPy 陣列保存各圖片的標註
+
+每張圖片的標註存為 ImageAnnotations（ID、類別、int32 框座標、信心值、來源代碼各一個陣列），
+取代每筆一個字典加 QRect 的清單，大量標註時記憶體約為原本的數十分之一。
+只有目前顯示的圖片會展開為 Annotation 物件（__slots__）供標註器編輯，
+Annotation 支援與舊字典相同的 item['rect']、item.get('confidence') 存取方式。
+類別名稱不隨每筆標註保存，而是依類別ID向車種管理器查詢。
+"""
+
+from typing import Dict, List, Optional, Iterable, Callable, Any
+
+import numpy as np
+from PyQt5.QtCore import QRect
+
+from advanced_exporter import ANNOTATION_SOURCES, build_export_image_data
+
+# 類別名稱查詢函式 class_id -> 名稱（由主視窗設定為車種管理器的查詢方法）
+_class_name_resolver: Optional[Callable[[int], Optional[str]]] = None
+
+
+def set_class_name_resolver(resolver: Optional[Callable[[int], Optional[str]]]):
+    """設定類別名稱查詢函式"""
+    global _class_name_resolver
+    _class_name_resolver = resolver
+
+
+def lookup_class_name(class_id: int) -> str:
+    """依類別ID取得類別名稱（查無時回傳「類別N」）"""
+    name = _class_name_resolver(class_id) if _class_name_resolver else None
+    return name if name else f"類別{class_id}"
+
+
+class Annotation:
+    """單筆標註（標註器使用的可編輯物件，支援字典式存取）"""
+
+    __slots__ = ('id', 'rect', 'class_id', 'confidence', 'source')
+
+    KEYS = ('id', 'rect', 'class_id', 'class_name', 'confidence', 'source')
+
+    def __init__(self, id: int, rect: QRect, class_id: int,
+                 confidence: Optional[float] = None, source: str = 'manual'):
+        self.id = id
+        self.rect = rect
+        self.class_id = class_id
+        self.confidence = confidence
+        self.source = source
+
+    @property
+    def class_name(self) -> str:
+        return lookup_class_name(self.class_id)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key == 'class_name':
+            return  # 類別名稱由類別ID決定
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        # 與舊字典一致：未知的信心值視為沒有此欄位
+        return key in self.KEYS and not (key == 'confidence' and self.confidence is None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def keys(self):
+        return [key for key in self.KEYS if key in self]
+
+    def copy(self) -> 'Annotation':
+        return Annotation(self.id, QRect(self.rect), self.class_id, self.confidence, self.source)
+
+    def __repr__(self) -> str:
+        return (f"Annotation(id={self.id}, rect=({self.rect.x()}, {self.rect.y()}, "
+                f"{self.rect.width()}, {self.rect.height()}), class_id={self.class_id})")
+
+
+class ImageAnnotations:
+    """單張圖片的標註陣列"""
+
+    __slots__ = ('ids', 'class_ids', 'boxes', 'confidence', 'source')
+
+    def __init__(self, ids: np.ndarray, class_ids: np.ndarray, boxes: np.ndarray,
+                 confidence: np.ndarray, source: np.ndarray):
+        self.ids = ids                  # (N,) int32
+        self.class_ids = class_ids      # (N,) int32
+        self.boxes = boxes              # (N,4) int32 [x, y, w, h]（原圖像素）
+        self.confidence = confidence    # (N,) float32，未知為 NaN
+        self.source = source            # (N,) uint8，ANNOTATION_SOURCES 的索引
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_items(cls, items: Iterable) -> 'ImageAnnotations':
+        """由 Annotation 物件或舊格式字典清單建立"""
+        items = list(items)
+        if items and all(type(item) is Annotation for item in items):
+            return cls.from_annotations(items)
+        image_data = build_export_image_data('', items)
+        if image_data is None:
+            return cls(np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32),
+                       np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32),
+                       np.empty(0, dtype=np.uint8))
+        columns = image_data['annotations']
+        return cls(image_data['ids'], columns[:, 0].astype(np.int32),
+                   np.rint(columns[:, 1:5]).astype(np.int32),
+                   image_data['confidence'], image_data['source'])
+
+    @classmethod
+    def from_annotations(cls, items: List[Annotation]) -> 'ImageAnnotations':
+        """由 Annotation 物件清單直接建立（不經過通用格式解析）"""
+        count = len(items)
+        boxes = np.array([item.rect.getRect() for item in items], dtype=np.int32).reshape(count, 4)
+        confidence = np.fromiter((np.nan if item.confidence is None else item.confidence for item in items),
+                                 dtype=np.float32, count=count)
+        source = np.fromiter((ANNOTATION_SOURCES.index(item.source) if item.source in ANNOTATION_SOURCES else 0
+                              for item in items), dtype=np.uint8, count=count)
+        return cls(np.fromiter((item.id for item in items), dtype=np.int32, count=count),
+                   np.fromiter((item.class_id for item in items), dtype=np.int32, count=count),
+                   boxes, confidence, source)
+
+    def concatenate(self, other: 'ImageAnnotations') -> 'ImageAnnotations':
+        """合併兩組標註（回傳新物件）"""
+        return ImageAnnotations(np.concatenate([self.ids, other.ids]),
+                                np.concatenate([self.class_ids, other.class_ids]),
+                                np.concatenate([self.boxes, other.boxes]),
+                                np.concatenate([self.confidence, other.confidence]),
+                                np.concatenate([self.source, other.source]))
+
+    def to_items(self) -> List[Annotation]:
+        """展開為標註器使用的 Annotation 物件清單"""
+        items = []
+        for ann_id, class_id, (x, y, w, h), confidence, source in zip(
+                self.ids.tolist(), self.class_ids.tolist(), self.boxes.tolist(),
+                self.confidence.tolist(), self.source.tolist()):
+            items.append(Annotation(ann_id, QRect(x, y, w, h), class_id,
+                                    None if confidence != confidence else confidence,
+                                    ANNOTATION_SOURCES[source]))
+        return items
+
+    def export_data(self, image_path: str) -> Optional[Dict]:
+        """匯出用的統一陣列表示（與 build_export_image_data 相同），無標註時回傳 None"""
+        if not len(self):
+            return None
+        columns = np.empty((len(self), 5), dtype=np.float64)
+        columns[:, 0] = self.class_ids
+        columns[:, 1:5] = self.boxes
+        return {
+            'path': image_path,
+            'annotations': columns,
+            'ids': self.ids,
+            'confidence': self.confidence,
+            'source': self.source
+        }
+
+    def to_project_list(self) -> List[Dict]:
+        """專案檔格式 [{'id', 'class', 'x', 'y', 'width', 'height'[, 'confidence', 'source']}]"""
+        entries = []
+        for ann_id, class_id, (x, y, w, h), confidence, source in zip(
+                self.ids.tolist(), self.class_ids.tolist(), self.boxes.tolist(),
+                self.confidence.tolist(), self.source.tolist()):
+            entry = {'id': ann_id, 'class': class_id, 'x': x, 'y': y, 'width': w, 'height': h}
+            if confidence == confidence:
+                entry['confidence'] = confidence
+            if source:
+                entry['source'] = ANNOTATION_SOURCES[source]
+            entries.append(entry)
+        return entries
+
+
+class AnnotationStore:
+    """所有圖片的標註 {圖片路徑: ImageAnnotations}"""
+
+    def __init__(self):
+        self.images: Dict[str, ImageAnnotations] = {}
+
+    def __contains__(self, image_path: str) -> bool:
+        return image_path in self.images
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def __iter__(self):
+        return iter(self.images)
+
+    def set(self, image_path: str, items: Iterable):
+        """以標註器目前的標註取代該圖片的標註（空清單會移除該圖片）"""
+        annotations = ImageAnnotations.from_items(items)
+        if len(annotations):
+            self.images[image_path] = annotations
+        else:
+            self.images.pop(image_path, None)
+
+    def extend(self, image_path: str, items: Iterable):
+        """加入標註至該圖片"""
+        annotations = ImageAnnotations.from_items(items)
+        if not len(annotations):
+            return
+        existing = self.images.get(image_path)
+        self.images[image_path] = existing.concatenate(annotations) if existing else annotations
+
+    def get_items(self, image_path: str) -> List[Annotation]:
+        """該圖片的標註物件清單（每次呼叫建立新物件，可直接交給標註器編輯）"""
+        annotations = self.images.get(image_path)
+        return annotations.to_items() if annotations else []
+
+    def count(self, image_path: str) -> int:
+        annotations = self.images.get(image_path)
+        return len(annotations) if annotations else 0
+
+    def export_data(self, image_path: str) -> Optional[Dict]:
+        """匯出用的統一陣列表示，無標註時回傳 None"""
+        annotations = self.images.get(image_path)
+        return annotations.export_data(image_path) if annotations else None
+
+    def total_count(self) -> int:
+        return sum(len(annotations) for annotations in self.images.values())
+
+    def class_counts(self) -> Dict[int, int]:
+        """各類別的標註數量"""
+        if not self.images:
+            return {}
+        class_ids = np.concatenate([annotations.class_ids for annotations in self.images.values()])
+        values, counts = np.unique(class_ids, return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def nbytes(self) -> int:
+        """陣列佔用的位元組數"""
+        return sum(sum(getattr(annotations, name).nbytes for name in ImageAnnotations.__slots__)
+                   for annotations in self.images.values())
+
+    def to_project_data(self) -> Dict[str, List[Dict]]:
+        """轉為可寫入專案 JSON 的格式"""
+        return {image_path: annotations.to_project_list()
+                for image_path, annotations in self.images.items()}
+
+    @classmethod
+    def from_project_data(cls, data: Dict[str, List[Dict]]) -> 'AnnotationStore':
+        """由專案檔的標註資料建立（支援專案檔格式與標註器字典格式）"""
+        store = cls()
+        for image_path, items in (data or {}).items():
+            store.set(image_path, items)
+        return store
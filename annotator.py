@@ -1,6 +1,15 @@
 from PyQt5.QtWidgets import QLabel
-from PyQt5.QtGui import QPainter, QPen, QPixmap, QColor, QCursor, QFont, QBrush
-from PyQt5.QtCore import Qt, QRect, pyqtSignal, QPoint
+from PyQt5.QtGui import QPainter, QPen, QPixmap, QImage, QColor, QCursor, QFont, QFontMetrics, QBrush
+from PyQt5.QtCore import Qt, QRect, QRectF, QSize, pyqtSignal, QPoint, QTimer
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from image_pyramid import ImagePyramid, DEFAULT_TILE_CACHE_SIZE
+from spatial_index import SpatialGridIndex
+from performance_optimizer import ImageCache
+from annotation_store import Annotation
+from annotation_history import (AddAnnotationsCommand, DeleteAnnotationsCommand,
+                                EditRectCommand, ChangeClassCommand)
 
 # 預設車種類別（向後相容）
 VEHICLE_CLASSES = [
@@ -18,20 +27,58 @@ DEFAULT_CLASS_COLORS = {
     3: QColor(255, 215, 0),    # 公車 - 金黃色
 }
 
-class AnnotatorLabel(QLabel):
-    rects_updated = pyqtSignal()
+# 密集標註的細節層級（LOD）門檻（螢幕像素）
+LOD_LABEL_MIN_AREA = 24 * 24   # 標註框螢幕面積小於此值時不繪製標籤（懸停與選中者除外）
+
+
+class AnnotationCanvasMixin:
+    """
+    標註畫布共用實作（與繪製方式無關）：圖片與影像金字塔、標註與空間索引、座標轉換、縮放、滑鼠編輯與標註繪製樣式
     
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setAlignment(Qt.AlignCenter)
-        self.image = None
-        self.scaled_image = None
+    AnnotatorLabel（QLabel）與 GLAnnotatorCanvas（QOpenGLWidget）皆繼承此類別，並各自宣告 rects_updated、
+    annotation_command、full_resolution_ready 信號，實作下列與繪製方式有關的方法。
+    """
+    
+    def invalidate_overlay(self):
+        """標註內容或顯示樣式改變時呼叫"""
+        raise NotImplementedError
+    
+    def update_rects(self, *rects):
+        """重繪指定的 widget 範圍"""
+        raise NotImplementedError
+    
+    def update_scaled_image(self):
+        """縮放或元件尺寸改變時呼叫"""
+        raise NotImplementedError
+    
+    def mark_interacting(self):
+        """滾輪縮放或拖曳中呼叫"""
+        raise NotImplementedError
+    
+    def on_image_resolution_changed(self):
+        """金字塔來源換成完整解析度時呼叫"""
+        raise NotImplementedError
+    
+    def init_annotation_state(self):
+        """初始化與繪製方式無關的圖片、標註、縮放與編輯狀態（OpenGL 畫布共用）"""
+        self.image = None  # 目前解碼的 QImage（JPEG 可能為縮小解碼，放大時才換成原始解析度）
+        self.image_size = QSize()  # 原圖尺寸（標註座標以此為準）
+        self.pyramid = None  # 多解析度金字塔（縮小顯示時從較小層級取樣）
+        self.owns_pyramid = False  # 金字塔由 set_image 建立（切換圖片時釋放其圖塊）
+        self.full_resolution_pending = None  # 正在背景完整解碼的金字塔
+        self.decode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='full-decode')
+        self.tile_cache = ImageCache(max_cache_size=DEFAULT_TILE_CACHE_SIZE)
         self.drawing = False
         self.start_point = None
         self.end_point = None
-        self.rects = []  # [{'id': int, 'rect': QRect, 'class_id': int, 'class_name': str}]
+        self.rect_index = SpatialGridIndex()  # 標註框空間索引（點擊、懸停、選取查詢）
+        # 繪製資源快取：{(類別, 狀態, 字級): 畫筆/標籤底色/字型}、{字級: QFont}、{(字級, 文字): 標籤尺寸}
+        self.render_styles = {}
+        self.label_fonts = {}
+        self.label_sizes = {}
+        self.label_text_pen = QPen(Qt.white, 1)
+        self.rects = []  # [Annotation]（支援 item['id']、item['rect']、item['class_id']、item['class_name'] 存取）
         self.current_rect = None
-        self.setMouseTracking(True)
         self.next_id = 1
         self.class_id = 0
         self.class_name = VEHICLE_CLASSES[0][0]
@@ -55,25 +102,75 @@ class AnnotatorLabel(QLabel):
         self.show_labels = True  # 顯示ID和分類標籤
         self.show_ids = True     # 顯示ID
         self.show_classes = True # 顯示分類名稱
+        self.annotations_visible = True  # 顯示標註（F10切換）
         
         # 標註框編輯功能
         self.editing_mode = None  # None, 'move', 'resize_tl', 'resize_tr', 'resize_bl', 'resize_br', 'resize_t', 'resize_b', 'resize_l', 'resize_r'
         self.edit_start_point = None
         self.edit_original_rect = None
         self.resize_handle_size = 6  # 調整手柄大小
-        
-        # 設定背景
-        self.setStyleSheet("""
-            QLabel {
-                background-color: #2b2b2b;
-                border: 1px solid #555;
-            }
-        """)
-
+    
+    def shutdown(self):
+        """關閉背景解碼執行緒（關閉程式時呼叫，不等待執行中的解碼）"""
+        self.decode_executor.shutdown(wait=False, cancel_futures=True)
+    
+    @property
+    def rects(self):
+        """標註清單（依繪製順序的新清單）；請以 add_rects / delete_rect_by_id 修改，以維持空間索引"""
+        return list(self._rects.values())
+    
+    @rects.setter
+    def rects(self, rects):
+        self._rects = {item['id']: item for item in rects}  # {標註ID: 標註}，依加入順序
+        self.rect_index.rebuild(self._rects.values())
+        self.invalidate_overlay()
+    
+    def annotation_count(self) -> int:
+        """標註數量（不複製標註清單）"""
+        return len(self._rects)
+    
+    def add_rects(self, items, record=True):
+        """加入標註並更新空間索引（record 為 True 時產生撤銷命令）"""
+        items = list(items)
+        for item in items:
+            self._rects[item['id']] = item
+            self.rect_index.insert(item)
+            self.next_id = max(self.next_id, item['id'] + 1)  # 復原已清除的標註後，新標註ID不可重複
+        self.invalidate_overlay()
+        if record and items:
+            self.annotation_command.emit(AddAnnotationsCommand(items))
+    
+    def set_rect_geometry(self, rect_id, rect, record=True):
+        """設定標註框位置與大小"""
+        item = self.rect_index.get(rect_id)
+        if item is None or item['rect'] == rect:
+            return
+        old_bounds = self.annotation_bounds(item)
+        if record:
+            self.annotation_command.emit(EditRectCommand(rect_id, item['rect'], rect))
+        item['rect'] = QRect(rect)
+        self.rect_index.update(item)
+        self.invalidate_overlay()
+        self.update_rects(old_bounds, self.annotation_bounds(item))
+    
+    def set_rect_class(self, rect_id, class_id, record=True):
+        """變更標註類別"""
+        item = self.rect_index.get(rect_id)
+        if item is None or item['class_id'] == class_id:
+            return
+        if record:
+            self.annotation_command.emit(ChangeClassCommand(rect_id, item['class_id'], class_id))
+        old_bounds = self.annotation_bounds(item)
+        item['class_id'] = class_id
+        self.invalidate_overlay()
+        self.update_rects(old_bounds, self.annotation_bounds(item))
+    
     def update_class_colors(self, color_mapping):
         """更新車種顏色映射"""
         self.class_colors.update(color_mapping)
-        self.repaint()  # 重新繪製以應用新顏色
+        self.render_styles.clear()
+        self.invalidate_overlay()
+        self.update()  # 重新繪製以應用新顏色
     
     def get_class_color(self, class_id):
         """取得車種顏色"""
@@ -82,38 +179,54 @@ class AnnotatorLabel(QLabel):
     def set_show_labels(self, show_labels):
         """設定是否顯示標籤"""
         self.show_labels = show_labels
-        self.repaint()
+        self.invalidate_overlay()
+        self.update()
     
     def set_show_ids(self, show_ids):
         """設定是否顯示ID"""
         self.show_ids = show_ids
-        self.repaint()
+        self.invalidate_overlay()
+        self.update()
     
     def set_show_classes(self, show_classes):
         """設定是否顯示分類名稱"""
         self.show_classes = show_classes
-        self.repaint()
+        self.invalidate_overlay()
+        self.update()
     
     def set_image(self, image_input, image_path=None):
-        # 支持兩種輸入：圖片路徑字符串或QPixmap/QImage對象
-        if isinstance(image_input, str):
+        # 支持輸入：圖片路徑字符串、QPixmap/QImage對象（內部統一保存為QImage），
+        # 或背景預載時已建立的 ImagePyramid（見 make_pyramid_builder）
+        if isinstance(image_input, ImagePyramid):
+            image = None
+        elif isinstance(image_input, str):
             # 如果是字符串，當作圖片路徑處理
-            self.image = QPixmap(image_input)
-            if self.image.isNull():
+            image = QImage(image_input)
+            if image.isNull():
                 raise Exception(f"無法載入圖片: {image_input}")
         elif isinstance(image_input, QPixmap):
-            # 如果是QPixmap，直接使用
-            self.image = image_input
-        elif hasattr(image_input, 'size'):
-            # 如果是QImage，轉換為QPixmap
-            self.image = QPixmap.fromImage(image_input)
+            # 如果是QPixmap，轉換為QImage
+            image = image_input.toImage()
+        elif isinstance(image_input, QImage):
+            image = image_input
         else:
             raise Exception("不支援的圖片輸入類型")
         
         # 檢查圖片是否有效
-        if self.image.isNull():
+        if image is not None and image.isNull():
             raise Exception("圖片載入失敗或圖片為空")
         
+        # 建立影像金字塔（各層與圖塊依需要才產生）；預載的金字塔仍由畫面快取持有，其圖塊交由快取淘汰，
+        # 放大時另外解碼的完整解析度影像則在離開圖片時釋放
+        if self.pyramid:
+            self.pyramid.drop_full_resolution()
+            if self.owns_pyramid:
+                self.pyramid.release()
+        self.owns_pyramid = image is not None
+        self.pyramid = ImagePyramid(image, self.tile_cache) if image is not None else image_input
+        self.image = self.pyramid.base_image
+        self.image_size = self.pyramid.image_size
+        
         self.rects = []
         self.current_rect = None
         self.next_id = 1
@@ -122,12 +235,12 @@ class AnnotatorLabel(QLabel):
         self.selected_rect_id = None
         self.hover_rect_id = None
         self.fit_to_window()
-        self.repaint()
-
+        self.update()
+    
     def fit_to_window(self):
         if self.image:
             widget_size = self.size()
-            image_size = self.image.size()
+            image_size = self.image_size
             
             # 檢查是否有有效的尺寸
             if (widget_size.width() <= 0 or widget_size.height() <= 0 or 
@@ -137,38 +250,103 @@ class AnnotatorLabel(QLabel):
                 self.update_scaled_image()
                 return
             
-            scale_x = widget_size.width() / image_size.width()
-            scale_y = widget_size.height() / image_size.height()
-            self.scale_factor = min(scale_x, scale_y) * 0.95  # 留一些邊距
+            self.scale_factor = self.fit_scale(widget_size.width(), widget_size.height(),
+                                               image_size.width(), image_size.height())
             
             self.image_offset = QPoint(0, 0)
             self.update_scaled_image()
-
-    def update_scaled_image(self):
-        if self.image:
-            # 確保scale_factor是有效的
-            if self.scale_factor <= 0:
-                self.scale_factor = 1.0
-                
-            scaled_size = self.image.size() * self.scale_factor
-            self.scaled_image = self.image.scaled(scaled_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-
-    def get_image_rect(self):
-        if not self.scaled_image:
+    
+    @staticmethod
+    def fit_scale(view_width, view_height, image_width, image_height):
+        """適應視窗的縮放倍率（留一些邊距）"""
+        return min(view_width / image_width, view_height / image_height) * 0.95
+    
+    def make_pyramid_builder(self):
+        """
+        回傳可在背景執行緒執行的 QImage -> ImagePyramid 函式（供瀏覽預載使用）
+        
+        依目前元件尺寸預先產生適應視窗時所需的縮小層級，切換到該圖片時不必在主執行緒縮小整張圖片。
+        """
+        tile_cache = self.tile_cache
+        view_width, view_height = self.width(), self.height()
+        
+        def build(image, image_path=None, full_size=None):
+            pyramid = ImagePyramid(image, tile_cache, source_path=image_path, full_size=full_size)
+            if view_width > 0 and view_height > 0:
+                size = pyramid.image_size
+                level = pyramid.level_for_scale(
+                    self.fit_scale(view_width, view_height, size.width(), size.height()))
+                if level > pyramid.base_level:
+                    pyramid.render_region(level, pyramid.level_rect(level))
+            return pyramid
+        
+        return build
+    
+    def decode_fit_size(self):
+        """JPEG 縮小解碼的目標顯示區域（元件尺寸），尚未顯示時回傳 None 以完整解碼"""
+        if self.width() <= 0 or self.height() <= 0:
+            return None
+        return self.width(), self.height()
+    
+    def request_full_resolution(self):
+        """顯示倍率超過目前解碼的解析度時，於背景由原檔完整解碼（完成前先以目前解析度放大顯示）"""
+        pyramid = self.pyramid
+        if (pyramid is None or self.full_resolution_pending is pyramid
+                or not pyramid.needs_full_resolution(self.scale_factor)):
+            return
+        self.full_resolution_pending = pyramid
+        
+        def decode():
+            try:
+                image = pyramid.decode_full_resolution()
+            except Exception as e:
+                print(f"完整解析度解碼錯誤: {e}")
+                image = None
+            self.full_resolution_ready.emit((pyramid, image))
+        
+        self.decode_executor.submit(decode)
+    
+    def on_full_resolution_ready(self, result):
+        """完整解析度解碼完成：若仍是目前的圖片則替換金字塔來源並重新繪製"""
+        pyramid, image = result
+        if image is None:
+            return  # 解碼失敗：保留 pending，避免每次繪製都重試
+        if self.full_resolution_pending is pyramid:
+            self.full_resolution_pending = None
+        if pyramid is not self.pyramid:
+            return
+        pyramid.set_full_resolution(image)
+        self.image = pyramid.base_image
+        self.on_image_resolution_changed()
+    
+    def full_resolution_image(self):
+        """目前圖片的原始解析度 QImage（仍為縮小解碼時同步解碼）"""
+        if self.pyramid is not None and self.pyramid.base_level > 0 and self.pyramid.source_path:
+            self.pyramid.set_full_resolution(self.pyramid.decode_full_resolution())
+            self.image = self.pyramid.base_image
+            self.on_image_resolution_changed()
+        return self.image
+    
+    def get_image_rect(self, scale_factor=None):
+        """縮放後整張圖片在 widget 中的位置（僅計算座標，不配置縮放圖片）"""
+        if not self.image:
             return QRect()
         
+        if scale_factor is None:
+            scale_factor = self.scale_factor
         widget_rect = self.rect()
-        image_rect = self.scaled_image.rect()
+        scaled_width = int(round(self.image_size.width() * scale_factor))
+        scaled_height = int(round(self.image_size.height() * scale_factor))
         
         # 圖片在 widget 中央，加上偏移
-        x = (widget_rect.width() - image_rect.width()) // 2 + self.image_offset.x()
-        y = (widget_rect.height() - image_rect.height()) // 2 + self.image_offset.y()
+        x = (widget_rect.width() - scaled_width) // 2 + self.image_offset.x()
+        y = (widget_rect.height() - scaled_height) // 2 + self.image_offset.y()
         
-        return QRect(x, y, image_rect.width(), image_rect.height())
-
+        return QRect(x, y, scaled_width, scaled_height)
+    
     def widget_to_image_coords(self, widget_point):
         """將 widget 座標轉換為原始圖片座標"""
-        if not self.image or not self.scaled_image:
+        if not self.image:
             return widget_point
         
         image_rect = self.get_image_rect()
@@ -180,10 +358,10 @@ class AnnotatorLabel(QLabel):
         relative_y = (widget_point.y() - image_rect.y()) / self.scale_factor
         
         return QPoint(int(relative_x), int(relative_y))
-
+    
     def image_to_widget_coords(self, image_point):
         """將原始圖片座標轉換為 widget 座標"""
-        if not self.image or not self.scaled_image:
+        if not self.image:
             return image_point
         
         image_rect = self.get_image_rect()
@@ -192,11 +370,11 @@ class AnnotatorLabel(QLabel):
         widget_y = int(image_point.y() * self.scale_factor + image_rect.y())
         
         return QPoint(widget_x, widget_y)
-
+    
     def set_class(self, class_id, class_name):
         self.class_id = class_id
         self.class_name = class_name
-
+    
     def wheelEvent(self, event):
         if self.image:
             # 滑鼠滾輪縮放
@@ -207,13 +385,14 @@ class AnnotatorLabel(QLabel):
             self.scale_factor = max(self.min_scale, min(self.max_scale, self.scale_factor * zoom_factor))
             
             if self.scale_factor != old_scale:
-                # 以滑鼠位置為中心縮放
+                # 以滑鼠位置為中心縮放（互動中先繪製快速預覽）
+                self.mark_interacting()
                 mouse_pos = event.pos()
                 self.zoom_at_point(mouse_pos, self.scale_factor / old_scale)
-                
+    
     def zoom_at_point(self, point, zoom_factor):
-        # 計算縮放前的圖片中心
-        old_image_rect = self.get_image_rect()
+        # 計算縮放前的圖片中心（scale_factor 已更新，以縮放前的倍率計算）
+        old_image_rect = self.get_image_rect(self.scale_factor / zoom_factor)
         
         # 更新縮放圖片
         self.update_scaled_image()
@@ -229,8 +408,8 @@ class AnnotatorLabel(QLabel):
         self.image_offset.setX(self.image_offset.x() - int(offset_x))
         self.image_offset.setY(self.image_offset.y() - int(offset_y))
         
-        self.repaint()
-
+        self.update()
+    
     def mousePressEvent(self, event):
         if not self.image:
             return
@@ -243,19 +422,21 @@ class AnnotatorLabel(QLabel):
                 if selected_item:
                     handle_type = self.get_resize_handle_at_point(event.pos(), selected_item)
                     if handle_type:
-                        # 開始編輯模式
+                        # 開始編輯模式（編輯中的標註移出靜態圖層）
                         self.editing_mode = handle_type
                         self.edit_start_point = image_point
                         self.edit_original_rect = QRect(selected_item['rect'])
                         self.setCursor(self.get_cursor_for_handle(handle_type))
+                        self.update_rects(self.annotation_bounds(selected_item))
                         return
                 
                 # 檢查是否點擊了現有標註
+                old_selected_bounds = self.annotation_bounds(selected_item)
                 clicked_rect_id = self.get_rect_at_point(image_point)
                 if clicked_rect_id:
                     self.selected_rect_id = clicked_rect_id
                     self.editing_mode = None
-                    self.repaint()
+                    self.update_rects(old_selected_bounds, self.annotation_bounds(self.get_selected_rect_item()))
                 else:
                     # 開始繪製新標註
                     self.drawing = True
@@ -264,40 +445,44 @@ class AnnotatorLabel(QLabel):
                     self.current_rect = None
                     self.selected_rect_id = None
                     self.editing_mode = None
+                    self.update_rects(old_selected_bounds)
         
         elif event.button() == Qt.MiddleButton or (event.button() == Qt.LeftButton and event.modifiers() & Qt.ControlModifier):
             # 開始拖拽圖片
             self.panning = True
             self.last_pan_point = event.pos()
             self.setCursor(QCursor(Qt.ClosedHandCursor))
-
+    
     def mouseMoveEvent(self, event):
         if not self.image:
             return
             
         if self.panning and self.last_pan_point:
-            # 拖拽圖片
+            # 拖拽圖片（超出預先渲染範圍時先繪製快速預覽）
+            self.mark_interacting()
             delta = event.pos() - self.last_pan_point
             self.image_offset += delta
             self.last_pan_point = event.pos()
-            self.repaint()
+            self.update()
             return
             
         if self.editing_mode and self.edit_start_point:
-            # 編輯標註框
+            # 編輯標註框（只重繪標註新舊位置的聯集）
             image_point = self.widget_to_image_coords(event.pos())
             if image_point:
+                old_bounds = self.annotation_bounds(self.get_selected_rect_item())
                 self.update_rect_during_edit(image_point)
-                self.repaint()
+                self.update_rects(old_bounds, self.annotation_bounds(self.get_selected_rect_item()))
             return
             
         if self.drawing and self.start_point:
             # 繪製新標註框
             image_point = self.widget_to_image_coords(event.pos())
             if image_point:
+                old_bounds = self.current_rect_bounds()
                 self.end_point = image_point
                 self.current_rect = QRect(self.start_point, self.end_point).normalized()
-                self.repaint()
+                self.update_rects(old_bounds, self.current_rect_bounds())
         else:
             # 檢查滑鼠懸停和游標更新
             image_point = self.widget_to_image_coords(event.pos())
@@ -313,15 +498,19 @@ class AnnotatorLabel(QLabel):
                 # 檢查其他標註
                 hover_id = self.get_rect_at_point(image_point)
                 if hover_id != self.hover_rect_id:
-                    self.hover_rect_id = hover_id
+                    self.set_hover_rect_id(hover_id)
                     self.setCursor(QCursor(Qt.PointingHandCursor) if hover_id else QCursor(Qt.ArrowCursor))
-                    self.repaint()
             else:
                 # 滑鼠在圖片外
                 if self.hover_rect_id is not None:
-                    self.hover_rect_id = None
+                    self.set_hover_rect_id(None)
                     self.setCursor(QCursor(Qt.ArrowCursor))
-                    self.repaint()
+    
+    def set_hover_rect_id(self, hover_id):
+        """變更懸停標註，只重繪新舊懸停標註的範圍"""
+        old_bounds = self.annotation_bounds(self.rect_index.get(self.hover_rect_id))
+        self.hover_rect_id = hover_id
+        self.update_rects(old_bounds, self.annotation_bounds(self.rect_index.get(hover_id)))
     
     def update_rect_during_edit(self, current_point):
         """在編輯過程中更新標註框"""
@@ -386,13 +575,14 @@ class AnnotatorLabel(QLabel):
         
         # 確保標註框在圖片範圍內
         if self.image:
-            image_bounds = QRect(0, 0, self.image.width(), self.image.height())
+            image_bounds = QRect(QPoint(0, 0), self.image_size)
             new_rect = new_rect.intersected(image_bounds)
         
         # 更新標註框
         new_rect = new_rect.normalized()
         selected_item['rect'] = new_rect
-
+        self.rect_index.update(selected_item)
+    
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton:
             if self.panning:
@@ -401,31 +591,34 @@ class AnnotatorLabel(QLabel):
                 self.setCursor(QCursor(Qt.ArrowCursor))
                 
             elif self.editing_mode and self.edit_start_point:
-                # 完成編輯
+                # 完成編輯（標註已變動，靜態圖層需重建）；整個拖曳合併為一筆撤銷紀錄
+                selected_item = self.get_selected_rect_item()
+                original_rect = self.edit_original_rect
+                if selected_item and original_rect is not None and selected_item['rect'] != original_rect:
+                    self.annotation_command.emit(
+                        EditRectCommand(selected_item['id'], original_rect, selected_item['rect']))
                 self.editing_mode = None
                 self.edit_start_point = None
                 self.edit_original_rect = None
                 self.setCursor(QCursor(Qt.ArrowCursor))
-                self.repaint()
+                self.invalidate_overlay()
+                self.update_rects(self.annotation_bounds(self.get_selected_rect_item()))
                 # 通知父窗口標註已改變
                 self.rects_updated.emit()
                 
             elif self.drawing and self.image and self.start_point and self.end_point:
+                dirty_bounds = self.current_rect_bounds()
                 rect = QRect(self.start_point, self.end_point).normalized()
                 if rect.width() > 10 and rect.height() > 10:
-                    self.rects.append({
-                        'id': self.next_id,
-                        'rect': rect,
-                        'class_id': self.class_id,
-                        'class_name': self.class_name
-                    })
-                    self.selected_rect_id = self.next_id
-                    self.next_id += 1
+                    new_id = self.next_id
+                    self.add_rects([Annotation(new_id, rect, self.class_id)])  # add_rects 會推進 next_id
+                    self.selected_rect_id = new_id
                     self.rects_updated.emit()
+                    dirty_bounds = dirty_bounds.united(self.annotation_bounds(self.get_selected_rect_item()))
                 
                 self.drawing = False
                 self.current_rect = None
-                self.repaint()
+                self.update_rects(dirty_bounds)
             
         elif event.button() == Qt.MiddleButton or (event.button() == Qt.LeftButton and event.modifiers() & Qt.ControlModifier):
             # 結束拖拽
@@ -434,19 +627,21 @@ class AnnotatorLabel(QLabel):
             
         elif event.button() == Qt.RightButton:
             if self.editing_mode:
-                # 取消編輯
+                # 取消編輯（還原拖曳前的標註框）
+                selected_item = self.get_selected_rect_item()
+                if selected_item and self.edit_original_rect is not None:
+                    selected_item['rect'] = QRect(self.edit_original_rect)
+                    self.rect_index.update(selected_item)
                 self.editing_mode = None
                 self.edit_start_point = None
                 self.edit_original_rect = None
                 self.setCursor(QCursor(Qt.ArrowCursor))
-                self.repaint()
-
+                self.invalidate_overlay()
+                self.update_rects(self.annotation_bounds(self.get_selected_rect_item()))
+    
     def get_rect_at_point(self, point):
-        """獲取在指定點的標註ID"""
-        for item in reversed(self.rects):  # 從最後繪製的開始檢查
-            if item['rect'].contains(point):
-                return item['id']
-        return None
+        """獲取在指定點的標註ID（重疊時取最後繪製者）"""
+        return self.rect_index.query_point(point)
     
     def get_resize_handle_at_point(self, point, rect_item):
         """獲取調整手柄類型"""
@@ -501,114 +696,193 @@ class AnnotatorLabel(QLabel):
     def get_selected_rect_item(self):
         """獲取當前選中的標註項"""
         if self.selected_rect_id:
-            for item in self.rects:
-                if item['id'] == self.selected_rect_id:
-                    return item
+            return self.rect_index.get(self.selected_rect_id)
         return None
-
-    def paintEvent(self, event):
-        super().paintEvent(event)
-        if not self.scaled_image:
-            return
-            
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+    
+    def visible_image_rect(self, image_rect):
+        """可視範圍對應的原圖區域（下緣加上標籤高度，框在畫面外但標籤可見者也納入）"""
+        scale = self.scale_factor
+        label_margin = int((self.label_font_size() * 2 + 8) / scale) + 1
+        left = int(-image_rect.x() / scale) - 1
+        top = int(-image_rect.y() / scale) - 1
+        right = int((self.width() - image_rect.x()) / scale) + 1
+        bottom = int((self.height() - image_rect.y()) / scale) + 1 + label_margin
+        return QRect(left, top, right - left + 1, bottom - top + 1)
+    
+    def visible_annotations(self, image_rect, excluded_id=None):
+        """可視範圍內的標註與其 widget 範圍 [(標註, QRect)]（依繪製順序，以空間索引剔除畫面外標註）"""
+        visible_rect = self.visible_image_rect(image_rect)
+        if visible_rect.contains(QRect(QPoint(0, 0), self.image_size)):
+            # 整張圖片都在畫面內：不需查詢索引
+            items = self._rects.values()
+        else:
+            items = [self.rect_index.get(rect_id) for rect_id in self.rect_index.query_rect(visible_rect)]
+        return [(item, self.image_rect_to_widget_rect(item['rect'], image_rect))
+                for item in items if item['id'] != excluded_id]
+    
+    def draw_annotation_boxes(self, painter, visible):
+        """以一般樣式批次繪製標註框：同類別的框共用畫筆，以單次 drawRects 繪製"""
+        boxes_by_class = {}
+        for item, widget_rect in visible:
+            boxes_by_class.setdefault(item['class_id'], []).append(widget_rect)
         
-        # 繪製圖片
-        image_rect = self.get_image_rect()
-        painter.drawPixmap(image_rect, self.scaled_image)
+        painter.setBrush(Qt.NoBrush)
+        for class_id, boxes in boxes_by_class.items():
+            painter.setPen(self.get_render_style(class_id, 'normal')['pen'])
+            painter.drawRects(boxes)
+    
+    def draw_annotation_labels(self, painter, visible):
+        """繪製一般狀態的標籤，螢幕面積過小的標註不繪製標籤（縮小檢視時避免標籤重疊成雜訊）"""
+        if not (self.show_labels and (self.show_ids or self.show_classes)):
+            return
+        for item, widget_rect in visible:
+            if widget_rect.width() * widget_rect.height() >= LOD_LABEL_MIN_AREA:
+                self.draw_annotation_label(painter, item, widget_rect,
+                                           self.get_render_style(item['class_id'], 'normal'))
+    
+    def label_font_size(self):
+        """目前縮放倍率下的標籤字級（同時作為繪製資源快取的縮放分級）"""
+        return max(8, int(10 * self.scale_factor))
+    
+    def label_font(self):
+        """目前縮放倍率下的標籤字型（依字級快取）"""
+        font_size = self.label_font_size()
+        font = self.label_fonts.get(font_size)
+        if font is None:
+            font = QFont("Arial", font_size)
+            self.label_fonts[font_size] = font
+        return font
+    
+    def get_render_style(self, class_id, state):
+        """取得標註繪製資源（畫筆、標籤底色、手柄底色、字型），依 (類別, 狀態, 字級) 快取"""
+        font_size = self.label_font_size()
+        key = (class_id, state, font_size)
+        style = self.render_styles.get(key)
+        if style is None:
+            base_color = self.get_class_color(class_id)
+            # 為邊框創建專用顏色（避免影響標籤）
+            border_color = QColor(base_color)
+            if state == 'selected':
+                pen = QPen(border_color, 3)
+            elif state == 'hover':
+                pen = QPen(border_color, 2)
+            else:
+                # 只對邊框顏色設透明度，不影響原始顏色
+                border_color.setAlpha(180)
+                pen = QPen(border_color, 2)
+            # 標籤與手柄使用原始顏色（確保不透明）
+            solid_color = QColor(base_color)
+            solid_color.setAlpha(255)
+            style = {
+                'pen': pen,
+                'label_color': solid_color,
+                'handle_brush': QBrush(solid_color),
+                'font': self.label_font()
+            }
+            self.render_styles[key] = style
+        return style
+    
+    def measure_label(self, label_text):
+        """標籤文字尺寸（依字級與文字快取，避免每次繪製都量測）"""
+        font_size = self.label_font_size()
+        key = (font_size, label_text)
+        text_rect = self.label_sizes.get(key)
+        if text_rect is None:
+            if len(self.label_sizes) > 8192:
+                self.label_sizes.clear()
+            text_rect = QFontMetrics(self.label_font()).boundingRect(label_text)
+            self.label_sizes[key] = text_rect
+        return text_rect
+    
+    def label_geometry(self, item, widget_rect):
+        """標籤文字、背景範圍與文字範圍；不顯示標籤時回傳 None"""
+        if not (self.show_labels and (self.show_ids or self.show_classes)):
+            return None
         
-        # 繪製標註框
-        for item in self.rects:
-            self.draw_annotation(painter, item, image_rect)
+        # 構建標籤文字
+        label_parts = []
+        if self.show_ids:
+            label_parts.append(f"ID:{item['id']}")
+        if self.show_classes:
+            label_parts.append(item['class_name'])
+        label_text = " ".join(label_parts)
         
-        # 繪製正在繪製的標註框
-        if self.current_rect:
-            color = self.get_class_color(self.class_id)
-            pen = QPen(color, 2, Qt.DashLine)
-            painter.setPen(pen)
-            # 確保正在繪製的標註框也不填充
-            painter.setBrush(QBrush(Qt.NoBrush))
-            widget_rect = self.image_rect_to_widget_rect(self.current_rect, image_rect)
-            painter.drawRect(widget_rect)
-
-    def draw_annotation(self, painter, item, image_rect):
-        """繪製單個標註"""
-        base_color = self.get_class_color(item['class_id'])
+        text_rect = self.measure_label(label_text)
         
+        # 標籤背景位置
+        label_bg = QRect(
+            widget_rect.x(),
+            widget_rect.y() - text_rect.height() - 4,
+            text_rect.width() + 8,
+            text_rect.height() + 4
+        )
+        return label_text, label_bg, text_rect
+    
+    def annotation_bounds(self, item):
+        """標註在 widget 中的繪製範圍（含邊框、調整手柄與標籤），供局部重繪使用"""
+        if not item or not self.image:
+            return QRect()
+        widget_rect = self.image_rect_to_widget_rect(item['rect'], self.get_image_rect())
+        margin = self.resize_handle_size + 2
+        bounds = widget_rect.adjusted(-margin, -margin, margin, margin)
+        label = self.label_geometry(item, widget_rect)
+        if label:
+            bounds = bounds.united(label[1].adjusted(-1, -1, 1, 1))
+        return bounds
+    
+    def current_rect_bounds(self):
+        """正在繪製的標註框在 widget 中的範圍"""
+        if not self.current_rect or not self.image:
+            return QRect()
+        return self.image_rect_to_widget_rect(self.current_rect, self.get_image_rect()).adjusted(-2, -2, 2, 2)
+    
+    def draw_annotation(self, painter, item, image_rect, overlay=False):
+        """繪製單個標註（overlay 為 True 時以一般樣式繪製至標註圖層）"""
         # 判斷標註狀態
-        is_selected = item['id'] == self.selected_rect_id
-        is_hover = item['id'] == self.hover_rect_id
-        
-        # 為邊框創建專用顏色（避免影響標籤）
-        border_color = QColor(base_color)
-        
-        # 設定邊框樣式
-        if is_selected:
-            pen = QPen(border_color, 3)
-        elif is_hover:
-            pen = QPen(border_color, 2)
+        if overlay:
+            state = 'normal'
+        elif item['id'] == self.selected_rect_id:
+            state = 'selected'
+        elif item['id'] == self.hover_rect_id:
+            state = 'hover'
         else:
-            # 只對邊框顏色設透明度，不影響原始顏色
-            border_color.setAlpha(180)
-            pen = QPen(border_color, 2)
+            state = 'normal'
+        style = self.get_render_style(item['class_id'], state)
         
-        painter.setPen(pen)
+        painter.setPen(style['pen'])
         # 確保不填充標註框內部
-        painter.setBrush(QBrush(Qt.NoBrush))
+        painter.setBrush(Qt.NoBrush)
         
         # 轉換座標並繪製標註框（只繪製邊框，不填充）
         widget_rect = self.image_rect_to_widget_rect(item['rect'], image_rect)
         painter.drawRect(widget_rect)
         
         # 如果是選中的標註，繪製調整手柄
-        if is_selected:
-            self.draw_resize_handles(painter, widget_rect, base_color)
-        
-        # 繪製標籤背景（使用原始顏色，確保標籤清晰）
-        if self.show_labels and (self.show_ids or self.show_classes):
-            # 構建標籤文字
-            label_parts = []
-            if self.show_ids:
-                label_parts.append(f"ID:{item['id']}")
-            if self.show_classes:
-                label_parts.append(item['class_name'])
+        if state == 'selected':
+            self.draw_resize_handles(painter, widget_rect, style['handle_brush'])
+        
+        self.draw_annotation_label(painter, item, widget_rect, style)
+    
+    def draw_annotation_label(self, painter, item, widget_rect, style):
+        """繪製標註標籤（背景使用原始顏色，確保標籤清晰）"""
+        label = self.label_geometry(item, widget_rect)
+        if label:
+            label_text, label_bg, text_rect = label
+            painter.setFont(style['font'])
+            painter.fillRect(label_bg, style['label_color'])
             
-            if label_parts:  # 只有當有內容要顯示時才繪製標籤
-                label_text = " ".join(label_parts)
-                
-                font = QFont("Arial", max(8, int(10 * self.scale_factor)))
-                painter.setFont(font)
-                
-                text_rect = painter.fontMetrics().boundingRect(label_text)
-                
-                # 標籤背景位置
-                label_bg = QRect(
-                    widget_rect.x(),
-                    widget_rect.y() - text_rect.height() - 4,
-                    text_rect.width() + 8,
-                    text_rect.height() + 4
-                )
-                
-                # 使用原始顏色繪製標籤背景（確保不透明）
-                label_color = QColor(base_color)
-                label_color.setAlpha(255)  # 確保標籤背景完全不透明
-                painter.fillRect(label_bg, label_color)
-                
-                # 繪製標籤文字
-                painter.setPen(QPen(Qt.white, 1))
-                text_x = label_bg.x() + 4
-                text_y = label_bg.y() + text_rect.height() + 2
-                painter.drawText(text_x, text_y, label_text)
-        
-    def draw_resize_handles(self, painter, rect, color):
-        """繪製調整手柄"""
+            # 繪製標籤文字
+            painter.setPen(self.label_text_pen)
+            text_x = label_bg.x() + 4
+            text_y = label_bg.y() + text_rect.height() + 2
+            painter.drawText(text_x, text_y, label_text)
+    
+    def draw_resize_handles(self, painter, rect, handle_brush):
+        """繪製調整手柄（handle_brush 為不透明的類別顏色）"""
         handle_size = self.resize_handle_size
-        handle_color = QColor(color)
-        handle_color.setAlpha(255)  # 確保手柄完全不透明
         
-        painter.setPen(QPen(Qt.white, 1))
-        painter.setBrush(QBrush(handle_color))
+        painter.setPen(self.label_text_pen)
+        painter.setBrush(handle_brush)
         
         # 8個調整手柄的位置
         handles = [
@@ -626,7 +900,7 @@ class AnnotatorLabel(QLabel):
         
         for handle in handles:
             painter.drawRect(handle)
-
+    
     def image_rect_to_widget_rect(self, image_rect, image_display_rect):
         """將圖片座標的矩形轉換為 widget 座標"""
         x = int(image_rect.x() * self.scale_factor + image_display_rect.x())
@@ -634,31 +908,330 @@ class AnnotatorLabel(QLabel):
         w = int(image_rect.width() * self.scale_factor)
         h = int(image_rect.height() * self.scale_factor)
         return QRect(x, y, w, h)
-
+    
     def get_rects(self):
         return self.rects
-
-    def clear_rects(self):
+    
+    def clear_rects(self, record=True):
+        if record and self._rects:
+            self.annotation_command.emit(DeleteAnnotationsCommand(self._rects.values(), '清除全部標註'))
         self.rects = []
         self.next_id = 1
         self.selected_rect_id = None
         self.hover_rect_id = None
-        self.repaint()
-
-    def delete_rect_by_id(self, rect_id):
-        self.rects = [r for r in self.rects if r['id'] != rect_id]
+        self.update()
+    
+    def delete_rect_by_id(self, rect_id, record=True):
+        item = self.rect_index.remove(rect_id)
+        if item is not None:
+            del self._rects[rect_id]
+            if record:
+                self.annotation_command.emit(DeleteAnnotationsCommand([item]))
         if self.selected_rect_id == rect_id:
             self.selected_rect_id = None
         if self.hover_rect_id == rect_id:
             self.hover_rect_id = None
-        self.repaint()
-        
+        self.invalidate_overlay()
+        self.update_rects(self.annotation_bounds(item))
+    
     def delete_selected_rect(self):
         """刪除選中的標註"""
         if self.selected_rect_id:
             self.delete_rect_by_id(self.selected_rect_id)
             self.rects_updated.emit()
 
+
+class AnnotatorLabel(AnnotationCanvasMixin, QLabel):
+    rects_updated = pyqtSignal()
+    annotation_command = pyqtSignal(object)  # 使用者操作產生的撤銷命令（由主視窗記錄到目前圖片的歷程）
+    smooth_render_ready = pyqtSignal(object)  # 背景高品質渲染結果 {'pyramid', 'scale', 'level', 'source_rect', 'offset', 'image'}
+    full_resolution_ready = pyqtSignal(object)  # 背景完整解析度解碼結果 (金字塔, QImage 或 None)
+    
+    SMOOTH_RENDER_DELAY = 120  # 互動停止多久後排程高品質渲染（毫秒）
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.init_annotation_state()
+        
+        # 可視區域渲染快取：只重新取樣目前可見（含預留邊界）的原圖區域
+        self.viewport_cache = None  # {'scale', 'level', 'source_rect'（層級座標）, 'offset', 'pixmap'}
+        self.viewport_margin = 0.5  # 預先渲染可視區域外的邊界比例（相對於元件尺寸），減少拖曳時重新取樣
+        
+        # 漸進式渲染：互動中（滾輪縮放、拖曳）先以快速取樣繪製預覽，停止後於背景執行緒平滑重新取樣
+        self.interacting = False
+        self.smooth_timer = QTimer(self)
+        self.smooth_timer.setSingleShot(True)
+        self.smooth_timer.setInterval(self.SMOOTH_RENDER_DELAY)
+        self.smooth_timer.timeout.connect(self.on_interaction_settled)
+        self.render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='viewport-render')
+        self.smooth_render_ready.connect(self.on_smooth_render_ready)
+        self.full_resolution_ready.connect(self.on_full_resolution_ready)
+        
+        # 標註圖層：未變動標註的離屏合成快取（透明背景），懸停、選取與編輯中的標註另外繪製於其上
+        self.overlay_layer = None
+        self.overlay_key = None
+        
+        self.setMouseTracking(True)
+        
+        # 設定背景
+        self.setStyleSheet("""
+            QLabel {
+                background-color: #2b2b2b;
+                border: 1px solid #555;
+            }
+        """)
+
+    def shutdown(self):
+        """關閉背景解碼與視區渲染執行緒（關閉程式時呼叫）"""
+        self.smooth_timer.stop()
+        self.render_executor.shutdown(wait=False, cancel_futures=True)
+        super().shutdown()
+    
+    def invalidate_overlay(self):
+        """標註內容或顯示樣式改變時呼叫，下次繪製時重建標註圖層"""
+        self.overlay_layer = None
+    
+    def update_rects(self, *rects):
+        """局部重繪：合併多個 widget 範圍後交由 update() 合併處理"""
+        dirty = QRect()
+        for rect in rects:
+            if rect is not None and not rect.isEmpty():
+                dirty = dirty.united(rect)
+        if not dirty.isEmpty():
+            self.update(dirty)
+    
+    def on_image_resolution_changed(self):
+        """金字塔來源換成完整解析度：重新取樣可視區域"""
+        self.viewport_cache = None
+        self.update()
+
+    def update_scaled_image(self):
+        """縮放或元件尺寸改變時呼叫：使可視區域快取失效（不再縮放整張圖片）"""
+        if self.image:
+            # 確保scale_factor是有效的
+            if self.scale_factor <= 0:
+                self.scale_factor = 1.0
+        self.viewport_cache = None
+
+    def visible_source_rect(self, widget_rect, image_rect, level=0):
+        """widget 中指定區域對應的金字塔層級像素範圍（向外取整並限制在層級內）"""
+        visible = widget_rect.intersected(image_rect)
+        if visible.isEmpty():
+            return QRect()
+        
+        level_rect = self.pyramid.level_rect(level)
+        level_scale = self.scale_factor * (2 ** level)
+        left = math.floor((visible.left() - image_rect.x()) / level_scale)
+        top = math.floor((visible.top() - image_rect.y()) / level_scale)
+        right = math.ceil((visible.right() + 1 - image_rect.x()) / level_scale)
+        bottom = math.ceil((visible.bottom() + 1 - image_rect.y()) / level_scale)
+        # 可見範圍到達縮放圖片邊緣時涵蓋到層級邊緣（避免尺寸取整遺漏最後幾列像素）
+        if visible.right() >= image_rect.right():
+            right = level_rect.width()
+        if visible.bottom() >= image_rect.bottom():
+            bottom = level_rect.height()
+        
+        source_rect = QRect(left, top, right - left, bottom - top)
+        return source_rect.intersected(level_rect)
+
+    def viewport_render_params(self, image_rect, level, margin):
+        """計算可視區域（含邊界比例 margin）的層級來源範圍、相對圖片左上角的位置與目標尺寸"""
+        margin_x = int(self.width() * margin)
+        margin_y = int(self.height() * margin)
+        source_rect = self.visible_source_rect(
+            self.rect().adjusted(-margin_x, -margin_y, margin_x, margin_y), image_rect, level
+        )
+        
+        # 以四捨五入後的邊界計算目標尺寸，相鄰快取區域可無縫對齊
+        level_scale = self.scale_factor * (2 ** level)
+        target_left = int(round(source_rect.left() * level_scale))
+        target_top = int(round(source_rect.top() * level_scale))
+        target_width = max(1, int(round((source_rect.right() + 1) * level_scale)) - target_left)
+        target_height = max(1, int(round((source_rect.bottom() + 1) * level_scale)) - target_top)
+        return source_rect, QPoint(target_left, target_top), (target_width, target_height)
+
+    @staticmethod
+    def build_smooth_image(pyramid, level, source_rect, target_size):
+        """高品質重新取樣（只使用QImage，可在背景執行緒執行）"""
+        source = pyramid.render_region(level, source_rect)
+        return source.scaled(target_size[0], target_size[1], Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+    def render_viewport(self, image_rect):
+        """
+        取得目前可視區域的縮放圖片（快取），回傳 (pixmap, 繪製位置)
+        
+        從金字塔中最接近顯示倍率的層級，只對可見區域加上邊界重新取樣，
+        記憶體用量受元件尺寸限制而非縮放倍率或原圖大小；
+        快取以圖片左上角為基準，只要縮放倍率不變且需要的區域仍在快取內即可重複使用。
+        互動中改以快速預覽繪製，高品質結果由背景執行緒完成後替換。
+        """
+        cache = self.viewport_cache
+        if cache is not None and cache['scale'] == self.scale_factor:
+            needed = self.visible_source_rect(self.rect(), image_rect, cache['level'])
+            if needed.isEmpty():
+                return None, None
+            if cache['source_rect'].contains(needed):
+                return cache['pixmap'], image_rect.topLeft() + cache['offset']
+        
+        self.request_full_resolution()
+        level = self.pyramid.level_for_scale(self.scale_factor)
+        if self.visible_source_rect(self.rect(), image_rect, level).isEmpty():
+            return None, None
+        
+        if self.interacting:
+            cache = self.render_fast_preview(image_rect, level)
+            self.smooth_timer.start()
+        else:
+            source_rect, offset, target_size = self.viewport_render_params(image_rect, level, self.viewport_margin)
+            image = self.build_smooth_image(self.pyramid, level, source_rect, target_size)
+            cache = {
+                'scale': self.scale_factor,
+                'level': level,
+                'source_rect': source_rect,
+                'offset': offset,
+                'pixmap': QPixmap.fromImage(image),
+                'smooth': True
+            }
+        self.viewport_cache = cache
+        return cache['pixmap'], image_rect.topLeft() + cache['offset']
+
+    def render_fast_preview(self, image_rect, level):
+        """
+        互動中的快速預覽：只繪製可見區域，並從較粗一層取樣（縮小時）以最近鄰縮放，
+        直接繪製圖塊而不建立中間影像。
+        """
+        if self.scale_factor < 1.0:
+            level = min(level + 1, self.pyramid.level_count - 1)
+        source_rect, offset, target_size = self.viewport_render_params(image_rect, level, 0)
+        
+        pixmap = QPixmap(target_size[0], target_size[1])
+        pixmap.fill(QColor('#2b2b2b'))
+        painter = QPainter(pixmap)
+        self.pyramid.draw_region(painter, level, source_rect, QRectF(0, 0, target_size[0], target_size[1]))
+        painter.end()
+        
+        return {
+            'scale': self.scale_factor,
+            'level': level,
+            'source_rect': source_rect,
+            'offset': offset,
+            'pixmap': pixmap,
+            'smooth': False
+        }
+
+    def mark_interacting(self):
+        """標記正在互動（滾輪縮放或拖曳），延後高品質渲染"""
+        self.interacting = True
+        self.smooth_timer.start()
+
+    def on_interaction_settled(self):
+        """互動停止：於背景執行緒排程高品質重新取樣"""
+        self.interacting = False
+        cache = self.viewport_cache
+        if not self.image or (cache is not None and cache.get('smooth')):
+            return
+        
+        image_rect = self.get_image_rect()
+        level = self.pyramid.level_for_scale(self.scale_factor)
+        source_rect, offset, target_size = self.viewport_render_params(image_rect, level, self.viewport_margin)
+        if source_rect.isEmpty():
+            return
+        
+        pyramid = self.pyramid
+        scale = self.scale_factor
+        
+        def render():
+            # 開始前若視圖已再次改變則放棄（結果也會在主執行緒再檢查一次）
+            if pyramid is not self.pyramid or scale != self.scale_factor:
+                return
+            image = self.build_smooth_image(pyramid, level, source_rect, target_size)
+            self.smooth_render_ready.emit({
+                'pyramid': pyramid, 'scale': scale, 'level': level,
+                'source_rect': source_rect, 'offset': offset, 'image': image
+            })
+        
+        self.render_executor.submit(render)
+
+    def on_smooth_render_ready(self, result):
+        """背景高品質渲染完成：若仍對應目前的圖片與縮放倍率則替換預覽"""
+        if result['pyramid'] is not self.pyramid or result['scale'] != self.scale_factor:
+            return
+        self.viewport_cache = {
+            'scale': result['scale'],
+            'level': result['level'],
+            'source_rect': result['source_rect'],
+            'offset': result['offset'],
+            'pixmap': QPixmap.fromImage(result['image']),
+            'smooth': True
+        }
+        self.update()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.image:
+            return
+        
+        dirty = event.rect()
+        painter = QPainter(self)
+        image_rect = self.get_image_rect()
+        
+        # 圖片：只貼上可視區域快取中需要重繪的部分
+        viewport_pixmap, viewport_pos = self.render_viewport(image_rect)
+        if viewport_pixmap is not None:
+            target = dirty.intersected(QRect(viewport_pos, viewport_pixmap.size()))
+            if not target.isEmpty():
+                painter.drawPixmap(target, viewport_pixmap, target.translated(-viewport_pos))
+        
+        if not self.annotations_visible:
+            return
+        
+        # 標註圖層（未變動的標註）
+        painter.drawPixmap(dirty, self.get_overlay_layer(image_rect), dirty)
+        
+        painter.setRenderHint(QPainter.Antialiasing)
+        
+        # 懸停與選中的標註繪製於標註圖層之上（選中者最後繪製）
+        for rect_id in (self.hover_rect_id, self.selected_rect_id):
+            item = self.rect_index.get(rect_id) if rect_id else None
+            if item and self.annotation_bounds(item).intersects(dirty):
+                self.draw_annotation(painter, item, image_rect)
+        
+        # 繪製正在繪製的標註框
+        if self.current_rect:
+            color = self.get_class_color(self.class_id)
+            pen = QPen(color, 2, Qt.DashLine)
+            painter.setPen(pen)
+            # 確保正在繪製的標註框也不填充
+            painter.setBrush(Qt.NoBrush)
+            widget_rect = self.image_rect_to_widget_rect(self.current_rect, image_rect)
+            painter.drawRect(widget_rect)
+
+    def get_overlay_layer(self, image_rect):
+        """
+        取得標註圖層：所有標註的一般樣式（編輯中的標註除外），透明背景的離屏 QPixmap
+        
+        只在視圖變換、元件尺寸或編輯狀態改變時重建；標註內容或顯示選項變動時由 invalidate_overlay 標記重建。
+        圖片的高品質重新取樣完成時不需重建。
+        """
+        excluded_id = self.selected_rect_id if self.editing_mode else None
+        key = (image_rect.x(), image_rect.y(), image_rect.width(), image_rect.height(),
+               self.width(), self.height(), excluded_id)
+        
+        if self.overlay_layer is None or self.overlay_key != key:
+            layer = QPixmap(self.size())
+            layer.fill(Qt.transparent)
+            painter = QPainter(layer)
+            painter.setRenderHint(QPainter.Antialiasing)
+            visible = self.visible_annotations(image_rect, excluded_id)
+            self.draw_annotation_boxes(painter, visible)
+            self.draw_annotation_labels(painter, visible)
+            painter.end()
+            self.overlay_layer = layer
+            self.overlay_key = key
+        
+        return self.overlay_layer
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
         if self.image:
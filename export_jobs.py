@@ -0,0 +1,210 @@
+"""
+背景匯出工作模組 - 匯出工作佇列、進度與剩餘時間回報、取消與續傳
+
+匯出在背景執行緒依序執行，標註工具在匯出期間可正常使用。
+取消後已完成的部分保留在增量匯出清單中，再次提交相同工作即從中斷處續傳。
+"""
+
+import time
+import queue
+import threading
+import itertools
+from typing import Optional, Callable, Dict, List
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from advanced_exporter import AdvancedExporter
+
+
+class ExportJob:
+    """單一匯出工作"""
+
+    def __init__(self, job_id: int, description: str,
+                 task: Callable[[Callable[[int, int], None], Callable[[], bool]], Dict]):
+        self.job_id = job_id
+        self.description = description
+        self.task = task                    # task(progress_callback, cancel_check) -> 結果字典
+        self.cancel_event = threading.Event()
+        self.status = 'queued'              # queued / running / finished / failed / cancelled
+        self.started_at = None
+        self.current = 0
+        self.total = 0
+
+    def is_cancelled(self) -> bool:
+        """是否已要求取消"""
+        return self.cancel_event.is_set()
+
+    def estimate_remaining(self) -> float:
+        """依目前速度估計剩餘秒數，無法估計時回傳 -1"""
+        if not self.started_at or self.current <= 0 or self.total <= 0:
+            return -1.0
+        elapsed = time.monotonic() - self.started_at
+        return elapsed / self.current * max(self.total - self.current, 0)
+
+
+class ExportJobRunner(QThread):
+    """
+    匯出工作執行緒（依提交順序逐一執行佇列中的工作）
+
+    第一次提交時啟動，之後常駐並阻塞等待佇列，shutdown() 送出結束標記後才離開。
+    jobs 只保存排隊中與執行中的工作，結束的工作（及其持有的標註快照）隨即釋放。
+    """
+
+    job_queued = pyqtSignal(int, str)                   # 工作ID, 描述
+    job_started = pyqtSignal(int, str)                  # 工作ID, 描述
+    job_progress = pyqtSignal(int, int, int, float)     # 工作ID, 當前, 總數, 剩餘秒數（-1 表示未知）
+    job_finished = pyqtSignal(int, dict)                # 工作ID, 結果
+    job_cancelled = pyqtSignal(int, dict)               # 工作ID, 已完成部分的結果
+    job_failed = pyqtSignal(int, str)                   # 工作ID, 錯誤訊息
+
+    PROGRESS_INTERVAL = 0.1  # 進度信號最短間隔（秒），避免大量小檔案時淹沒事件佇列
+
+    def __init__(self, exporter: Optional[AdvancedExporter] = None):
+        super().__init__()
+        self.exporter = exporter or AdvancedExporter()
+        self.job_queue = queue.Queue()
+        self.jobs = {}                      # 排隊中與執行中的工作 {工作ID: 工作}
+        self.current_job = None
+        self._started = False
+        self._stopped = False
+        self._id_counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, description: str,
+               task: Callable[[Callable[[int, int], None], Callable[[], bool]], Dict]) -> int:
+        """提交匯出工作，回傳工作ID"""
+        job = ExportJob(next(self._id_counter), description, task)
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("匯出工作執行緒已停止")
+            self.jobs[job.job_id] = job
+            self.job_queue.put(job)
+            start_needed = not self._started
+            self._started = True
+
+        self.job_queued.emit(job.job_id, description)
+        if start_needed:
+            self.start()
+        return job.job_id
+
+    def submit_incremental_export(self, images_data: List[Dict], output_dir: str, fmt: str = 'YOLO',
+                                  scope_paths: Optional[List[str]] = None) -> int:
+        """提交逐圖格式增量匯出工作（完成後一併匯出類別檔案）"""
+        scope_paths = list(scope_paths) if scope_paths is not None else None
+
+        def task(progress_callback, cancel_check):
+            stats = self.exporter.incremental_export(
+                images_data, output_dir, fmt, progress_callback=progress_callback,
+                scope_paths=scope_paths, cancel_check=cancel_check
+            )
+            self.exporter.export_classes_file(output_dir)
+            stats['output_dir'] = output_dir
+            stats['total_annotations'] = sum(len(img_data['annotations']) for img_data in images_data)
+            return stats
+
+        return self.submit(f'{fmt} 批次匯出', task)
+
+    def submit_batch_export(self, images_data: List[Dict], output_dir: str, formats: List[str],
+                            scope_paths: Optional[List[str]] = None,
+                            export_options: Optional[Dict] = None) -> int:
+        """提交多格式批次匯出工作"""
+        scope_paths = list(scope_paths) if scope_paths is not None else None
+        formats = list(formats)
+
+        def task(progress_callback, cancel_check):
+            results = self.exporter.batch_export(
+                images_data, output_dir, formats, scope_paths=scope_paths,
+                export_options=export_options, progress_callback=progress_callback,
+                cancel_check=cancel_check
+            )
+            results['output_dir'] = output_dir
+            return results
+
+        return self.submit(f'進階匯出 ({", ".join(formats)})', task)
+
+    def cancel(self, job_id: int) -> bool:
+        """取消指定工作（排隊中的工作不會執行，執行中的工作在下一張圖片前停止）"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if not job or job.status not in ('queued', 'running'):
+                return False
+            job.cancel_event.set()
+            return True
+
+    def cancel_all(self):
+        """取消所有排隊中與執行中的工作"""
+        with self._lock:
+            job_ids = list(self.jobs.keys())
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    def pending_count(self) -> int:
+        """排隊中與執行中的工作數量"""
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job.status in ('queued', 'running'))
+
+    def shutdown(self, timeout_ms: int = 5000) -> bool:
+        """取消所有工作並送出結束標記，等待執行緒結束（關閉視窗時呼叫）"""
+        self.cancel_all()
+        with self._lock:
+            self._stopped = True
+            started = self._started
+        if not started:
+            return True
+        self.job_queue.put(None)
+        return self.wait(timeout_ms)
+
+    def run(self):
+        """依序執行佇列中的工作（阻塞等待新工作，收到結束標記 None 時離開）"""
+        while True:
+            job = self.job_queue.get()
+            if job is None:
+                break
+
+            if job.is_cancelled():
+                self._finish_job(job, 'cancelled')
+                self.job_cancelled.emit(job.job_id, {})
+                continue
+
+            self._run_job(job)
+
+    def _finish_job(self, job: ExportJob, status: str):
+        """記錄工作結束狀態並自工作清單移除"""
+        with self._lock:
+            job.status = status
+            self.jobs.pop(job.job_id, None)
+
+    def _run_job(self, job: ExportJob):
+        """執行單一工作並回報結果"""
+        self.current_job = job
+        with self._lock:
+            job.status = 'running'
+        job.started_at = time.monotonic()
+        self.job_started.emit(job.job_id, job.description)
+
+        last_emit = 0.0
+
+        def progress_callback(current, total):
+            nonlocal last_emit
+            job.current = current
+            job.total = total
+            now = time.monotonic()
+            if current >= total or now - last_emit >= self.PROGRESS_INTERVAL:
+                last_emit = now
+                self.job_progress.emit(job.job_id, current, total, job.estimate_remaining())
+
+        try:
+            results = job.task(progress_callback, job.is_cancelled)
+            if job.is_cancelled() or results.get('cancelled'):
+                self._finish_job(job, 'cancelled')
+                self.job_cancelled.emit(job.job_id, results)
+            else:
+                self._finish_job(job, 'finished')
+                self.job_finished.emit(job.job_id, results)
+        except Exception as e:
+            import traceback
+            print(f"匯出工作錯誤詳細資訊: {traceback.format_exc()}")
+            self._finish_job(job, 'failed')
+            self.job_failed.emit(job.job_id, str(e))
+        finally:
+            job.task = None  # 釋放工作閉包持有的標註快照
+            self.current_job = None
@@ -30,10 +30,13 @@ class FileManager:
         self.recent_files_path = os.path.join(self.config_dir, "recent_files.json")
         self.projects_dir = os.path.join(self.config_dir, "projects")
         self.backups_dir = os.path.join(self.config_dir, "backups")
+        self.thumbnails_dir = os.path.join(self.config_dir, "thumbnails")
+        self.frames_dir = os.path.join(self.config_dir, "frames")  # 解碼畫面快取（啟用時才建立）
         
         # 建立目錄
         os.makedirs(self.projects_dir, exist_ok=True)
         os.makedirs(self.backups_dir, exist_ok=True)
+        os.makedirs(self.thumbnails_dir, exist_ok=True)
         
         # 載入最近開啟的檔案
         self.recent_files = self.load_recent_files()
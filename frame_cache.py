@@ -0,0 +1,215 @@
+"""
+原始畫面快取模組 - 以記憶體映射檔保存解碼後的像素
+
+完整解析度解碼的結果以 .npy（BGRX 位元組順序，uint8，(高, 寬, 4)）存放在暫存目錄，
+檔名為 圖片絕對路徑 + 修改時間 + 檔案大小 的雜湊，原圖修改後自動對應到新的檔案。
+讀取時以 np.load(mmap_mode='r') 映射，不複製像素：GUI 直接包裝為 Format_RGB32 的 QImage，
+AI 流程取前三個通道即為 OpenCV 的 BGR；其他行程以同一個目錄建立 RawFrameCache 即可共用同一份檔案。
+磁碟用量有上限，超過時刪除最久未使用的檔案（存取時更新檔案時間，重新啟動後依檔案時間重建順序）。
+有透明度的圖片不快取，仍由呼叫端以原本的方式解碼。
+"""
+
+import os
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_FRAME_CACHE_DISK_SIZE = 8 * 1024 * 1024 * 1024  # 磁碟用量上限 8GB
+FRAME_FILE_SUFFIX = '.npy'
+
+# 全程式共用的畫面快取（未啟用時為 None）
+_shared_frame_cache: Optional['RawFrameCache'] = None
+
+
+def set_shared_frame_cache(cache: Optional['RawFrameCache']):
+    """設定全程式共用的畫面快取（None 為停用）"""
+    global _shared_frame_cache
+    _shared_frame_cache = cache
+
+
+def shared_frame_cache() -> Optional['RawFrameCache']:
+    """取得全程式共用的畫面快取，未啟用時回傳 None"""
+    return _shared_frame_cache
+
+
+class RawFrameCache:
+    """以記憶體映射檔保存的解碼畫面快取（可由多個執行緒與行程同時使用）"""
+
+    def __init__(self, cache_dir: str, max_disk_size: int = DEFAULT_FRAME_CACHE_DISK_SIZE):
+        self.cache_dir = cache_dir
+        self.max_disk_size = max_disk_size
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries = OrderedDict()  # {檔名: 位元組數}，最久未使用者在前
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.scan()
+
+    def scan(self):
+        """依檔案時間重建 LRU 順序（並刪除中斷寫入留下的暫存檔）"""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.name.endswith('.tmp'):
+                    os.remove(entry.path)
+                elif entry.name.endswith(FRAME_FILE_SUFFIX):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime_ns, entry.name, stat.st_size))
+            except OSError:
+                continue
+        files.sort()
+        with self.lock:
+            self.entries = OrderedDict((name, size) for _, name, size in files)
+            self.disk_size = sum(size for _, _, size in files)
+            self._evict_locked()
+
+    @staticmethod
+    def frame_name(image_path: str) -> Optional[str]:
+        """快取檔名（原圖不存在時回傳 None）"""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        identity = f'{os.path.normcase(os.path.abspath(image_path))}|{stat.st_mtime_ns}|{stat.st_size}'
+        return hashlib.sha1(identity.encode('utf-8')).hexdigest() + FRAME_FILE_SUFFIX
+
+    @staticmethod
+    def decode(image_path: str) -> Optional[np.ndarray]:
+        """以完整解析度解碼為 BGRX 陣列（有透明度的圖片回傳 None）"""
+        with Image.open(image_path) as img:
+            if 'A' in img.mode or 'transparency' in img.info:
+                return None
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            width, height = img.size
+            return np.frombuffer(img.tobytes('raw', 'BGRX'), dtype=np.uint8).reshape(height, width, 4)
+
+    def get(self, image_path: str) -> Optional[np.ndarray]:
+        """取得快取的畫面（唯讀記憶體映射陣列），沒有時回傳 None"""
+        name = self.frame_name(image_path)
+        if name is None:
+            return None
+        path = os.path.join(self.cache_dir, name)
+        try:
+            frame = np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            print(f"讀取畫面快取錯誤: {e}")
+            self.remove(name)
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+            if name in self.entries:
+                self.entries.move_to_end(name)
+            else:
+                # 由其他行程寫入的檔案
+                size = os.path.getsize(path)
+                self.entries[name] = size
+                self.disk_size += size
+        try:
+            os.utime(path)  # 記錄存取時間，重新啟動後仍維持 LRU 順序
+        except OSError:
+            pass
+        return frame
+
+    def put(self, image_path: str, pixels: np.ndarray) -> Optional[np.ndarray]:
+        """寫入畫面並回傳記憶體映射的唯讀陣列（超過磁碟上限或寫入失敗時回傳 None）"""
+        name = self.frame_name(image_path)
+        if name is None or pixels.nbytes > self.max_disk_size:
+            return None
+        path = os.path.join(self.cache_dir, name)
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                np.save(f, pixels)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"寫入畫面快取錯誤: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return None
+
+        with self.lock:
+            self.disk_size += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+            self._evict_locked()
+        try:
+            return np.load(path, mmap_mode='r')
+        except Exception:
+            return None
+
+    def load(self, image_path: str) -> Optional[np.ndarray]:
+        """
+        取得 BGRX 畫面：快取命中時直接映射，否則解碼並寫入快取
+
+        有透明度的圖片回傳 None；寫入快取失敗時回傳解碼的記憶體陣列。
+        """
+        frame = self.get(image_path)
+        if frame is not None:
+            return frame
+        pixels = self.decode(image_path)
+        if pixels is None:
+            return None
+        frame = self.put(image_path, pixels)
+        return frame if frame is not None else pixels
+
+    def load_bgr(self, image_path: str) -> Optional[np.ndarray]:
+        """取得 OpenCV 使用的 BGR 畫面（BGRX 陣列前三個通道的唯讀、非連續檢視，不複製像素）"""
+        frame = self.load(image_path)
+        return frame[:, :, :3] if frame is not None else None
+
+    def remove(self, name: str):
+        """刪除快取檔案"""
+        with self.lock:
+            self._remove_locked(name)
+
+    def _remove_locked(self, name: str) -> bool:
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False  # 仍被映射中（Windows）等情況，保留紀錄待之後再刪除
+        self.disk_size -= self.entries.pop(name, 0)
+        return True
+
+    def _evict_locked(self):
+        """刪除最久未使用的檔案直到低於磁碟上限（已映射的陣列在 POSIX 上仍可繼續使用）"""
+        for name in list(self.entries):
+            if self.disk_size <= self.max_disk_size:
+                break
+            self._remove_locked(name)
+
+    def clear(self):
+        """刪除所有快取檔案"""
+        with self.lock:
+            for name in list(self.entries):
+                self._remove_locked(name)
+
+    def get_stats(self) -> Dict:
+        """取得快取統計"""
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'frame_count': len(self.entries),
+                'disk_size_mb': self.disk_size / (1024 * 1024),
+                'max_disk_size_mb': self.max_disk_size / (1024 * 1024),
+                'hit_ratio': self.hits / requests if requests else 0.0,
+                'hits': self.hits,
+                'misses': self.misses
+            }
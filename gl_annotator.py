@@ -0,0 +1,364 @@
+"""
+OpenGL 標註畫布模組 - 以 GPU 繪製圖片與標註框的 AnnotatorLabel 替代元件
+
+圖片上傳為多層 mipmap 貼圖（超過貼圖尺寸上限時切成多張），縮放與拖曳只更新著色器的變換參數；
+所有標註框以原圖座標寫入單一頂點緩衝區，標註內容改變時才重建，一次 draw call 繪製完成。
+標籤文字（依細節層級門檻省略過小標註的標籤）、懸停與選取樣式、調整手柄仍以 QPainter 疊加繪製。
+
+公開介面（set_image、rects、get_rects、rects_updated…）與 AnnotatorLabel 相同，
+與繪製方式無關的部分（座標轉換、滑鼠編輯、空間索引查詢）繼承自 AnnotationCanvasMixin。
+無法建立著色器時自動改以 QPainter 繪製。
+"""
+
+import numpy as np
+from PyQt5.QtWidgets import QOpenGLWidget
+from PyQt5.QtGui import (QPainter, QPen, QColor, QOpenGLShader, QOpenGLShaderProgram,
+                         QOpenGLBuffer, QOpenGLTexture)
+from PyQt5.QtCore import Qt, QRect, QRectF, pyqtSignal
+
+from annotator import AnnotationCanvasMixin
+
+TEXTURE_TILE_SIZE = 4096     # 單張貼圖邊長上限（OpenGL 實作普遍支援的尺寸）
+BOX_LINE_WIDTH = 2.0         # 一般標註框線寬（像素）
+
+# OpenGL 常數（PyQt5 未匯出）
+GL_FLOAT = 0x1406
+GL_LINES = 0x0001
+GL_TRIANGLE_STRIP = 0x0005
+GL_BLEND = 0x0BE2
+GL_SRC_ALPHA = 0x0302
+GL_ONE_MINUS_SRC_ALPHA = 0x0303
+GL_TEXTURE0 = 0x84C0
+
+_VERTEX_PRELUDE = """
+attribute vec2 position;
+uniform vec2 viewport;
+uniform vec3 transform;   // 縮放倍率、圖片左上角 x、y（widget 座標）
+vec4 to_clip(vec2 image_point) {
+    vec2 p = image_point * transform.x + transform.yz;
+    return vec4(p.x / viewport.x * 2.0 - 1.0, 1.0 - p.y / viewport.y * 2.0, 0.0, 1.0);
+}
+"""
+
+_FRAGMENT_PRELUDE = """
+#ifdef GL_ES
+precision mediump float;
+#endif
+"""
+
+IMAGE_VERTEX_SHADER = _VERTEX_PRELUDE + """
+attribute vec2 texcoord;
+varying vec2 v_texcoord;
+void main() {
+    gl_Position = to_clip(position);
+    v_texcoord = texcoord;
+}
+"""
+
+IMAGE_FRAGMENT_SHADER = _FRAGMENT_PRELUDE + """
+uniform sampler2D image;
+varying vec2 v_texcoord;
+void main() {
+    gl_FragColor = texture2D(image, v_texcoord);
+}
+"""
+
+LINE_VERTEX_SHADER = _VERTEX_PRELUDE + """
+attribute vec4 color;
+varying vec4 v_color;
+void main() {
+    gl_Position = to_clip(position);
+    v_color = color;
+}
+"""
+
+LINE_FRAGMENT_SHADER = _FRAGMENT_PRELUDE + """
+varying vec4 v_color;
+void main() {
+    gl_FragColor = v_color;
+}
+"""
+
+
+def build_box_vertices(items, colors) -> np.ndarray:
+    """
+    標註框的線段頂點陣列（float32，每列 x, y, r, g, b, a；每個框 4 條邊共 8 個頂點）
+
+    座標為原圖像素並位移半個像素，使 2 像素線寬在整數倍率下對齊像素格線。
+    """
+    if not items:
+        return np.zeros((0, 6), dtype=np.float32)
+
+    boxes = np.array([(item['rect'].left(), item['rect'].top(),
+                       item['rect'].right() + 1, item['rect'].bottom() + 1) for item in items],
+                     dtype=np.float32) + 0.5
+    left, top, right, bottom = boxes.T
+    corners = np.stack([left, top, right, top, right, top, right, bottom,
+                        right, bottom, left, bottom, left, bottom, left, top], axis=1)
+
+    vertices = np.empty((len(items) * 8, 6), dtype=np.float32)
+    vertices[:, :2] = corners.reshape(-1, 2)
+    vertices[:, 2:] = np.repeat(np.asarray(colors, dtype=np.float32), 8, axis=0)
+    return vertices
+
+
+class GLAnnotatorCanvas(AnnotationCanvasMixin, QOpenGLWidget):
+    """以 OpenGL 繪製的標註畫布（介面與 AnnotatorLabel 相同）"""
+
+    rects_updated = pyqtSignal()
+    annotation_command = pyqtSignal(object)
+    full_resolution_ready = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.init_annotation_state()
+        self.setMouseTracking(True)
+        self.full_resolution_ready.connect(self.on_full_resolution_ready)
+
+        # GPU 資源（需在 OpenGL context 中建立與釋放）
+        self.gl = None
+        self.native_rendering = False     # 著色器可用時以 OpenGL 繪製，否則退回 QPainter
+        self.image_program = None
+        self.line_program = None
+        self.textures = []                # [(QOpenGLTexture, 頂點起點)]
+        self.texture_buffer = None        # 各貼圖四邊形頂點（x, y, s, t）
+        self.textures_dirty = False
+        self.box_buffer = None            # 標註框線段頂點（x, y, r, g, b, a）
+        self.box_vertex_count = 0
+        self.box_key = None
+        self.boxes_dirty = True
+
+    def set_image(self, image_input, image_path=None):
+        super().set_image(image_input, image_path)
+        self.textures_dirty = True
+        self.update()
+
+    def on_image_resolution_changed(self):
+        """金字塔來源換成完整解析度：重新上傳貼圖"""
+        self.textures_dirty = True
+        self.update()
+
+    def update_scaled_image(self):
+        """縮放改變只需更新變換參數"""
+        if self.image and self.scale_factor <= 0:
+            self.scale_factor = 1.0
+
+    def mark_interacting(self):
+        """GPU 以 mipmap 取樣，互動中不需要快速預覽"""
+
+    def invalidate_overlay(self):
+        """標註內容或顯示樣式改變：下次繪製時重建標註框頂點緩衝區"""
+        self.boxes_dirty = True
+
+    def update_rects(self, *rects):
+        """OpenGL 每次繪製整個畫面，局部重繪範圍直接合併為整體更新"""
+        self.update()
+
+    def initializeGL(self):
+        self.gl = self.context().versionFunctions()
+        self.native_rendering = False
+        if self.gl is None:
+            print("OpenGL 初始化錯誤: 無法取得 OpenGL 函式，改以 QPainter 繪製")
+            return
+        self.gl.initializeOpenGLFunctions()
+
+        try:
+            self.image_program = self.build_program(IMAGE_VERTEX_SHADER, IMAGE_FRAGMENT_SHADER)
+            self.line_program = self.build_program(LINE_VERTEX_SHADER, LINE_FRAGMENT_SHADER)
+        except Exception as e:
+            print(f"OpenGL 著色器錯誤: {e}，改以 QPainter 繪製")
+            return
+
+        self.texture_buffer = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.texture_buffer.create()
+        self.box_buffer = QOpenGLBuffer(QOpenGLBuffer.VertexBuffer)
+        self.box_buffer.setUsagePattern(QOpenGLBuffer.DynamicDraw)
+        self.box_buffer.create()
+        self.textures_dirty = True
+        self.boxes_dirty = True
+        self.native_rendering = True
+        self.context().aboutToBeDestroyed.connect(self.release_gl_resources)
+
+    def build_program(self, vertex_source, fragment_source):
+        """編譯並連結著色器程式"""
+        program = QOpenGLShaderProgram(self)
+        if not program.addShaderFromSourceCode(QOpenGLShader.Vertex, vertex_source):
+            raise Exception(program.log())
+        if not program.addShaderFromSourceCode(QOpenGLShader.Fragment, fragment_source):
+            raise Exception(program.log())
+        if not program.link():
+            raise Exception(program.log())
+        return program
+
+    def release_gl_resources(self):
+        """釋放 GPU 資源（context 銷毀前呼叫）"""
+        self.makeCurrent()
+        self.destroy_textures()
+        for buffer in (self.texture_buffer, self.box_buffer):
+            if buffer is not None:
+                buffer.destroy()
+        self.texture_buffer = None
+        self.box_buffer = None
+        self.native_rendering = False
+        self.doneCurrent()
+
+    def destroy_textures(self):
+        for texture, _ in self.textures:
+            texture.destroy()
+        self.textures = []
+
+    def upload_textures(self):
+        """將目前圖片上傳為 mipmap 貼圖（大圖切成多張；縮小解碼的圖片以原圖座標放大貼上）"""
+        self.destroy_textures()
+        self.textures_dirty = False
+        if not self.image:
+            return
+
+        width, height = self.image.width(), self.image.height()
+        reduction = 2 ** self.pyramid.base_level
+        full_width, full_height = self.image_size.width(), self.image_size.height()
+        quads = []
+        for y in range(0, height, TEXTURE_TILE_SIZE):
+            for x in range(0, width, TEXTURE_TILE_SIZE):
+                rect = QRect(x, y, min(TEXTURE_TILE_SIZE, width - x), min(TEXTURE_TILE_SIZE, height - y))
+                # 不翻轉影像：第一列對應 t=0，頂點的 t 座標由上而下遞增
+                texture = QOpenGLTexture(self.image.copy(rect), QOpenGLTexture.GenerateMipMaps)
+                texture.setMinMagFilters(QOpenGLTexture.LinearMipMapLinear, QOpenGLTexture.Linear)
+                texture.setWrapMode(QOpenGLTexture.ClampToEdge)
+                self.textures.append((texture, len(quads) * 4))
+                left, top = rect.x() * reduction, rect.y() * reduction
+                right = min(left + rect.width() * reduction, full_width)
+                bottom = min(top + rect.height() * reduction, full_height)
+                quads.append([(left, top, 0.0, 0.0), (right, top, 1.0, 0.0),
+                              (left, bottom, 0.0, 1.0), (right, bottom, 1.0, 1.0)])
+
+        vertices = np.ascontiguousarray(quads, dtype=np.float32)
+        self.texture_buffer.bind()
+        self.texture_buffer.allocate(vertices, vertices.nbytes)
+        self.texture_buffer.release()
+
+    def update_box_buffer(self):
+        """標註或編輯狀態改變時重建標註框頂點緩衝區（編輯中的標註另外繪製）"""
+        excluded_id = self.selected_rect_id if self.editing_mode else None
+        if not self.boxes_dirty and self.box_key == excluded_id:
+            return
+
+        items = [item for item in self._rects.values() if item['id'] != excluded_id]
+        colors = [self.get_render_style(item['class_id'], 'normal')['pen'].color().getRgbF() for item in items]
+        vertices = build_box_vertices(items, colors)
+
+        self.box_buffer.bind()
+        if len(vertices):
+            self.box_buffer.allocate(vertices, vertices.nbytes)
+        self.box_buffer.release()
+        self.box_vertex_count = len(vertices)
+        self.box_key = excluded_id
+        self.boxes_dirty = False
+
+    def set_transform_uniforms(self, program, image_rect):
+        program.setUniformValue('viewport', float(max(self.width(), 1)), float(max(self.height(), 1)))
+        program.setUniformValue('transform', float(self.scale_factor),
+                                float(image_rect.x()), float(image_rect.y()))
+
+    def draw_image_native(self, image_rect):
+        """繪製圖片貼圖（以 mipmap 三線性取樣）"""
+        if self.textures_dirty:
+            self.upload_textures()
+        if not self.textures:
+            return
+
+        program = self.image_program
+        program.bind()
+        self.set_transform_uniforms(program, image_rect)
+        program.setUniformValue('image', 0)
+
+        self.texture_buffer.bind()
+        position = program.attributeLocation('position')
+        texcoord = program.attributeLocation('texcoord')
+        program.enableAttributeArray(position)
+        program.enableAttributeArray(texcoord)
+        program.setAttributeBuffer(position, GL_FLOAT, 0, 2, 16)
+        program.setAttributeBuffer(texcoord, GL_FLOAT, 8, 2, 16)
+
+        self.gl.glActiveTexture(GL_TEXTURE0)
+        for texture, first_vertex in self.textures:
+            texture.bind()
+            self.gl.glDrawArrays(GL_TRIANGLE_STRIP, first_vertex, 4)
+            texture.release()
+
+        program.disableAttributeArray(position)
+        program.disableAttributeArray(texcoord)
+        self.texture_buffer.release()
+        program.release()
+
+    def draw_boxes_native(self, image_rect):
+        """以單次 draw call 繪製所有一般狀態的標註框"""
+        self.update_box_buffer()
+        if not self.box_vertex_count:
+            return
+
+        program = self.line_program
+        program.bind()
+        self.set_transform_uniforms(program, image_rect)
+
+        self.box_buffer.bind()
+        position = program.attributeLocation('position')
+        color = program.attributeLocation('color')
+        program.enableAttributeArray(position)
+        program.enableAttributeArray(color)
+        program.setAttributeBuffer(position, GL_FLOAT, 0, 2, 24)
+        program.setAttributeBuffer(color, GL_FLOAT, 8, 4, 24)
+
+        self.gl.glLineWidth(BOX_LINE_WIDTH * self.devicePixelRatioF())
+        self.gl.glDrawArrays(GL_LINES, 0, self.box_vertex_count)
+
+        program.disableAttributeArray(position)
+        program.disableAttributeArray(color)
+        self.box_buffer.release()
+        program.release()
+
+    def paintGL(self):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0x2b, 0x2b, 0x2b))
+        if not self.image:
+            painter.end()
+            return
+
+        self.request_full_resolution()
+        image_rect = self.get_image_rect()
+        if self.native_rendering:
+            painter.beginNativePainting()
+            self.gl.glEnable(GL_BLEND)
+            self.gl.glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+            self.draw_image_native(image_rect)
+            if self.annotations_visible:
+                self.draw_boxes_native(image_rect)
+            painter.endNativePainting()
+        else:
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            level = self.pyramid.level_for_scale(self.scale_factor)
+            self.pyramid.draw_region(painter, level, self.pyramid.level_rect(level), QRectF(image_rect))
+
+        if self.annotations_visible:
+            self.draw_annotation_overlay(painter, image_rect)
+        painter.end()
+
+    def draw_annotation_overlay(self, painter, image_rect):
+        """以 QPainter 疊加標籤、懸停與選取樣式、調整手柄及正在繪製的標註框"""
+        painter.setRenderHint(QPainter.Antialiasing)
+        excluded_id = self.selected_rect_id if self.editing_mode else None
+        visible = self.visible_annotations(image_rect, excluded_id)
+        if not self.native_rendering:
+            self.draw_annotation_boxes(painter, visible)
+        self.draw_annotation_labels(painter, visible)
+
+        # 懸停與選中的標註繪製於最上層（選中者最後繪製）
+        for rect_id in (self.hover_rect_id, self.selected_rect_id):
+            item = self.rect_index.get(rect_id) if rect_id else None
+            if item:
+                self.draw_annotation(painter, item, image_rect)
+
+        if self.current_rect:
+            painter.setPen(QPen(self.get_class_color(self.class_id), 2, Qt.DashLine))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(self.image_rect_to_widget_rect(self.current_rect, image_rect))
@@ -0,0 +1,193 @@
+"""
+圖片瀏覽模組 - 以虛擬化清單顯示資料夾中的圖片（縮圖、標註數量與狀態）
+
+ImageListModel 只保存路徑清單，縮圖與標註數量在檢視繪製可見列時才向縮圖快取與標註儲存查詢；
+沒有縮圖的列會批次要求縮圖快取優先產生，完成後只更新該列。
+ImageBrowser 為固定列高的 QListView，不為每張圖片建立元件，十萬張圖片的資料夾也能直接開啟，
+記憶體用量只與可見列數（及縮圖快取上限）有關。
+"""
+
+import os
+from typing import Callable, List
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QPainter, QPen, QFontMetrics
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QStyle, QAbstractItemView
+
+from thumbnail_cache import ThumbnailCache
+
+BROWSER_ROW_HEIGHT = 64         # 列高（像素）
+BROWSER_THUMBNAIL_SIZE = QSize(80, 56)
+
+# 自訂資料角色
+ThumbnailRole = Qt.UserRole + 1        # QImage 或 None（尚未產生）
+AnnotationCountRole = Qt.UserRole + 2  # 標註數量
+StatusRole = Qt.UserRole + 3           # 'current' / 'annotated' / 'empty'
+
+STATUS_COLORS = {
+    'current': QColor(51, 154, 240),
+    'annotated': QColor(64, 192, 87),
+    'empty': QColor(173, 181, 189),
+}
+
+
+class ImageListModel(QAbstractListModel):
+    """圖片清單模型（路徑清單 + 依需要查詢的縮圖與標註數量）"""
+
+    def __init__(self, thumbnail_cache: ThumbnailCache, count_for: Callable[[str], int], parent=None):
+        """count_for(路徑) 回傳該圖片目前的標註數量"""
+        super().__init__(parent)
+        self.image_paths: List[str] = []
+        self.current_row = -1
+        self.thumbnail_cache = thumbnail_cache
+        self.count_for = count_for
+
+        # 已要求產生縮圖、等待完成的列 {路徑: 列}（只含曾經可見的列）
+        self.waiting_rows = {}
+        self.request_timer = QTimer(self)
+        self.request_timer.setSingleShot(True)
+        self.request_timer.setInterval(0)
+        self.request_timer.timeout.connect(self.flush_thumbnail_requests)
+        self.pending_requests = []
+        thumbnail_cache.thumbnail_ready.connect(self.on_thumbnail_ready)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.image_paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        path = self.image_paths[row]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.ToolTipRole:
+            return path
+        if role == ThumbnailRole:
+            image = self.thumbnail_cache.get(path)
+            if image is None:
+                self.request_thumbnail(path, row)
+            return image
+        if role in (AnnotationCountRole, StatusRole):
+            count = self.count_for(path)
+            return count if role == AnnotationCountRole else self.status_for(row, count)
+        return None
+
+    def status_for(self, row: int, count: int) -> str:
+        """列的狀態（count 為該列的標註數量，繪製時與數量共用同一次查詢）"""
+        if row == self.current_row:
+            return 'current'
+        return 'annotated' if count else 'empty'
+
+    def set_images(self, image_paths: List[str], current_row: int = 0):
+        """更換圖片清單"""
+        self.beginResetModel()
+        self.image_paths = image_paths
+        self.current_row = current_row if image_paths else -1
+        self.waiting_rows = {}
+        self.pending_requests = []
+        self.endResetModel()
+
+    def set_current_row(self, row: int):
+        """標示目前圖片"""
+        previous = self.current_row
+        self.current_row = row
+        self.refresh_row(previous)
+        self.refresh_row(row)
+
+    def refresh_row(self, row: int):
+        """標註數量或狀態改變時更新該列"""
+        if 0 <= row < len(self.image_paths):
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def request_thumbnail(self, path: str, row: int):
+        """記錄可見列缺少的縮圖，於事件迴圈下一輪一次送出"""
+        if path in self.waiting_rows:
+            return
+        self.waiting_rows[path] = row
+        self.pending_requests.append(path)
+        self.request_timer.start()
+
+    def flush_thumbnail_requests(self):
+        if self.pending_requests:
+            self.thumbnail_cache.prioritize(self.pending_requests)
+            self.pending_requests = []
+
+    def on_thumbnail_ready(self, path: str):
+        row = self.waiting_rows.pop(path, None)
+        if row is not None and row < len(self.image_paths) and self.image_paths[row] == path:
+            self.refresh_row(row)
+
+
+class ImageBrowserDelegate(QStyledItemDelegate):
+    """圖片清單列：縮圖、檔名、序號、標註數量與狀態色條"""
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), BROWSER_ROW_HEIGHT)
+
+    def paint(self, painter: QPainter, option, index):
+        painter.save()
+        rect = option.rect
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(rect, QColor(208, 235, 255))
+        elif option.state & QStyle.State_MouseOver:
+            painter.fillRect(rect, QColor(241, 243, 245))
+
+        count = index.data(AnnotationCountRole)
+        status = index.model().status_for(index.row(), count)
+        painter.fillRect(QRect(rect.left(), rect.top() + 2, 4, rect.height() - 4), STATUS_COLORS[status])
+
+        # 縮圖（保持長寬比置中；尚未產生時畫出佔位框）
+        thumb_rect = QRect(rect.left() + 10, rect.top() + (rect.height() - BROWSER_THUMBNAIL_SIZE.height()) // 2,
+                           BROWSER_THUMBNAIL_SIZE.width(), BROWSER_THUMBNAIL_SIZE.height())
+        image = index.data(ThumbnailRole)
+        if image is not None:
+            size = image.size().scaled(thumb_rect.size(), Qt.KeepAspectRatio)
+            target = QRect(0, 0, size.width(), size.height())
+            target.moveCenter(thumb_rect.center())
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            painter.drawImage(target, image)
+        else:
+            painter.setPen(QPen(QColor(206, 212, 218), 1, Qt.DashLine))
+            painter.drawRect(thumb_rect.adjusted(0, 0, -1, -1))
+
+        # 檔名與序號、標註數量
+        text_left = thumb_rect.right() + 8
+        text_width = max(0, rect.right() - text_left - 4)
+        metrics = QFontMetrics(option.font)
+        painter.setPen(QColor(33, 37, 41))
+        name = metrics.elidedText(index.data(Qt.DisplayRole), Qt.ElideMiddle, text_width)
+        painter.drawText(QRect(text_left, rect.top() + 8, text_width, metrics.height()), Qt.AlignLeft, name)
+
+        painter.setPen(QColor(134, 142, 150))
+        detail = f'#{index.row() + 1}  ' + (f'{count} 個標註' if count else '未標註')
+        painter.drawText(QRect(text_left, rect.top() + 12 + metrics.height(), text_width, metrics.height()),
+                         Qt.AlignLeft, detail)
+        painter.restore()
+
+
+class ImageBrowser(QListView):
+    """虛擬化圖片清單（點擊或按 Enter 切換圖片）"""
+
+    image_activated = pyqtSignal(int)  # 選擇的圖片索引
+
+    def __init__(self, model: ImageListModel, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.setItemDelegate(ImageBrowserDelegate(self))
+        self.setUniformItemSizes(True)  # 固定列高：不需逐列計算尺寸
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setMouseTracking(True)
+        self.clicked.connect(lambda index: self.image_activated.emit(index.row()))
+        self.activated.connect(lambda index: self.image_activated.emit(index.row()))
+
+    def show_current(self, row: int):
+        """標示並捲動到目前圖片"""
+        model: ImageListModel = self.model()
+        model.set_current_row(row)
+        if 0 <= row < model.rowCount():
+            index = model.index(row)
+            self.setCurrentIndex(index)
+            self.scrollTo(index, QAbstractItemView.EnsureVisible)
@@ -0,0 +1,210 @@
+"""
+影像金字塔模組 - 多解析度影像金字塔（1/2、1/4、1/8…）與圖塊快取
+
+每張圖片的縮小層級依需要才建立，並切成固定大小的圖塊存入 LRU 圖塊快取：
+第 L 層的圖塊由第 L-1 層對應的 2×2 區域縮小而來，因此只會產生實際看到的圖塊。
+第 0 層（原圖）直接由來源 QImage 擷取，不另外存入快取。
+來源也可以是 JPEG 縮小解碼的影像（對應第 1～3 層），此時更高解析度的層級要等到
+顯示倍率需要時才由原檔完整解碼（decode_full_resolution / set_full_resolution）。
+所有資料皆為 QImage，可在背景執行緒中使用。
+"""
+
+import math
+import itertools
+from typing import Optional, Iterator, Tuple
+from PyQt5.QtCore import Qt, QRect, QRectF, QSize
+from PyQt5.QtGui import QImage, QPainter
+
+from performance_optimizer import ImageCache, decode_image
+
+TILE_SIZE = 512                                 # 圖塊邊長（像素）
+DEFAULT_TILE_CACHE_SIZE = 128 * 1024 * 1024     # 圖塊快取上限 128MB
+
+# 可直接繪製與縮放的格式，其他格式（索引色、灰階等）載入時轉換一次
+_DIRECT_FORMATS = (QImage.Format_RGB32, QImage.Format_ARGB32, QImage.Format_ARGB32_Premultiplied)
+
+
+class ImagePyramid:
+    """單張圖片的多解析度金字塔"""
+
+    _id_counter = itertools.count(1)
+
+    def __init__(self, base_image: QImage, tile_cache: Optional[ImageCache] = None,
+                 tile_size: int = TILE_SIZE, source_path: Optional[str] = None,
+                 full_size: Optional[Tuple[int, int]] = None):
+        """
+        base_image 為縮小解碼的影像時，需指定原圖尺寸 full_size 與原檔路徑 source_path，
+        base_image 對應的層級由兩者的尺寸比例決定。
+        """
+        self.tile_size = tile_size
+        self.tile_cache = tile_cache if tile_cache is not None else ImageCache(DEFAULT_TILE_CACHE_SIZE)
+        self.key_prefix = f'tile:{next(self._id_counter)}:'
+        self.source_path = source_path
+
+        # 各層尺寸：每層為上一層的一半（向上取整），直到整層可放入單一圖塊，且涵蓋來源影像的層級
+        base_size = (base_image.width(), base_image.height())
+        self.level_sizes = [full_size or base_size]
+        while max(self.level_sizes[-1]) > max(tile_size, max(base_size)):
+            width, height = self.level_sizes[-1]
+            self.level_sizes.append(((width + 1) // 2, (height + 1) // 2))
+        while max(self.level_sizes[-1]) > tile_size:
+            width, height = self.level_sizes[-1]
+            self.level_sizes.append(((width + 1) // 2, (height + 1) // 2))
+        base_level = 0
+        while base_level + 1 < len(self.level_sizes) and max(self.level_sizes[base_level + 1]) >= max(base_size):
+            base_level += 1
+
+        # 縮小解碼的尺寸取整方式與層級不同時，縮放為該層級的精確尺寸
+        if base_size != self.level_sizes[base_level]:
+            base_image = base_image.scaled(*self.level_sizes[base_level], Qt.IgnoreAspectRatio,
+                                           Qt.SmoothTransformation)
+        if base_image.format() not in _DIRECT_FORMATS:
+            base_image = base_image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+        # (來源影像, 其層級)：以單一屬性保存，背景執行緒讀取時不會看到不一致的組合
+        self.base: Tuple[QImage, int] = (base_image, base_level)
+        self.reduced_base: Optional[Tuple[QImage, int]] = None  # 升級為完整解析度前的縮小來源
+
+    @property
+    def base_image(self) -> QImage:
+        """目前可用的最高解析度影像"""
+        return self.base[0]
+
+    @property
+    def base_level(self) -> int:
+        """base_image 對應的層級（0 表示已是完整解析度）"""
+        return self.base[1]
+
+    @property
+    def image_size(self) -> QSize:
+        """原圖尺寸"""
+        return QSize(*self.level_sizes[0])
+
+    @property
+    def level_count(self) -> int:
+        return len(self.level_sizes)
+
+    def level_rect(self, level: int) -> QRect:
+        """指定層級的完整範圍"""
+        width, height = self.level_sizes[level]
+        return QRect(0, 0, width, height)
+
+    def level_for_scale(self, scale: float) -> int:
+        """
+        顯示倍率對應的最佳層級
+
+        選擇解析度不低於顯示倍率的最小層級，因此層級內的縮放倍率落在 (0.5, 1]，
+        平滑縮小不會產生鋸齒。
+        """
+        return max(self.ideal_level(scale), self.base_level)
+
+    def ideal_level(self, scale: float) -> int:
+        """不考慮目前解碼解析度時，顯示倍率對應的最佳層級"""
+        if scale >= 1.0 or scale <= 0:
+            return 0
+        level = int(math.floor(math.log2(1.0 / scale)))
+        return min(level, self.level_count - 1)
+
+    def needs_full_resolution(self, scale: float) -> bool:
+        """顯示倍率是否超過目前解碼的解析度（需要由原檔完整解碼）"""
+        return (self.base_level > 0 and self.source_path is not None
+                and self.ideal_level(scale) < self.base_level)
+
+    def decode_full_resolution(self) -> QImage:
+        """由原檔完整解碼（可在背景執行緒執行，結果以 set_full_resolution 套用）"""
+        return decode_image(self.source_path)[0]
+
+    def set_full_resolution(self, image: QImage):
+        """以完整解析度影像取代縮小解碼的來源（保留原來源，離開圖片時以 drop_full_resolution 還原）"""
+        if self.base_level == 0:
+            return
+        if image.format() not in _DIRECT_FORMATS:
+            image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        self.reduced_base = self.base
+        self.base = (image, 0)
+
+    def drop_full_resolution(self):
+        """釋放延遲載入的完整解析度影像，回到縮小解碼的來源"""
+        if self.reduced_base is not None:
+            self.base = self.reduced_base
+            self.reduced_base = None
+
+    def tile_rect(self, level: int, tile_x: int, tile_y: int) -> QRect:
+        """圖塊在該層級中的範圍（邊緣圖塊可能較小）"""
+        rect = QRect(tile_x * self.tile_size, tile_y * self.tile_size, self.tile_size, self.tile_size)
+        return rect.intersected(self.level_rect(level))
+
+    def tiles_in_rect(self, level: int, rect: QRect) -> Iterator[Tuple[int, int]]:
+        """與指定區域相交的圖塊座標"""
+        rect = rect.intersected(self.level_rect(level))
+        if rect.isEmpty():
+            return
+        for tile_y in range(rect.top() // self.tile_size, rect.bottom() // self.tile_size + 1):
+            for tile_x in range(rect.left() // self.tile_size, rect.right() // self.tile_size + 1):
+                yield tile_x, tile_y
+
+    def get_tile(self, level: int, tile_x: int, tile_y: int) -> QImage:
+        """取得圖塊（來源層級之上經快取，未命中時由上一層建立）"""
+        rect = self.tile_rect(level, tile_x, tile_y)
+        base_image, base_level = self.base
+        if level <= base_level:
+            return base_image.copy(rect)
+
+        key = f'{self.key_prefix}{level}:{tile_x}:{tile_y}'
+        tile = self.tile_cache.get(key)
+        if tile is not None:
+            return tile
+
+        parent_rect = QRect(rect.x() * 2, rect.y() * 2, rect.width() * 2, rect.height() * 2)
+        parent = self.render_region(level - 1, parent_rect.intersected(self.level_rect(level - 1)))
+        tile = parent.scaled(rect.width(), rect.height(), Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+        self.tile_cache.put(key, tile, tile.bytesPerLine() * tile.height())
+        return tile
+
+    def render_region(self, level: int, rect: QRect) -> QImage:
+        """以 1:1 組合指定層級中某區域的影像"""
+        rect = rect.intersected(self.level_rect(level))
+        base_image, base_level = self.base
+        if level <= base_level:
+            if rect == base_image.rect():
+                return base_image
+            return base_image.copy(rect)
+
+        region = QImage(rect.size(), base_image.format())
+        painter = QPainter(region)
+        for tile_x, tile_y in self.tiles_in_rect(level, rect):
+            tile_rect = self.tile_rect(level, tile_x, tile_y)
+            painter.drawImage(tile_rect.topLeft() - rect.topLeft(), self.get_tile(level, tile_x, tile_y))
+        painter.end()
+        return region
+
+    def draw_region(self, painter: QPainter, level: int, source_rect: QRect, target_rect: QRectF):
+        """
+        將指定層級的區域直接繪製到目標範圍（不建立中間影像）
+
+        縮放品質取決於 painter 的渲染提示，未開啟 SmoothPixmapTransform 時為最快的最近鄰取樣，
+        適合互動中的預覽繪製。
+        """
+        source_rect = source_rect.intersected(self.level_rect(level))
+        if source_rect.isEmpty():
+            return
+        base_image, base_level = self.base
+        if level <= base_level:
+            painter.drawImage(target_rect, base_image, QRectF(source_rect))
+            return
+
+        scale_x = target_rect.width() / source_rect.width()
+        scale_y = target_rect.height() / source_rect.height()
+        for tile_x, tile_y in self.tiles_in_rect(level, source_rect):
+            tile_rect = self.tile_rect(level, tile_x, tile_y)
+            part = tile_rect.intersected(source_rect)
+            target = QRectF(target_rect.x() + (part.x() - source_rect.x()) * scale_x,
+                            target_rect.y() + (part.y() - source_rect.y()) * scale_y,
+                            part.width() * scale_x, part.height() * scale_y)
+            painter.drawImage(target, self.get_tile(level, tile_x, tile_y),
+                              QRectF(part.translated(-tile_rect.topLeft())))
+
+    def release(self):
+        """從快取移除此金字塔的所有圖塊（切換圖片時呼叫）"""
+        self.tile_cache.remove_prefix(self.key_prefix)
@@ -19,8 +19,14 @@ from styles import get_main_style, apply_button_class
 
 from annotator import AnnotatorLabel, VEHICLE_CLASSES
 from advanced_exporter import AdvancedExporter
+from annotation_store import AnnotationStore, Annotation, set_class_name_resolver
+from annotation_history import AnnotationHistory, AddAnnotationsCommand
+from export_jobs import ExportJobRunner
 from file_manager import FileManager
 from performance_optimizer import PerformanceOptimizer
+from thumbnail_cache import ThumbnailCache
+from frame_cache import RawFrameCache, set_shared_frame_cache
+from image_browser import ImageBrowser, ImageListModel
 from vehicle_class_manager import VehicleClassManager, VehicleClassManagerDialog
 
 # AI輔助功能 (可選)
@@ -46,6 +52,17 @@ except ImportError:
 TRAINING_AVAILABLE = False
 print("模型訓練功能已移除，專注於標註功能")
 
+# OpenGL 標註畫布 (實驗性，預設關閉；設定環境變數 ANNOTATOR_OPENGL=1 或以 --opengl 啟動)
+USE_OPENGL_CANVAS = os.environ.get('ANNOTATOR_OPENGL') == '1' or '--opengl' in sys.argv
+# 解碼畫面快取 (可選，設定環境變數 ANNOTATOR_FRAME_CACHE=1 或以 --frame-cache 啟動；
+# 以 ANNOTATOR_FRAME_CACHE_DIR 指定 SSD 上的暫存目錄)
+USE_FRAME_CACHE = os.environ.get('ANNOTATOR_FRAME_CACHE') == '1' or '--frame-cache' in sys.argv
+try:
+    from gl_annotator import GLAnnotatorCanvas
+    OPENGL_AVAILABLE = True
+except ImportError:
+    OPENGL_AVAILABLE = False
+
 # 優化的柔和樣式表
 MODERN_STYLE = """
 QMainWindow {
@@ -310,15 +327,38 @@ class MainWindow(QMainWindow):
         self.image_path = None
         self.image_list = []
         self.current_index = 0
-        self.annotations_cache = {}  # 緩存每張圖片的標註 {image_path: annotations_list}
+        self.annotations_cache = AnnotationStore()  # 各圖片標註（連續陣列儲存，只有目前圖片展開為 Annotation 物件）
+        self.annotation_history = AnnotationHistory()  # 各圖片的撤銷／重做歷程
         
         # 初始化新模組
         self.advanced_exporter = AdvancedExporter()
         self.file_manager = FileManager()
         self.performance_optimizer = PerformanceOptimizer(os.getcwd())
+        self.thumbnail_cache = ThumbnailCache(self.file_manager.thumbnails_dir)  # 各資料夾的持久化縮圖
+        if USE_FRAME_CACHE:
+            # 完整解析度解碼結果存為記憶體映射檔，圖片載入與 AI 流程共用
+            try:
+                frames_dir = os.environ.get('ANNOTATOR_FRAME_CACHE_DIR') or self.file_manager.frames_dir
+                set_shared_frame_cache(RawFrameCache(frames_dir))
+            except Exception as e:
+                print(f"啟用畫面快取錯誤: {e}")
+        # 縮圖可由封裝檔快速重新讀取，記憶體不足時優先讓出預算
+        self.performance_optimizer.memory_manager.register_cache(
+            self.thumbnail_cache.memory_cache, name='縮圖', weight=0.5, min_size=4 * 1024 * 1024)
+        
+        # 背景匯出工作（匯出期間介面保持可用）
+        self.export_runner = ExportJobRunner(self.advanced_exporter)
+        self.export_job_kinds = {}  # {工作ID: 'batch_yolo' / 'advanced'}
+        self.export_runner.job_queued.connect(self.on_export_job_queued)
+        self.export_runner.job_started.connect(self.on_export_job_started)
+        self.export_runner.job_progress.connect(self.on_export_job_progress)
+        self.export_runner.job_finished.connect(self.on_export_job_finished)
+        self.export_runner.job_cancelled.connect(self.on_export_job_cancelled)
+        self.export_runner.job_failed.connect(self.on_export_job_failed)
         
         # 初始化車種管理器
         self.vehicle_class_manager = VehicleClassManager()
+        set_class_name_resolver(self.vehicle_class_manager.get_class_name)  # 標註的類別名稱依類別ID查詢
         self.current_vehicle_classes = self.vehicle_class_manager.get_classes_for_combo()
         
         # 初始化AI輔助功能 (如果可用)
@@ -351,8 +391,6 @@ class MainWindow(QMainWindow):
             else:
                 self.statusBar().showMessage('AI模型未載入，請選擇模型', 3000)
         
-        # 連接效能優化信號
-        self.performance_optimizer.image_loader.image_loaded.connect(self.on_image_loaded_async)
         # 設定現代化樣式
         # 設定美觀的現代化樣式
         self.setStyleSheet(get_main_style())
@@ -618,10 +656,18 @@ class MainWindow(QMainWindow):
         self.left_panel = self.create_left_panel()
         main_splitter.addWidget(self.left_panel)
         
-        # 圖片顯示區域
-        self.annotator = AnnotatorLabel(self)
+        # 圖片顯示區域（OpenGL 畫布與 AnnotatorLabel 介面相同）
+        if USE_OPENGL_CANVAS and OPENGL_AVAILABLE:
+            self.annotator = GLAnnotatorCanvas(self)
+        else:
+            if USE_OPENGL_CANVAS:
+                print("OpenGL 標註畫布不可用，改用一般畫布")
+            self.annotator = AnnotatorLabel(self)
         self.annotator.rects_updated.connect(self.update_rect_list)
         self.annotator.rects_updated.connect(self.update_toolbar_states)  # 更新工具列狀態
+        self.annotator.annotation_command.connect(self.record_annotation_command)
+        # 影像金字塔圖塊快取納入記憶體管理
+        self.performance_optimizer.memory_manager.register_cache(self.annotator.tile_cache, name='圖塊')
         
         # 初始化車種顏色映射
         colors = self.vehicle_class_manager.get_class_colors()
@@ -715,7 +761,15 @@ class MainWindow(QMainWindow):
         
         layout.addWidget(view_group)
         
-        layout.addStretch()
+        # 圖片清單群組（虛擬化清單：只繪製可見列，縮圖依需要產生）
+        browser_group = QGroupBox("圖片清單")
+        browser_layout = QVBoxLayout(browser_group)
+        self.image_browser_model = ImageListModel(self.thumbnail_cache, self.annotation_count_for, self)
+        self.image_browser = ImageBrowser(self.image_browser_model)
+        self.image_browser.image_activated.connect(self.go_to_image)
+        browser_layout.addWidget(self.image_browser)
+        layout.addWidget(browser_group, 1)
+        
         return left_widget
 
     def create_right_panel(self):
@@ -757,6 +811,18 @@ class MainWindow(QMainWindow):
         self.progress_bar.setVisible(False)
         layout.addWidget(self.progress_bar)
         
+        # 背景匯出狀態與取消
+        export_status_layout = QHBoxLayout()
+        self.export_status_label = QLabel('')
+        self.export_status_label.setStyleSheet("color: #b0b0b0;")
+        self.export_status_label.setVisible(False)
+        self.cancel_export_btn = QPushButton('取消匯出')
+        self.cancel_export_btn.clicked.connect(self.cancel_exports)
+        self.cancel_export_btn.setVisible(False)
+        export_status_layout.addWidget(self.export_status_label, 1)
+        export_status_layout.addWidget(self.cancel_export_btn)
+        layout.addLayout(export_status_layout)
+        
         return right_widget
 
     def zoom_changed(self, value):
@@ -847,8 +913,8 @@ class MainWindow(QMainWindow):
         # 標註操作額外快捷鍵
         QShortcut(QKeySequence('Ctrl+A'), self, self.select_all_annotations)  # 全選標註
         QShortcut(QKeySequence('Escape'), self, self.clear_selection)  # 清除選擇
-        QShortcut(QKeySequence('Ctrl+Z'), self, self.undo_annotation)  # 撤銷 (如果實作)
-        QShortcut(QKeySequence('Ctrl+Y'), self, self.redo_annotation)  # 重做 (如果實作)
+        QShortcut(QKeySequence('Ctrl+Z'), self, self.undo_annotation)  # 撤銷
+        QShortcut(QKeySequence('Ctrl+Y'), self, self.redo_annotation)  # 重做
         
         # 車種快速切換 - 數字鍵
         QShortcut(QKeySequence('1'), self, lambda: self.quick_change_class(0))
@@ -954,7 +1020,8 @@ class MainWindow(QMainWindow):
 • Page Up/Down: 上/下一張圖片
 
 🏷 標註操作:
-• 1-8: 快速切換車種類型
+• 1-8: 快速切換車種類型（有選中標註時一併變更其車種）
+• Ctrl+Z / Ctrl+Y: 撤銷 / 重做
 • Delete: 刪除選中標註
 • Ctrl+Delete: 清除所有標註
 • Ctrl+A: 全選標註
@@ -992,13 +1059,33 @@ class MainWindow(QMainWindow):
         
         QMessageBox.information(self, '快捷鍵指南', help_text)
 
+    def record_annotation_command(self, command):
+        """記錄標註器產生的操作到目前圖片的歷程"""
+        self.annotation_history.push(self.image_path, command)
+
     def undo_annotation(self):
-        """撤銷標註 (預留功能)"""
-        self.statusBar().showMessage('撤銷功能開發中...', 2000)
+        """撤銷目前圖片最近一次標註操作"""
+        command = self.annotation_history.undo(self.image_path, self.annotator)
+        if command is None:
+            self.statusBar().showMessage('沒有可撤銷的操作', 2000)
+            return
+        self.on_annotation_history_applied()
+        self.statusBar().showMessage(f'已撤銷：{command.description}', 2000)
 
     def redo_annotation(self):
-        """重做標註 (預留功能)"""
-        self.statusBar().showMessage('重做功能開發中...', 2000)
+        """重做目前圖片最近一次撤銷的標註操作"""
+        command = self.annotation_history.redo(self.image_path, self.annotator)
+        if command is None:
+            self.statusBar().showMessage('沒有可重做的操作', 2000)
+            return
+        self.on_annotation_history_applied()
+        self.statusBar().showMessage(f'已重做：{command.description}', 2000)
+
+    def on_annotation_history_applied(self):
+        """撤銷或重做後更新畫面與清單"""
+        self.annotator.update()
+        self.update_rect_list()
+        self.update_toolbar_states()
 
     def update_toolbar_states(self):
         """更新工具列按鈕狀態"""
@@ -1068,6 +1155,7 @@ class MainWindow(QMainWindow):
             if file_path in self.image_list:
                 self.current_index = self.image_list.index(file_path)
             
+            self.on_image_list_loaded()
             self.load_current_image()
             # 記錄資料夾到最近檔案
             self.file_manager.add_recent_file(folder_path, 'folder')
@@ -1091,6 +1179,7 @@ class MainWindow(QMainWindow):
             self.image_list.sort()
             if self.image_list:
                 self.current_index = 0
+                self.on_image_list_loaded()
                 self.load_current_image()
                 # 記錄資料夾到最近檔案（而不是第一張圖片）
                 self.file_manager.add_recent_file(folder_path, 'folder')
@@ -1102,7 +1191,7 @@ class MainWindow(QMainWindow):
         if self.image_list and 0 <= self.current_index < len(self.image_list):
             # 儲存當前圖片的標註到緩存
             if self.image_path and self.annotator.get_rects():
-                self.annotations_cache[self.image_path] = self.annotator.get_rects().copy()
+                self.annotations_cache.set(self.image_path, self.annotator.get_rects())
             
             # 載入新圖片
             self.image_path = self.image_list[self.current_index]
@@ -1113,14 +1202,22 @@ class MainWindow(QMainWindow):
                 return
             
             try:
-                self.annotator.set_image(self.image_path)
+                # 由畫面快取取得（背景預載命中時不需在主執行緒解碼）；JPEG 只解碼到適應視窗所需的解析度
+                frame = self.performance_optimizer.image_loader.get(
+                    self.image_path, self.annotator.make_pyramid_builder(), self.annotator.decode_fit_size())
+                self.annotator.set_image(frame, self.image_path)
             except Exception as e:
                 QMessageBox.critical(self, '載入錯誤', f'無法載入圖片: {str(e)}')
                 return
             
+            # 依瀏覽方向預載接下來的圖片（取消已不在範圍內的請求）
+            self.performance_optimizer.image_loader.request_around(
+                self.image_list, self.current_index, self.annotator.make_pyramid_builder(),
+                self.annotator.decode_fit_size())
+            
             # 從緩存恢復標註
             if self.image_path in self.annotations_cache:
-                self.annotator.rects = self.annotations_cache[self.image_path].copy()
+                self.annotator.rects = self.annotations_cache.get_items(self.image_path)
                 # 更新next_id為最大ID+1
                 if self.annotator.rects:
                     max_id = max(item['id'] for item in self.annotator.rects)
@@ -1131,12 +1228,32 @@ class MainWindow(QMainWindow):
             self.update_image_info()
             self.update_image_size_info()
             self.update_toolbar_states()  # 更新工具列狀態
+            self.image_browser.show_current(self.current_index)
             self.fit_to_window()
 
+    def on_image_list_loaded(self):
+        """圖片清單更換後：清除撤銷歷程、更新圖片瀏覽清單並於背景產生縮圖"""
+        self.annotation_history.clear()
+        self.image_browser_model.set_images(self.image_list, self.current_index)
+        self.thumbnail_cache.generate(self.image_list)
+
+    def annotation_count_for(self, image_path):
+        """圖片的標註數量（目前圖片以標註器的內容為準）"""
+        if image_path == self.image_path:
+            return self.annotator.annotation_count()
+        return self.annotations_cache.count(image_path)
+
+    def go_to_image(self, index):
+        """切換到指定索引的圖片（圖片清單點選）"""
+        if index != self.current_index and 0 <= index < len(self.image_list):
+            self.save_current_annotations()
+            self.current_index = index
+            self.load_current_image()
+
     def save_current_annotations(self):
         """儲存當前圖片的標註到緩存"""
         if self.image_path:
-            self.annotations_cache[self.image_path] = self.annotator.get_rects().copy()
+            self.annotations_cache.set(self.image_path, self.annotator.get_rects())
 
     def prev_image(self):
         if len(self.image_list) > 1 and self.current_index > 0:
@@ -1179,7 +1296,7 @@ class MainWindow(QMainWindow):
 
     def update_image_size_info(self):
         if hasattr(self.annotator, 'image') and self.annotator.image:
-            size = self.annotator.image.size()
+            size = self.annotator.image_size
             self.image_size_label.setText(f'尺寸: {size.width()}×{size.height()}')
         else:
             self.image_size_label.setText('尺寸: -')
@@ -1187,6 +1304,11 @@ class MainWindow(QMainWindow):
     def quick_change_class(self, class_index):
         if 0 <= class_index < len(self.current_vehicle_classes):
             self.class_combo.setCurrentIndex(class_index)
+            # 有選中的標註時一併變更其車種（可撤銷）
+            selected_id = self.annotator.selected_rect_id
+            if selected_id is not None:
+                self.annotator.set_rect_class(selected_id, self.current_vehicle_classes[class_index][1])
+                self.update_rect_list()
 
     def change_class(self, idx):
         if idx < len(self.current_vehicle_classes):
@@ -1286,31 +1408,6 @@ class MainWindow(QMainWindow):
         self.annotator.clear_rects()
         self.update_rect_list()
     
-    def on_image_loaded_async(self, image_path, qimage):
-        """異步圖片載入完成的回調"""
-        try:
-            self.image_path = image_path
-            self.annotator.set_image(qimage, image_path)
-            
-            # 恢復該圖片的標註從快取
-            if image_path in self.annotations_cache:
-                self.annotator.rects = self.annotations_cache[image_path].copy()
-                # 更新next_id為最大ID+1
-                if self.annotator.rects:
-                    max_id = max(item['id'] for item in self.annotator.rects)
-                    self.annotator.next_id = max_id + 1
-                self.annotator.repaint()
-            
-            # 更新UI
-            self.update_rect_list()
-            self.update_image_info()
-            self.update_image_size_info()
-            self.fit_to_window()
-            
-        except Exception as e:
-            print(f"異步載入圖片失敗: {e}")
-            QMessageBox.critical(self, '錯誤', f'載入圖片失敗: {str(e)}')
-    
     def update_memory_status(self):
         """更新記憶體狀態"""
         try:
@@ -1433,6 +1530,9 @@ class MainWindow(QMainWindow):
             self.stats_label.setText(stats_text)
         else:
             self.stats_label.setText('統計: 尚無標註')
+        
+        # 圖片清單中目前圖片的標註數量
+        self.image_browser_model.refresh_row(self.current_index)
 
     def delete_rect(self, item):
         text = item.text()
@@ -1443,6 +1543,19 @@ class MainWindow(QMainWindow):
         except:
             pass
 
+    def get_export_image_data(self, image_path):
+        """將單張圖片的快取標註轉為匯出用的統一陣列表示"""
+        return self.annotations_cache.export_data(image_path)
+    
+    def get_export_images_data(self, image_paths):
+        """取得所有有標註圖片的匯出資料"""
+        images_data = []
+        for image_path in image_paths:
+            image_data = self.get_export_image_data(image_path)
+            if image_data:
+                images_data.append(image_data)
+        return images_data
+
     def export_yolo(self):
         if not self.image_path or not self.annotator.get_rects():
             QMessageBox.warning(self, '警告', '請先載入圖片並標註至少一個車輛！')
@@ -1453,30 +1566,18 @@ class MainWindow(QMainWindow):
             output_dir = os.path.join('exports', 'yolo')
             os.makedirs(output_dir, exist_ok=True)
             
-            # 轉換標註格式
-            annotations = []
-            for rect_data in self.annotator.get_rects():
-                if hasattr(rect_data, 'get'):  # 字典格式
-                    if 'rect' in rect_data and 'class_id' in rect_data:
-                        qrect = rect_data['rect']
-                        annotations.append({
-                            'class': rect_data['class_id'],
-                            'bbox': [qrect.x(), qrect.y(), qrect.width(), qrect.height()]
-                        })
-                    elif 'class' in rect_data and 'x' in rect_data:
-                        annotations.append({
-                            'class': rect_data['class'],
-                            'bbox': [rect_data['x'], rect_data['y'], rect_data['width'], rect_data['height']]
-                        })
+            # 轉換為統一標註陣列
+            self.save_current_annotations()
+            image_data = self.get_export_image_data(self.image_path)
             
-            if not annotations:
+            if not image_data:
                 QMessageBox.warning(self, '警告', '沒有找到有效的標註資料！')
                 return
             
             exporter = AdvancedExporter()
             success = exporter.export_yolo(
                 self.image_path, 
-                annotations, 
+                image_data['annotations'], 
                 output_dir
             )
             
@@ -1490,7 +1591,7 @@ class MainWindow(QMainWindow):
                 QMessageBox.information(
                     self, '匯出成功', 
                     f'標註已匯出至: {label_file}\n類別檔案: {classes_path}\n\n'
-                    f'標註數量: {len(annotations)}'
+                    f'標註數量: {len(image_data["annotations"])}'
                 )
             else:
                 QMessageBox.warning(self, '匯出警告', '部分檔案匯出失敗，請檢查控制台輸出')
@@ -1518,64 +1619,88 @@ class MainWindow(QMainWindow):
         output_dir = os.path.join('exports', 'yolo')
         os.makedirs(output_dir, exist_ok=True)
         
-        # 顯示進度條
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setMaximum(len(self.image_list))
+        # 準備有標註的圖片資料（統一標註陣列，為當下標註的快照）
+        images_data = self.get_export_images_data(self.image_list)
         
-        exported_count = 0
-        total_annotations = 0
-        
-        try:
-            for i, image_path in enumerate(self.image_list):
-                self.progress_bar.setValue(i + 1)
-                QApplication.processEvents()
-                
-                # 從緩存獲取標註
-                annotations_raw = self.annotations_cache.get(image_path, [])
-                if annotations_raw:
-                    try:
-                        # 轉換標註格式
-                        annotations = []
-                        for rect_data in annotations_raw:
-                            if hasattr(rect_data, 'get'):  # 字典格式
-                                if 'rect' in rect_data and 'class_id' in rect_data:
-                                    qrect = rect_data['rect']
-                                    annotations.append({
-                                        'class': rect_data['class_id'],
-                                        'bbox': [qrect.x(), qrect.y(), qrect.width(), qrect.height()]
-                                    })
-                                elif 'class' in rect_data and 'x' in rect_data:
-                                    annotations.append({
-                                        'class': rect_data['class'],
-                                        'bbox': [rect_data['x'], rect_data['y'], rect_data['width'], rect_data['height']]
-                                    })
-                        
-                        if annotations:
-                            exporter = AdvancedExporter()
-                            success = exporter.export_yolo(image_path, annotations, output_dir)
-                            if success:
-                                exported_count += 1
-                                total_annotations += len(annotations)
-                    except Exception as e:
-                        print(f"匯出 {image_path} 時發生錯誤: {e}")
-                        continue
-            
-            # 匯出類別檔案
-            exporter = AdvancedExporter()
-            classes_success = exporter.export_classes_file(output_dir)
-            
-        finally:
-            self.progress_bar.setVisible(False)
-            
+        # 增量匯出：只重寫有變動的標註檔，並刪除孤立標註檔（於背景執行）
+        job_id = self.export_runner.submit_incremental_export(
+            images_data, output_dir, 'YOLO', scope_paths=self.image_list
+        )
+        self.export_job_kinds[job_id] = 'batch_yolo'
+    
+    def show_batch_export_results(self, stats):
+        """顯示YOLO批次匯出結果"""
+        output_dir = stats['output_dir']
         classes_path = os.path.join(output_dir, 'classes.txt')
         QMessageBox.information(
             self, '批次匯出完成', 
-            f'已匯出 {exported_count} 個標註檔案\n'
-            f'總標註數量: {total_annotations}\n'
+            f'已匯出 {stats["written"] + stats["skipped"]} 個標註檔案\n'
+            f'（重寫 {stats["written"]} 個、未變動略過 {stats["skipped"]} 個、'
+            f'刪除孤立檔案 {stats["deleted"]} 個）\n'
+            f'總標註數量: {stats["total_annotations"]}\n'
             f'輸出目錄: {output_dir}\n'
             f'類別檔案: {classes_path}'
         )
     
+    def cancel_exports(self):
+        """取消所有排隊中與執行中的匯出工作"""
+        self.export_runner.cancel_all()
+        self.export_status_label.setText('正在取消匯出...')
+        self.cancel_export_btn.setEnabled(False)
+    
+    def update_export_status_visibility(self):
+        """依是否有待處理的匯出工作顯示或隱藏進度元件"""
+        active = self.export_runner.pending_count() > 0
+        self.progress_bar.setVisible(active)
+        self.export_status_label.setVisible(active)
+        self.cancel_export_btn.setVisible(active)
+        self.cancel_export_btn.setEnabled(active)
+    
+    def on_export_job_queued(self, job_id, description):
+        """匯出工作已加入佇列"""
+        self.update_export_status_visibility()
+        pending = self.export_runner.pending_count()
+        if pending > 1:
+            self.statusBar().showMessage(f'{description} 已加入匯出佇列（共 {pending} 個工作）', 3000)
+    
+    def on_export_job_started(self, job_id, description):
+        """匯出工作開始執行"""
+        self.progress_bar.setMaximum(0)  # 取得總數前顯示忙碌狀態
+        self.progress_bar.setValue(0)
+        self.export_status_label.setText(f'{description}...')
+        self.update_export_status_visibility()
+    
+    def on_export_job_progress(self, job_id, current, total, eta):
+        """更新匯出進度與預估剩餘時間"""
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(current)
+        if eta >= 0:
+            minutes, seconds = divmod(int(eta), 60)
+            self.export_status_label.setText(f'匯出中 {current}/{total}，剩餘約 {minutes:02d}:{seconds:02d}')
+        else:
+            self.export_status_label.setText(f'匯出中 {current}/{total}')
+    
+    def on_export_job_finished(self, job_id, results):
+        """匯出工作完成"""
+        kind = self.export_job_kinds.pop(job_id, None)
+        self.update_export_status_visibility()
+        if kind == 'batch_yolo':
+            self.show_batch_export_results(results)
+        elif kind == 'advanced':
+            self.show_export_results(results, results['output_dir'])
+    
+    def on_export_job_cancelled(self, job_id, results):
+        """匯出工作已取消（已完成部分保留，再次匯出會從中斷處續傳）"""
+        self.export_job_kinds.pop(job_id, None)
+        self.update_export_status_visibility()
+        self.statusBar().showMessage('匯出已取消，已完成的部分已保留，再次匯出將從中斷處繼續', 5000)
+    
+    def on_export_job_failed(self, job_id, error):
+        """匯出工作失敗"""
+        self.export_job_kinds.pop(job_id, None)
+        self.update_export_status_visibility()
+        QMessageBox.critical(self, '匯出錯誤', f'匯出失敗: {error}\n\n詳細錯誤請查看控制台輸出。')
+    
     def show_advanced_export_dialog(self):
         """顯示進階匯出對話框"""
         dialog = AdvancedExportDialog(self)
@@ -1583,63 +1708,33 @@ class MainWindow(QMainWindow):
             formats = dialog.get_selected_formats()
             output_dir = dialog.get_output_directory()
             if formats and output_dir:
-                self.perform_advanced_export(formats, output_dir)
+                self.perform_advanced_export(formats, output_dir, dialog.get_export_options())
     
-    def perform_advanced_export(self, formats, output_dir):
-        """執行進階匯出"""
+    def perform_advanced_export(self, formats, output_dir, export_options=None):
+        """執行進階匯出（提交為背景匯出工作）"""
         try:
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setValue(0)
-            
             # 先保存當前圖片的標註
             self.save_current_annotations()
             
-            # 準備圖片資料
-            images_data = []
-            for image_path in self.image_list:
-                annotations = self.annotations_cache.get(image_path, [])
-                if annotations:
-                    # 轉換標註格式
-                    formatted_annotations = []
-                    for rect in annotations:
-                        # 檢查標註資料格式
-                        if 'rect' in rect and 'class_id' in rect:
-                            # annotator.py格式：{'id': int, 'rect': QRect, 'class_id': int, 'class_name': str}
-                            qrect = rect['rect']
-                            formatted_annotations.append({
-                                'class': rect['class_id'],
-                                'bbox': [qrect.x(), qrect.y(), qrect.width(), qrect.height()]
-                            })
-                        elif 'class' in rect and 'x' in rect:
-                            # 已經是正確格式
-                            formatted_annotations.append({
-                                'class': rect['class'],
-                                'bbox': [rect['x'], rect['y'], rect['width'], rect['height']]
-                            })
-                    
-                    if formatted_annotations:  # 只添加有標註的圖片
-                        images_data.append({
-                            'path': image_path,
-                            'annotations': formatted_annotations
-                        })
+            # 準備圖片資料（每張圖片只轉換一次為統一標註陣列）
+            images_data = self.get_export_images_data(self.image_list)
             
             if not images_data:
                 QMessageBox.warning(self, '警告', '沒有找到可匯出的標註資料')
                 return
             
-            # 執行批次匯出
-            results = self.advanced_exporter.batch_export(images_data, output_dir, formats)
-            
-            # 顯示結果
-            self.show_export_results(results, output_dir)
+            # 提交批次匯出工作，完成後顯示結果
+            job_id = self.export_runner.submit_batch_export(
+                images_data, output_dir, formats, scope_paths=self.image_list,
+                export_options=export_options
+            )
+            self.export_job_kinds[job_id] = 'advanced'
             
         except Exception as e:
             import traceback
             error_detail = traceback.format_exc()
             print(f"進階匯出錯誤詳細資訊: {error_detail}")
             QMessageBox.critical(self, '匯出錯誤', f'進階匯出失敗: {str(e)}\n\n詳細錯誤請查看控制台輸出。')
-        finally:
-            self.progress_bar.setVisible(False)
     
     def show_export_results(self, results, output_dir):
         """顯示匯出結果"""
@@ -1701,6 +1796,7 @@ class MainWindow(QMainWindow):
             if selected_file and selected_file in self.image_list:
                 self.current_index = self.image_list.index(selected_file)
             
+            self.on_image_list_loaded()
             self.load_current_image()
             QMessageBox.information(self, '載入成功', f'已載入 {len(self.image_list)} 張圖片')
         else:
@@ -1717,10 +1813,12 @@ class MainWindow(QMainWindow):
         if project_data:
             # 載入專案設定
             self.image_list = project_data.get('images', [])
-            self.annotations_cache = project_data.get('annotations', {})
+            self.annotations_cache = AnnotationStore.from_project_data(project_data.get('annotations', {}))
+            self.annotation_history.clear()
             
             if self.image_list:
                 self.current_index = 0
+                self.on_image_list_loaded()
                 self.load_current_image()
                 QMessageBox.information(self, '專案載入', f'成功載入專案: {project_data.get("project_name", "未命名")}')
             else:
@@ -1739,7 +1837,7 @@ class MainWindow(QMainWindow):
             project_data = {
                 'settings': {},
                 'images': self.image_list,
-                'annotations': self.annotations_cache,
+                'annotations': self.annotations_cache.to_project_data(),
                 'statistics': self.get_project_statistics()
             }
             
@@ -1752,14 +1850,10 @@ class MainWindow(QMainWindow):
     def get_project_statistics(self):
         """取得專案統計資訊"""
         total_images = len(self.image_list)
-        total_annotations = sum(len(anns) for anns in self.annotations_cache.values())
+        total_annotations = self.annotations_cache.total_count()
         
         # 統計各類別數量
-        class_counts = {}
-        for annotations in self.annotations_cache.values():
-            for ann in annotations:
-                class_id = ann['class']
-                class_counts[class_id] = class_counts.get(class_id, 0) + 1
+        class_counts = self.annotations_cache.class_counts()
         
         return {
             'total_images': total_images,
@@ -1868,6 +1962,24 @@ class MainWindow(QMainWindow):
             'path': self.ai_settings.get('model_path', ''),
             'enabled': self.ai_settings.get('enabled', False)
         }
+    
+    def closeEvent(self, event):
+        """關閉視窗前處理進行中的匯出工作"""
+        if self.export_runner.pending_count() > 0:
+            reply = QMessageBox.question(
+                self, '匯出進行中',
+                '仍有匯出工作正在執行，確定要取消匯出並關閉嗎？\n'
+                '（已完成的部分會保留，下次匯出將從中斷處繼續）',
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                event.ignore()
+                return
+        self.export_runner.shutdown()
+        self.performance_optimizer.cleanup()
+        self.thumbnail_cache.shutdown()
+        self.annotator.shutdown()
+        super().closeEvent(event)
 
 
 # 對話框類別定義
@@ -1877,7 +1989,7 @@ class AdvancedExportDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle('進階匯出設定')
-        self.setFixedSize(500, 400)
+        self.setFixedSize(500, 520)
         self.setup_ui()
     
     def setup_ui(self):
@@ -1892,14 +2004,40 @@ class AdvancedExportDialog(QDialog):
         self.coco_cb = QCheckBox('COCO (通用物件偵測格式)')
         self.pascal_cb = QCheckBox('Pascal VOC (XML格式)')
         self.json_cb = QCheckBox('JSON (自訂格式)')
+        self.webdataset_cb = QCheckBox('WebDataset (tar分片，適用訓練叢集)')
+        self.columnar_cb = QCheckBox('Columnar (NumPy .npz欄式資料表，供統計分析)')
         
         format_layout.addWidget(self.yolo_cb)
         format_layout.addWidget(self.coco_cb)
         format_layout.addWidget(self.pascal_cb)
         format_layout.addWidget(self.json_cb)
+        format_layout.addWidget(self.webdataset_cb)
+        format_layout.addWidget(self.columnar_cb)
         
         layout.addWidget(format_group)
         
+        # WebDataset 分片設定
+        shard_group = QGroupBox('WebDataset 分片設定')
+        shard_layout = QHBoxLayout(shard_group)
+        
+        shard_layout.addWidget(QLabel('分片大小:'))
+        self.shard_size_spin = QSpinBox()
+        self.shard_size_spin.setRange(16, 4096)
+        self.shard_size_spin.setValue(256)
+        self.shard_size_spin.setSuffix(' MB')
+        shard_layout.addWidget(self.shard_size_spin)
+        
+        shard_layout.addWidget(QLabel('驗證集比例:'))
+        self.val_ratio_spin = QSpinBox()
+        self.val_ratio_spin.setRange(0, 50)
+        self.val_ratio_spin.setValue(0)
+        self.val_ratio_spin.setSuffix('%')
+        shard_layout.addWidget(self.val_ratio_spin)
+        
+        shard_group.setEnabled(False)
+        self.webdataset_cb.toggled.connect(shard_group.setEnabled)
+        layout.addWidget(shard_group)
+        
         # 輸出目錄選擇
         dir_group = QGroupBox('輸出目錄')
         dir_layout = QHBoxLayout(dir_group)
@@ -1921,7 +2059,9 @@ class AdvancedExportDialog(QDialog):
             "• YOLO: 適用於YOLOv8訓練的標準格式\n"
             "• COCO: 通用的物件偵測標註格式\n"
             "• Pascal VOC: XML格式，適用於多種框架\n"
-            "• JSON: 包含完整資訊的自訂格式"
+            "• JSON: 包含完整資訊的自訂格式\n"
+            "• WebDataset: 圖片與標註打包為tar分片，附index.json索引\n"
+            "• Columnar: 標註表與圖片表的連續陣列，可快速統計類別與框尺寸"
         )
         layout.addWidget(info_text)
         
@@ -1946,8 +2086,18 @@ class AdvancedExportDialog(QDialog):
             formats.append('Pascal VOC')
         if self.json_cb.isChecked():
             formats.append('JSON')
+        if self.webdataset_cb.isChecked():
+            formats.append('WebDataset')
+        if self.columnar_cb.isChecked():
+            formats.append('Columnar')
         return formats
     
+    def get_export_options(self):
+        return {
+            'max_shard_size': self.shard_size_spin.value() * 1024 * 1024,
+            'val_ratio': self.val_ratio_spin.value() / 100.0
+        }
+    
     def get_output_directory(self):
         return self.dir_line.text()
 
@@ -1989,6 +2139,11 @@ class ExportResultsDialog(QDialog):
                 details += f"❌ {fmt}: {result['error']}\n\n"
             else:
                 details += f"✅ {fmt}: 成功匯出 {result['success']}/{result['total']} 個檔案\n"
+                if 'skipped' in result:
+                    details += (f"   增量匯出: 重寫 {result['written']} 個、略過 {result['skipped']} 個、"
+                                f"刪除孤立檔案 {result['deleted']} 個\n")
+                if 'shards' in result:
+                    details += f"   分片數量: {result['shards']} 個\n"
                 details += f"   輸出目錄: {result['output_dir']}\n\n"
         
         if self.results.get('errors'):
@@ -2457,7 +2612,7 @@ def on_ai_prediction_ready(self, image_path, predictions):
     # 載入當前圖片作為預覽
     image_pixmap = None
     if hasattr(self.annotator, 'image') and self.annotator.image:
-        image_pixmap = self.annotator.image
+        image_pixmap = QPixmap.fromImage(self.annotator.full_resolution_image())
     else:
         # 如果annotator中沒有圖片，嘗試直接載入
         try:
@@ -2492,12 +2647,9 @@ def on_ai_predictions_accepted(self, image_path, accepted_predictions):
         bbox = pred['bbox']
         x, y, w, h = bbox
         
-        annotation = {
-            'id': self.annotator.next_id,
-            'rect': QRect(x, y, w, h),
-            'class_id': pred['class_id'],
-            'class_name': pred['class_name']
-        }
+        annotation = Annotation(self.annotator.next_id, QRect(x, y, w, h), pred['class_id'],
+                                confidence=pred.get('confidence'),
+                                source=pred.get('source', 'ai_prediction'))
         
         new_annotations.append(annotation)
         self.annotator.next_id += 1
@@ -2508,15 +2660,13 @@ def on_ai_predictions_accepted(self, image_path, accepted_predictions):
     
     # 如果是當前圖片，直接添加到標註器
     if image_path == self.image_path:
-        self.annotator.rects.extend(new_annotations)
+        self.annotator.add_rects(new_annotations, record=False)
+        self.annotation_history.push(image_path, AddAnnotationsCommand(new_annotations, '接受 AI 預測'))
         self.annotator.repaint()
         self.update_rect_list()
     
     # 更新快取
-    if image_path not in self.annotations_cache:
-        self.annotations_cache[image_path] = []
-    
-    self.annotations_cache[image_path].extend(new_annotations)
+    self.annotations_cache.extend(image_path, new_annotations)
     
     # 發送更新信號
     self.annotator.rects_updated.emit()
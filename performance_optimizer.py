@@ -1,221 +1,574 @@
 """
-效能優化模組 - 大圖片載入優化、記憶體管理、多執行緒處理
+效能優化模組 - 大圖片載入優化、記憶體管理、多執行緒處理、瀏覽預載
 """
 
 import os
 import gc
+import math
+import heapq
+import itertools
 import threading
-import queue
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Callable, Any, Dict
-from PyQt5.QtCore import QThread, pyqtSignal, QObject, QTimer
-from PyQt5.QtGui import QPixmap
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Callable, Any, Dict, List, Tuple, Iterable
+from PyQt5.QtCore import pyqtSignal, QObject, QTimer
+from PyQt5.QtGui import QPixmap, QImage
 from PIL import Image
-import cv2
 import numpy as np
 
+from frame_cache import shared_frame_cache
+
 
 class ImageCache:
-    """圖片快取管理器"""
+    """
+    圖片快取管理器
+    
+    預設為 LRU（OrderedDict，存取與淘汰皆為 O(1)）；policy='gdsf' 時改用 GDSF（Greedy-Dual-Size-Frequency），
+    依 存取次數 × 成本 / 大小 決定淘汰順序，1MP 與 50MP 圖片混用時不會讓單張大圖擠掉大量小圖。
+    項目大小依實際像素深度計算（QPixmap、QImage、numpy 陣列、影像金字塔），無法計算時使用呼叫端提供的大小。
+    """
+    
+    POLICIES = ('lru', 'gdsf')
     
-    def __init__(self, max_cache_size: int = 100 * 1024 * 1024):  # 100MB
+    def __init__(self, max_cache_size: int = 100 * 1024 * 1024,  # 100MB
+                 policy: str = 'lru', cost_function: Optional[Callable[[str, int], float]] = None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支援的快取策略: {policy}")
         self.max_cache_size = max_cache_size
-        self.cache = {}
-        self.access_order = []
+        self.policy = policy
+        self.cost_function = cost_function  # GDSF 成本 cost(key, size)，預設每個項目成本相同
+        self.cache = OrderedDict()  # {key: {'pixmap', 'size', 'frequency', 'priority'}}，LRU 時最舊者在前
         self.current_size = 0
         self.lock = threading.Lock()
+        
+        # GDSF：優先值最小堆（延遲刪除過期項目）與膨脹值
+        self.heap = []
+        self.inflation = 0.0
+        self._sequence = itertools.count()
+        
+        # 統計
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
     
-    def get(self, key: str) -> Optional[QPixmap]:
+    @staticmethod
+    def measure_size(obj: Any, size_hint: Optional[int] = None) -> int:
+        """快取項目佔用的位元組數（依實際像素深度）"""
+        if isinstance(obj, QPixmap):
+            return obj.width() * obj.height() * obj.depth() // 8
+        if isinstance(obj, QImage):
+            return obj.bytesPerLine() * obj.height()
+        if isinstance(obj, np.ndarray):
+            return obj.nbytes
+        base_image = getattr(obj, 'base_image', None)  # 影像金字塔
+        if isinstance(base_image, QImage):
+            return base_image.bytesPerLine() * base_image.height()
+        return size_hint or 0
+    
+    def __contains__(self, key: str) -> bool:
+        with self.lock:
+            return key in self.cache
+    
+    def get(self, key: str) -> Optional[Any]:
         """取得快取的圖片"""
         with self.lock:
-            if key in self.cache:
-                # 更新訪問順序
-                self.access_order.remove(key)
-                self.access_order.append(key)
-                return self.cache[key]['pixmap']
-            return None
-    
-    def put(self, key: str, pixmap: QPixmap, size: int):
-        """加入圖片到快取"""
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            if self.policy == 'lru':
+                self.cache.move_to_end(key)
+            else:
+                entry['frequency'] += 1
+                self._push_priority(key, entry)
+            return entry['pixmap']
+    
+    def put(self, key: str, pixmap: Any, size: Optional[int] = None):
+        """加入圖片到快取（大小依實際像素深度計算，size 僅作為無法計算時的備用值）"""
+        size = self.measure_size(pixmap, size)
         with self.lock:
+            frequency = 1
             # 如果已存在，更新
             if key in self.cache:
-                old_size = self.cache[key]['size']
-                self.current_size -= old_size
-                self.access_order.remove(key)
+                old_entry = self.cache.pop(key)
+                self.current_size -= old_entry['size']
+                frequency = old_entry['frequency'] + 1
+            
+            # 超過整個快取上限的項目不快取
+            if size > self.max_cache_size:
+                return
             
             # 檢查是否需要清理快取
-            while self.current_size + size > self.max_cache_size and self.access_order:
-                self._evict_oldest()
+            while self.current_size + size > self.max_cache_size and self.cache:
+                self._evict_one()
             
             # 加入新項目
-            self.cache[key] = {
+            entry = {
                 'pixmap': pixmap,
-                'size': size
+                'size': size,
+                'frequency': frequency,
+                'priority': 0.0
             }
+            self.cache[key] = entry
             self.current_size += size
-            self.access_order.append(key)
+            if self.policy == 'gdsf':
+                self._push_priority(key, entry)
     
-    def _evict_oldest(self):
-        """移除最舊的快取項目"""
-        if self.access_order:
-            oldest_key = self.access_order.pop(0)
-            if oldest_key in self.cache:
-                old_size = self.cache[oldest_key]['size']
-                self.current_size -= old_size
-                del self.cache[oldest_key]
+    def _push_priority(self, key: str, entry: Dict):
+        """GDSF：更新項目優先值 H = L + 次數 × 成本 / 大小"""
+        cost = self.cost_function(key, entry['size']) if self.cost_function else 1.0
+        entry['priority'] = self.inflation + entry['frequency'] * cost / max(entry['size'], 1)
+        heapq.heappush(self.heap, (entry['priority'], next(self._sequence), key))
+        if len(self.heap) > 4 * len(self.cache) + 64:
+            self._compact_heap()
+    
+    def _evict_one(self):
+        """淘汰一個項目（LRU：最久未使用；GDSF：優先值最低者）"""
+        if self.policy == 'lru':
+            key, entry = self.cache.popitem(last=False)
+        else:
+            while True:
+                priority, _, key = heapq.heappop(self.heap)
+                entry = self.cache.get(key)
+                if entry is not None and entry['priority'] == priority:
+                    break
+            del self.cache[key]
+            self.inflation = priority
+        self.current_size -= entry['size']
+        self.evictions += 1
+    
+    def _compact_heap(self):
+        """GDSF：移除堆積中已過期的項目"""
+        self.heap = [(entry['priority'], next(self._sequence), key) for key, entry in self.cache.items()]
+        heapq.heapify(self.heap)
+    
+    def shrink(self, ratio: float = 0.5) -> int:
+        """依淘汰策略移除指定比例的項目（記憶體不足時呼叫），回傳移除數量"""
+        with self.lock:
+            count = int(len(self.cache) * ratio)
+            for _ in range(count):
+                self._evict_one()
+            return count
+    
+    def resize(self, max_cache_size: int) -> int:
+        """變更快取上限（由記憶體管理器調整預算），超過新上限的部分依淘汰策略移除，回傳移除數量"""
+        with self.lock:
+            self.max_cache_size = max_cache_size
+            count = 0
+            while self.current_size > max_cache_size and self.cache:
+                self._evict_one()
+                count += 1
+            return count
+    
+    def remove_prefix(self, prefix: str) -> int:
+        """移除所有鍵以指定前綴開頭的項目，回傳移除數量"""
+        with self.lock:
+            keys = [key for key in self.cache if key.startswith(prefix)]
+            for key in keys:
+                self.current_size -= self.cache.pop(key)['size']
+            return len(keys)
     
     def clear(self):
         """清空快取"""
         with self.lock:
             self.cache.clear()
-            self.access_order.clear()
+            self.heap.clear()
+            self.inflation = 0.0
             self.current_size = 0
             gc.collect()
     
     def get_stats(self) -> Dict:
         """取得快取統計"""
         with self.lock:
+            requests = self.hits + self.misses
             return {
                 'cache_count': len(self.cache),
                 'current_size_mb': self.current_size / (1024 * 1024),
                 'max_size_mb': self.max_cache_size / (1024 * 1024),
-                'hit_ratio': getattr(self, '_hit_count', 0) / max(getattr(self, '_total_requests', 1), 1)
+                'hit_ratio': self.hits / requests if requests else 0.0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'policy': self.policy
             }
 
 
-class ImageLoader(QThread):
-    """非同步圖片載入器"""
+# 可直接繪製的 QImage 格式
+_DIRECT_IMAGE_FORMATS = (QImage.Format_RGB32, QImage.Format_ARGB32, QImage.Format_ARGB32_Premultiplied)
+
+# NumPy 通道數 -> QImage 格式（皆為每通道 8 位元）
+_NUMPY_IMAGE_FORMATS = {1: QImage.Format_Grayscale8, 3: QImage.Format_RGB888, 4: QImage.Format_RGBA8888}
+
+
+def numpy_to_qimage(array: np.ndarray, image_format: Optional[QImage.Format] = None) -> QImage:
+    """
+    以 NumPy 陣列的記憶體直接建立 QImage（不複製像素）
+    
+    支援 uint8 的灰階 (H, W)、RGB (H, W, 3)、RGBA (H, W, 4) 陣列，列間距取自陣列的 strides；
+    4 通道的位元組順序不是 RGBA 時以 image_format 指定（例如 BGRX 對應 Format_RGB32）。
+    QImage 不擁有這塊記憶體，因此陣列參照保存在回傳的 QImage 物件上：
+    跨執行緒傳遞時必須傳遞同一個 Python 物件（signal 參數型別為 object），不可讓 Qt 複製。
+    """
+    if array.dtype != np.uint8:
+        raise ValueError(f"不支援的陣列型別: {array.dtype}")
+    channels = 1 if array.ndim == 2 else array.shape[2]
+    image_format = image_format if image_format is not None else _NUMPY_IMAGE_FORMATS.get(channels)
+    if image_format is None or array.ndim not in (2, 3):
+        raise ValueError(f"不支援的陣列形狀: {array.shape}")
     
-    image_loaded = pyqtSignal(str, QPixmap)  # 路徑, 圖片
-    loading_progress = pyqtSignal(int, int)  # 當前, 總數
-    loading_error = pyqtSignal(str, str)     # 路徑, 錯誤訊息
+    # 每列內的像素必須緊密排列；列與列之間可以有間距
+    if array.strides[1] != channels or (array.ndim == 3 and array.strides[2] != 1) or array.strides[0] < 0:
+        array = np.ascontiguousarray(array)
     
-    def __init__(self, cache: ImageCache):
+    height, width = array.shape[:2]
+    image = QImage(array.data, width, height, array.strides[0], image_format)
+    image._numpy_buffer = array  # 保持記憶體存活直到 QImage 物件被釋放
+    return image
+
+
+def _jpeg_reduction(image_size: Tuple[int, int], fit_size: Tuple[int, int]) -> Tuple[int, int]:
+    """以適應方式顯示於 fit_size 時，縮小解碼仍足夠的最小尺寸（供 PIL draft 選擇 1/2、1/4、1/8 倍率）"""
+    width, height = image_size
+    scale = min(1.0, fit_size[0] / width, fit_size[1] / height)
+    return max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+
+
+def decode_image(image_path: str, fit_size: Optional[Tuple[int, int]] = None) -> Tuple[QImage, Tuple[int, int]]:
+    """
+    解碼圖片並轉為可直接繪製的格式，回傳 (QImage, 原圖尺寸)
+    
+    指定 fit_size（適應視窗顯示的區域大小）時，JPEG 以 DCT 縮小解碼（PIL draft）直接產生
+    1/2、1/4 或 1/8 尺寸，縮小後仍不低於適應視窗的顯示解析度；其他格式以完整解析度解碼。
+    完整解析度解碼在啟用畫面快取（frame_cache）時改由記憶體映射檔取得，重複開啟同一張圖片不需再解碼。
+    可在背景執行緒執行。
+    """
+    if fit_size and fit_size[0] > 0 and fit_size[1] > 0:
+        with Image.open(image_path) as img:
+            if img.format == 'JPEG' and img.mode in ('RGB', 'L'):
+                full_size = img.size
+                img.draft('RGB', _jpeg_reduction(full_size, fit_size))
+                if img.size != full_size:
+                    if img.mode != 'RGB':
+                        img = img.convert('RGB')
+                    width, height = img.size
+                    # BGRX 位元組順序即 Format_RGB32，可直接繪製不需再轉換
+                    pixels = np.frombuffer(img.tobytes('raw', 'BGRX'), dtype=np.uint8).reshape(height, width, 4)
+                    return numpy_to_qimage(pixels, QImage.Format_RGB32), full_size
+    
+    frame_cache = shared_frame_cache()
+    if frame_cache is not None:
+        try:
+            frame = frame_cache.load(image_path)
+        except Exception as e:
+            print(f"畫面快取錯誤: {image_path}, {e}")
+            frame = None
+        if frame is not None:
+            return numpy_to_qimage(frame, QImage.Format_RGB32), (frame.shape[1], frame.shape[0])
+    
+    image = QImage(image_path)
+    if image.isNull():
+        raise Exception(f"無法載入圖片: {image_path}")
+    if image.format() not in _DIRECT_IMAGE_FORMATS:
+        image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return image, (image.width(), image.height())
+
+
+# 瀏覽預載設定
+FRAME_CACHE_SIZE = 512 * 1024 * 1024  # 完整解析度畫面快取上限 512MB（20MP 圖片約可保留 6 張）
+PREFETCH_AHEAD = 3                    # 沿瀏覽方向預載的張數
+PREFETCH_BEHIND = 1                   # 反方向保留的張數
+
+# 圖片載入優先順序（數字越小越先處理）
+PRIORITY_CURRENT = 0     # 目前顯示的圖片
+PRIORITY_NEXT = 1        # 瀏覽方向的下一張
+PRIORITY_PREVIOUS = 2    # 反方向的上一張
+PRIORITY_BACKGROUND = 3  # 其他預載
+LOADER_WORKERS = max(1, min(4, (os.cpu_count() or 1)))  # 解碼執行緒數
+
+
+class ImageLoader(QObject):
+    """
+    圖片載入器：依上一／下一張的瀏覽方向，以常駐解碼執行緒從優先順序堆積取出請求並存入快取
+    
+    優先順序為 目前圖片 > 瀏覽方向的下一張 > 反方向的上一張 > 其他預載；同一路徑只保留一個請求
+    （再次加入時改用新的優先順序），瀏覽到其他圖片時取消已不在範圍內、尚未開始的請求，
+    快速連續切換時不會累積大量過時的解碼。解碼執行緒在第一個請求時才啟動。
+    
+    解碼結果為 QImage（可跨執行緒使用），可另外指定 prepare(QImage, 圖片路徑, 原圖尺寸) 在背景建立
+    顯示用的物件（例如預先產生縮小層級的影像金字塔），快取中保存的是 prepare 的結果。
+    指定 fit_size 時 JPEG 只解碼到適應視窗所需的解析度（見 decode_image），
+    此時解碼結果小於原圖，prepare 需依原圖尺寸處理（不指定 prepare 時一律完整解碼）。
+    """
+    
+    image_ready = pyqtSignal(str)         # 背景載入完成的圖片路徑
+    loading_error = pyqtSignal(str, str)  # 路徑, 錯誤訊息
+    
+    def __init__(self, cache: ImageCache, max_workers: int = LOADER_WORKERS,
+                 ahead: int = PREFETCH_AHEAD, behind: int = PREFETCH_BEHIND):
         super().__init__()
         self.cache = cache
-        self.load_queue = queue.Queue()
-        self.is_running = False
-        self.current_priority_path = None
+        self.max_workers = max_workers
+        self.ahead = ahead
+        self.behind = behind
+        self.heap = []          # [(優先順序, 序號, 路徑)]，取消或改變優先順序的舊項目延遲刪除
+        self.queued = {}        # {路徑: (優先順序, 序號)}：有效的排隊請求
+        self.pending = {}       # {路徑: (Future, prepare, fit_size)}：排隊或解碼中的請求
+        self.condition = threading.Condition()
+        self._sequence = itertools.count()
+        self.workers = []
+        self.stopped = False
+        self.last_index = None
+        self.direction = 1
+        self.stats = {'hits': 0, 'waits': 0, 'misses': 0}
+    
+    @property
+    def is_running(self) -> bool:
+        """是否有排隊或解碼中的請求"""
+        with self.condition:
+            return bool(self.pending)
+    
+    def _ensure_workers_locked(self):
+        """第一個請求時啟動解碼執行緒（需持有鎖）"""
+        if not self.workers:
+            self.workers = [threading.Thread(target=self._worker, name=f'image-loader-{i}', daemon=True)
+                            for i in range(self.max_workers)]
+            for worker in self.workers:
+                worker.start()
+    
+    def add_load_request(self, image_path: str, priority: int = PRIORITY_BACKGROUND,
+                         prepare: Optional[Callable[[QImage, str, Tuple[int, int]], Any]] = None,
+                         fit_size: Optional[Tuple[int, int]] = None):
+        """排程背景載入（已在快取或解碼中則略過；已排隊時改用新的優先順序）"""
+        if image_path in self.cache:
+            return
+        with self.condition:
+            if self.stopped:
+                return
+            existing = self.queued.get(image_path)
+            if image_path in self.pending:
+                if existing is None or existing[0] == priority:
+                    return  # 解碼中，或已以相同的優先順序排隊
+                future = self.pending[image_path][0]
+            else:
+                future = Future()
+            self.pending[image_path] = (future, prepare, fit_size)
+            entry = (priority, next(self._sequence))
+            self.queued[image_path] = entry
+            heapq.heappush(self.heap, entry + (image_path,))
+            self._ensure_workers_locked()
+            self.condition.notify()
+    
+    def cancel(self, image_path: str) -> bool:
+        """取消尚未開始的請求"""
+        with self.condition:
+            cancelled = self._cancel_locked(image_path)
+            self._compact_heap()
+            return cancelled
+    
+    def retain(self, image_paths) -> int:
+        """只保留指定路徑的排隊請求，其餘取消，回傳取消數量"""
+        keep = set(image_paths)
+        with self.condition:
+            stale = [path for path in self.queued if path not in keep]
+            for path in stale:
+                self._cancel_locked(path)
+            self._compact_heap()
+            return len(stale)
+    
+    def _cancel_locked(self, image_path: str) -> bool:
+        if self.queued.pop(image_path, None) is None:
+            return False
+        self.pending.pop(image_path)[0].cancel()
+        return True
+    
+    def get(self, image_path: str, prepare: Optional[Callable[[QImage, str, Tuple[int, int]], Any]] = None,
+            fit_size: Optional[Tuple[int, int]] = None) -> Any:
+        """
+        取得圖片：快取命中直接回傳；正在背景解碼則等待該工作完成；否則於呼叫端同步解碼
         
-        # 預設載入參數
-        self.max_display_size = (2000, 2000)  # 顯示用的最大尺寸
-        self.thumbnail_size = (400, 400)      # 縮略圖尺寸
+        仍在排隊的請求會先取消，由呼叫端直接解碼，不必等待佇列中其他圖片。
+        """
+        frame = self.cache.get(image_path)
+        if frame is not None:
+            self.stats['hits'] += 1
+            return frame
         
-    def add_load_request(self, image_path: str, priority: bool = False):
-        """添加載入請求"""
-        if priority:
-            self.current_priority_path = image_path
-        self.load_queue.put((image_path, priority))
+        with self.condition:
+            self._cancel_locked(image_path)
+            request = self.pending.get(image_path)
+        if request is not None:
+            try:
+                frame = request[0].result()
+                self.stats['waits'] += 1
+                return frame
+            except Exception:
+                pass  # 背景解碼失敗時於呼叫端重新解碼，由呼叫端處理錯誤
+        
+        self.stats['misses'] += 1
+        return self._load(image_path, prepare, fit_size)
+    
+    def request_around(self, image_paths: List[str], index: int,
+                       prepare: Optional[Callable[[QImage, str, Tuple[int, int]], Any]] = None,
+                       fit_size: Optional[Tuple[int, int]] = None):
+        """
+        以目前圖片為中心重新排定載入：目前 > 瀏覽方向的下一張 > 反方向的上一張 > 範圍內其他圖片，
+        瀏覽方向由前後兩次的索引判斷，並取消已不在範圍內、尚未開始的請求
+        """
+        if not 0 <= index < len(image_paths):
+            return
+        if self.last_index is not None and index != self.last_index:
+            self.direction = 1 if index > self.last_index else -1
+        self.last_index = index
         
-        if not self.is_running:
-            self.start()
-    
-    def run(self):
-        """執行載入任務"""
-        self.is_running = True
-        processed = 0
-        total = self.load_queue.qsize()
+        wanted = {image_paths[index]: PRIORITY_CURRENT}
+        for step in range(1, max(self.ahead, self.behind) + 1):
+            for offset, limit, near_priority in ((self.direction * step, self.ahead, PRIORITY_NEXT),
+                                                 (-self.direction * step, self.behind, PRIORITY_PREVIOUS)):
+                position = index + offset
+                if step <= limit and 0 <= position < len(image_paths):
+                    wanted.setdefault(image_paths[position], near_priority if step == 1 else PRIORITY_BACKGROUND)
         
-        while not self.load_queue.empty():
+        self.retain(wanted)
+        for path, priority in wanted.items():
+            self.add_load_request(path, priority, prepare, fit_size)
+    
+    def _compact_heap(self):
+        """已取消的項目超過一半時重建堆積（需持有鎖）"""
+        if len(self.heap) > 2 * len(self.queued) + 16:
+            self.heap = [entry + (path,) for path, entry in self.queued.items()]
+            heapq.heapify(self.heap)
+    
+    def _next_request(self) -> Optional[str]:
+        """取出優先順序最高的有效請求（無請求時等待，停止時回傳 None）"""
+        with self.condition:
+            while True:
+                if self.stopped:
+                    return None
+                while self.heap:
+                    priority, sequence, image_path = heapq.heappop(self.heap)
+                    if self.queued.get(image_path) == (priority, sequence):
+                        del self.queued[image_path]
+                        return image_path
+                self.condition.wait()
+    
+    def _load(self, image_path: str, prepare: Optional[Callable[[QImage, str, Tuple[int, int]], Any]],
+              fit_size: Optional[Tuple[int, int]]) -> Any:
+        """解碼並存入快取（背景執行緒或同步呼叫）"""
+        image, full_size = decode_image(image_path, fit_size if prepare else None)
+        frame = prepare(image, image_path, full_size) if prepare else image
+        self.cache.put(image_path, frame, image.bytesPerLine() * image.height())
+        return frame
+    
+    def _worker(self):
+        """常駐解碼執行緒"""
+        while True:
+            image_path = self._next_request()
+            if image_path is None:
+                return
+            with self.condition:
+                future, prepare, fit_size = self.pending[image_path]
+            if not future.set_running_or_notify_cancel():
+                continue
             try:
-                image_path, priority = self.load_queue.get(timeout=1)
-                
-                # 檢查快取
-                cached_pixmap = self.cache.get(image_path)
-                if cached_pixmap:
-                    self.image_loaded.emit(image_path, cached_pixmap)
-                    processed += 1
-                    self.loading_progress.emit(processed, total)
-                    continue
-                
-                # 載入圖片
-                pixmap = self.load_optimized_image(image_path)
-                if pixmap:
-                    # 計算大小並加入快取
-                    size = pixmap.width() * pixmap.height() * 4  # RGBA
-                    self.cache.put(image_path, pixmap, size)
-                    self.image_loaded.emit(image_path, pixmap)
-                else:
-                    self.loading_error.emit(image_path, "無法載入圖片")
-                
-                processed += 1
-                self.loading_progress.emit(processed, total)
-                
-            except queue.Empty:
-                break
+                future.set_result(self._load(image_path, prepare, fit_size))
             except Exception as e:
+                future.set_exception(e)
                 self.loading_error.emit(image_path, str(e))
-        
-        self.is_running = False
+            finally:
+                with self.condition:
+                    if self.pending.get(image_path, (None,))[0] is future:
+                        del self.pending[image_path]
+            if future.exception() is None:
+                self.image_ready.emit(image_path)
     
-    def load_optimized_image(self, image_path: str) -> Optional[QPixmap]:
-        """優化的圖片載入"""
-        try:
-            # 使用PIL檢查圖片資訊
-            with Image.open(image_path) as img:
-                original_size = img.size
-                
-                # 如果圖片太大，進行縮放
-                if (original_size[0] > self.max_display_size[0] or 
-                    original_size[1] > self.max_display_size[1]):
-                    
-                    # 計算縮放比例
-                    scale_x = self.max_display_size[0] / original_size[0]
-                    scale_y = self.max_display_size[1] / original_size[1]
-                    scale = min(scale_x, scale_y)
-                    
-                    new_size = (int(original_size[0] * scale), int(original_size[1] * scale))
-                    
-                    # 使用高品質重新取樣
-                    img_resized = img.resize(new_size, Image.Resampling.LANCZOS)
-                    
-                    # 轉換為QPixmap
-                    if img_resized.mode != 'RGB':
-                        img_resized = img_resized.convert('RGB')
-                    
-                    # 轉換為numpy陣列然後到QPixmap
-                    img_array = np.array(img_resized)
-                    height, width, channel = img_array.shape
-                    bytes_per_line = 3 * width
-                    
-                    # 使用OpenCV轉換顏色空間
-                    img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-                    
-                    # 轉為QPixmap
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(cv2.imencode('.jpg', img_array, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes())
-                    
-                    return pixmap
-                else:
-                    # 直接載入小圖片
-                    pixmap = QPixmap(image_path)
-                    return pixmap if not pixmap.isNull() else None
-                    
-        except Exception as e:
-            print(f"載入圖片錯誤: {image_path}, {e}")
-            return None
+    def shutdown(self, timeout: float = 1.0):
+        """取消所有排隊請求並停止解碼執行緒（解碼中的圖片最多等待 timeout 秒）"""
+        with self.condition:
+            self.stopped = True
+            for path in list(self.queued):
+                self._cancel_locked(path)
+            self.heap.clear()
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join(timeout)
+
+
+MEMORY_RESERVE_FRACTION = 0.15   # 保留給系統與其他程式的可用記憶體比例
+MEMORY_RESERVE_MIN = 512 * 1024 * 1024
+PROCESS_MEMORY_FRACTION = 0.5    # 本程式常駐記憶體（RSS）上限佔實體記憶體的比例
+BUDGET_GROW_RATE = 0.25          # 每次檢查向目標預算成長的比例（逐步放大，避免一次吃掉剛釋出的記憶體）
+BUDGET_SHRINK_RATE = 0.5         # 每次檢查向目標預算縮小的比例（可用記憶體低於保留量一半時直接縮到目標）
+BENEFIT_SMOOTHING = 0.3          # 各快取近期存取量的指數平滑係數
+
+
+class CacheBudget:
+    """記憶體管理器中單一快取的預算設定"""
+    
+    __slots__ = ('cache', 'name', 'weight', 'min_size', 'max_size', 'budget', 'activity', 'last_requests')
+    
+    def __init__(self, cache, name: str, weight: float, min_size: int, max_size: int):
+        self.cache = cache
+        self.name = name
+        self.weight = weight        # 未命中的相對成本（重新解碼越貴越高）
+        self.min_size = min_size
+        self.max_size = max_size
+        self.budget = max_size
+        self.activity = 0.0         # 平滑後的每次檢查間存取次數
+        self.last_requests = cache.hits + cache.misses
+    
+    def update_activity(self):
+        requests = self.cache.hits + self.cache.misses
+        recent = requests - self.last_requests
+        self.last_requests = requests
+        self.activity += BENEFIT_SMOOTHING * (recent - self.activity)
+    
+    @property
+    def benefit(self) -> float:
+        """分配預算的權重：未命中成本 × 近期存取量（閒置的快取仍保有基本權重）"""
+        return self.weight * (1.0 + self.activity)
 
 
 class MemoryManager(QObject):
-    """記憶體管理器"""
+    """
+    記憶體管理器
+    
+    定期依本程式的常駐記憶體（RSS）與系統可用記憶體計算所有快取的總預算：
+    可用記憶體需保留一定比例給系統，RSS 不超過實體記憶體的一定比例。
+    總預算逐步向目標成長或縮小，再依各快取的未命中成本與近期存取量分配（每個快取介於最小與最大預算之間），
+    超過預算的快取依自身淘汰策略（LRU / GDSF）移除項目；記憶體恢復時預算會再逐步放大。
+    """
     
     memory_warning = pyqtSignal(int)  # 記憶體使用百分比
     
     def __init__(self):
         super().__init__()
         self.cache_managers = []
+        self.budgets: List[CacheBudget] = []
+        self.total_budget = 0
         self.monitoring = False
         self.timer = QTimer()
         self.timer.timeout.connect(self.check_memory)
+        self._process = None
         
-        # 記憶體閾值
-        self.warning_threshold = 80  # 80%
-        self.critical_threshold = 90  # 90%
+    def register_cache(self, cache_manager, name: Optional[str] = None, weight: float = 1.0,
+                       min_size: int = 16 * 1024 * 1024, max_size: Optional[int] = None):
+        """
+        註冊快取管理器
         
-    def register_cache(self, cache_manager):
-        """註冊快取管理器"""
+        支援 resize() 的快取（ImageCache）由記憶體管理器分配預算：max_size 預設為目前的快取上限，
+        weight 為未命中的相對成本（必須大於 0）；其他快取只在 gentle_cleanup / emergency_cleanup 時清理。
+        """
+        if not weight > 0:
+            raise ValueError(f"快取權重必須大於 0: {weight}")
         self.cache_managers.append(cache_manager)
+        if hasattr(cache_manager, 'resize'):
+            max_size = max_size or cache_manager.max_cache_size
+            budget = CacheBudget(cache_manager, name or f'Cache_{len(self.cache_managers) - 1}',
+                                 weight, min(min_size, max_size), max_size)
+            self.budgets.append(budget)
+            self.total_budget += budget.budget
     
     def start_monitoring(self, interval: int = 5000):
         """開始記憶體監控"""
@@ -228,34 +581,79 @@ class MemoryManager(QObject):
         self.timer.stop()
     
     def check_memory(self):
-        """檢查記憶體使用"""
+        """檢查記憶體使用並調整快取預算"""
         try:
             import psutil
-            memory_percent = psutil.virtual_memory().percent
-            
-            if memory_percent > self.critical_threshold:
-                # 緊急清理
-                self.emergency_cleanup()
-                self.memory_warning.emit(memory_percent)
-            elif memory_percent > self.warning_threshold:
-                # 溫和清理
-                self.gentle_cleanup()
-                self.memory_warning.emit(memory_percent)
-                
+            memory = psutil.virtual_memory()
+            if self._process is None:
+                self._process = psutil.Process(os.getpid())
+            rss = self._process.memory_info().rss
         except ImportError:
             # 如果沒有psutil，使用基本的垃圾回收
             gc.collect()
+            return
+        except Exception as e:
+            print(f"讀取記憶體資訊錯誤: {e}")
+            return
+        
+        reserve = max(memory.total * MEMORY_RESERVE_FRACTION, MEMORY_RESERVE_MIN)
+        self.update_budgets(memory.available, reserve, memory.total * PROCESS_MEMORY_FRACTION - rss,
+                            critical=memory.available < reserve / 2)
+        if memory.available < reserve:
+            self.memory_warning.emit(int(memory.percent))
+    
+    def update_budgets(self, available: float, reserve: float, process_headroom: float, critical: bool = False):
+        """
+        依可用記憶體重新計算總預算並分配給各快取
+        
+        available - reserve 與 process_headroom（RSS 距上限的餘裕）中較小者為快取還能使用（負值為必須釋出）的量。
+        """
+        if not self.budgets:
+            return
+        cached = sum(budget.cache.current_size for budget in self.budgets)
+        target = cached + min(available - reserve, process_headroom)
+        target = min(max(target, sum(b.min_size for b in self.budgets)), sum(b.max_size for b in self.budgets))
+        if target >= self.total_budget:
+            self.total_budget += int((target - self.total_budget) * BUDGET_GROW_RATE)
+        elif critical:
+            self.total_budget = int(target)
+        else:
+            self.total_budget += int((target - self.total_budget) * BUDGET_SHRINK_RATE)
+        
+        for budget in self.budgets:
+            budget.update_activity()
+        self._allocate(self.total_budget)
+        for budget in self.budgets:
+            budget.cache.resize(budget.budget)
+    
+    def _allocate(self, total: int):
+        """依權重比例分配預算；碰到最小或最大預算的快取固定後，剩餘預算再分給其他快取"""
+        remaining = list(self.budgets)
+        while remaining:
+            weight_sum = sum(budget.benefit for budget in remaining)
+            clamped = []
+            for budget in remaining:
+                share = total * budget.benefit / weight_sum
+                if share <= budget.min_size:
+                    budget.budget = budget.min_size
+                    clamped.append(budget)
+                elif share >= budget.max_size:
+                    budget.budget = budget.max_size
+                    clamped.append(budget)
+                else:
+                    budget.budget = int(share)
+            if not clamped:
+                return
+            for budget in clamped:
+                remaining.remove(budget)
+                total -= budget.budget
     
     def gentle_cleanup(self):
         """溫和的記憶體清理"""
-        # 清理一半的快取
+        # 清理一半的快取（依各快取的淘汰策略）
         for cache in self.cache_managers:
-            if hasattr(cache, 'cache') and hasattr(cache, 'access_order'):
-                with cache.lock:
-                    cleanup_count = len(cache.access_order) // 2
-                    for _ in range(cleanup_count):
-                        if cache.access_order:
-                            cache._evict_oldest()
+            if hasattr(cache, 'shrink'):
+                cache.shrink(0.5)
         
         gc.collect()
     
@@ -289,6 +687,13 @@ class MemoryManager(QObject):
                     'used_percent': memory.percent
                 },
                 'cache_stats': cache_stats,
+                'cache_budgets': [{
+                    'name': budget.name,
+                    'budget_mb': budget.budget / (1024 * 1024),
+                    'current_size_mb': budget.cache.current_size / (1024 * 1024),
+                    'max_size_mb': budget.max_size / (1024 * 1024)
+                } for budget in self.budgets],
+                'total_budget_mb': self.total_budget / (1024 * 1024),
                 'monitoring': self.monitoring
             }
         except ImportError:
@@ -299,66 +704,245 @@ class MemoryManager(QObject):
             }
 
 
-class BackgroundProcessor(QThread):
-    """背景處理器 - 用於預處理和批次任務"""
+class CancellationToken:
+    """背景任務的取消旗標（執行中的任務函式可定期檢查 is_cancelled 以提早結束）"""
+    
+    def __init__(self):
+        self._event = threading.Event()
+    
+    def cancel(self):
+        self._event.set()
+    
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class BackgroundTask:
+    """背景任務"""
+    
+    __slots__ = ('task_id', 'func', 'args', 'kwargs', 'priority', 'executor', 'token', 'waiting', 'status')
+    
+    def __init__(self, task_id: str, func: Callable, args: tuple, kwargs: Dict, priority: int, executor: str):
+        self.task_id = task_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.executor = executor      # 'thread' / 'process'
+        self.token = CancellationToken()
+        self.waiting = set()          # 尚未完成的相依任務ID
+        self.status = 'waiting'       # waiting / queued / running
+
+
+class BackgroundProcessor(QObject):
+    """
+    背景處理器 - 用於預處理和批次任務
+    
+    常駐的執行緒池（與依需要建立的行程池）執行任務，任務完成時由 future 的完成回呼直接發出信號，
+    不需輪詢。等待中的任務依優先順序（PRIORITY_*）排入有空的工作者，可指定相依任務（全部成功後才執行，
+    任一失敗或取消則一併取消）；取消尚未開始的任務會立即移除，執行中的任務則設定其 CancellationToken。
+    """
     
     task_completed = pyqtSignal(str, object)  # 任務ID, 結果
     progress_updated = pyqtSignal(str, int, int)  # 任務ID, 當前, 總數
     task_error = pyqtSignal(str, str)  # 任務ID, 錯誤訊息
+    task_cancelled = pyqtSignal(str)  # 任務ID
     
-    def __init__(self, max_workers: int = 4):
+    FAILED_HISTORY_SIZE = 1024  # 保留失敗／取消紀錄的數量（供之後提交的相依任務判斷）
+    
+    def __init__(self, max_workers: int = 4, max_processes: Optional[int] = None):
         super().__init__()
-        self.max_workers = max_workers
-        self.task_queue = queue.Queue()
-        self.is_running = False
-        self.executor = None
+        self.max_workers = {'thread': max_workers, 'process': max_processes or (os.cpu_count() or 1)}
+        self.executors = {'thread': ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='background')}
+        self.lock = threading.Lock()
+        self.tasks: Dict[str, BackgroundTask] = {}      # 尚未結束的任務
+        self.ready = {'thread': [], 'process': []}      # 可執行任務的堆積 [(優先順序, 序號, 任務ID)]
+        self.running = {'thread': 0, 'process': 0}
+        self.dependents: Dict[str, List[str]] = {}      # {任務ID: 等待它完成的任務ID}
+        self.failed = OrderedDict()                     # 失敗或取消的任務ID
+        self._sequence = itertools.count()
+        self.stopped = False
     
-    def add_task(self, task_id: str, func: Callable, *args, **kwargs):
-        """添加後台任務"""
-        self.task_queue.put((task_id, func, args, kwargs))
-        
-        if not self.is_running:
-            self.start()
+    @property
+    def is_running(self) -> bool:
+        """是否有尚未結束的任務"""
+        with self.lock:
+            return bool(self.tasks)
     
-    def run(self):
-        """執行後台任務"""
-        self.is_running = True
-        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+    def add_task(self, task_id: str, func: Callable, *args, **kwargs) -> CancellationToken:
+        """添加後台任務（一般優先順序、執行緒池）"""
+        return self.submit(task_id, func, args, kwargs)
+    
+    def submit(self, task_id: str, func: Callable, args: tuple = (), kwargs: Optional[Dict] = None,
+               priority: int = PRIORITY_BACKGROUND, depends_on: Iterable[str] = (),
+               executor: str = 'thread', pass_token: bool = False) -> CancellationToken:
+        """
+        提交任務，回傳其取消旗標
         
-        futures = {}
+        executor 為 'thread'（I/O 與釋放 GIL 的工作）或 'process'（純 Python 的 CPU 密集工作，函式與參數需可 pickle）；
+        pass_token 為 True 時以 cancel_token 關鍵字參數傳入取消旗標（僅限執行緒池）。
+        depends_on 中不在佇列、也沒有失敗紀錄的任務視為已完成。
+        """
+        if executor not in self.max_workers:
+            raise ValueError(f"不支援的執行方式: {executor}")
+        if pass_token and executor == 'process':
+            raise ValueError("行程池任務無法傳入取消旗標")
+        task = BackgroundTask(task_id, func, tuple(args), dict(kwargs or {}), priority, executor)
+        if pass_token:
+            task.kwargs['cancel_token'] = task.token
         
-        while not self.task_queue.empty() or futures:
-            # 添加新任務
-            while not self.task_queue.empty() and len(futures) < self.max_workers:
-                try:
-                    task_id, func, args, kwargs = self.task_queue.get_nowait()
-                    future = self.executor.submit(func, *args, **kwargs)
-                    futures[future] = task_id
-                except queue.Empty:
-                    break
-                except Exception as e:
-                    self.task_error.emit(task_id, str(e))
-            
-            # 檢查完成的任務
-            completed_futures = []
-            for future, task_id in futures.items():
-                if future.done():
-                    try:
-                        result = future.result()
-                        self.task_completed.emit(task_id, result)
-                    except Exception as e:
-                        self.task_error.emit(task_id, str(e))
-                    completed_futures.append(future)
-            
-            # 移除完成的任務
-            for future in completed_futures:
-                del futures[future]
-            
-            # 短暫休息
-            self.msleep(100)
+        with self.lock:
+            if self.stopped:
+                raise RuntimeError("背景處理器已停止")
+            if task_id in self.tasks:
+                raise ValueError(f"任務ID重複: {task_id}")
+            self.failed.pop(task_id, None)
+            failed_dependency = next((dep for dep in depends_on if dep in self.failed), None)
+            if failed_dependency is None:
+                self.tasks[task_id] = task
+                for dep in depends_on:
+                    if dep in self.tasks:
+                        task.waiting.add(dep)
+                        self.dependents.setdefault(dep, []).append(task_id)
+                if not task.waiting:
+                    self._enqueue_locked(task)
+                started = self._dispatch_locked()
+        
+        if failed_dependency is not None:
+            task.token.cancel()
+            self.task_error.emit(task_id, f"相依任務未完成: {failed_dependency}")
+            return task.token
+        self._start(started)
+        return task.token
+    
+    def cancel(self, task_id: str) -> bool:
+        """取消任務（尚未開始者立即移除並一併取消相依它的任務；執行中者設定取消旗標）"""
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return False
+            task.token.cancel()
+            if task.status == 'running':
+                return True
+            cancelled = self._remove_cancelled_locked(task_id)
+        for cancelled_id in cancelled:
+            self.task_cancelled.emit(cancelled_id)
+        return True
+    
+    def report_progress(self, task_id: str, current: int, total: int):
+        """任務回報進度（可由任務執行緒呼叫）"""
+        self.progress_updated.emit(task_id, current, total)
+    
+    def shutdown(self):
+        """取消所有任務並關閉執行緒池與行程池（不等待執行中的任務）"""
+        with self.lock:
+            self.stopped = True
+            for task in self.tasks.values():
+                task.token.cancel()
+            self.tasks.clear()
+            self.dependents.clear()
+            for heap in self.ready.values():
+                heap.clear()
+            executors = list(self.executors.values())
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _executor(self, kind: str):
+        executor = self.executors.get(kind)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=self.max_workers[kind])
+            self.executors[kind] = executor
+        return executor
+    
+    def _enqueue_locked(self, task: BackgroundTask):
+        task.status = 'queued'
+        heapq.heappush(self.ready[task.executor], (task.priority, next(self._sequence), task.task_id))
+    
+    def _dispatch_locked(self) -> List[BackgroundTask]:
+        """取出各執行方式有空位時優先順序最高的任務（需持有鎖，實際提交於鎖外進行）"""
+        started = []
+        for kind, heap in self.ready.items():
+            while heap and self.running[kind] < self.max_workers[kind]:
+                task = self.tasks.get(heapq.heappop(heap)[2])
+                if task is None or task.status != 'queued':
+                    continue
+                task.status = 'running'
+                self.running[kind] += 1
+                started.append(task)
+        return started
+    
+    def _start(self, tasks: List[BackgroundTask]):
+        for task in tasks:
+            try:
+                with self.lock:
+                    executor = self._executor(task.executor)
+                future = executor.submit(task.func, *task.args, **task.kwargs)
+            except Exception as e:
+                self._finish(task, 'failed', str(e))
+                continue
+            future.add_done_callback(lambda f, task=task: self._on_done(task, f))
+    
+    def _on_done(self, task: BackgroundTask, future):
+        """future 完成回呼（在工作者執行緒執行，信號以佇列連接送到主執行緒）"""
+        if future.cancelled() or task.token.is_cancelled():
+            self._finish(task, 'cancelled', None)
+            return
+        error = future.exception()
+        if error is not None:
+            self._finish(task, 'failed', str(error))
+        else:
+            self._finish(task, 'completed', future.result())
+    
+    def _record_failed_locked(self, task_id: str):
+        self.failed[task_id] = True
+        while len(self.failed) > self.FAILED_HISTORY_SIZE:
+            self.failed.popitem(last=False)
+    
+    def _remove_cancelled_locked(self, task_id: str) -> List[str]:
+        """移除未開始的任務與相依它的任務，回傳被取消的任務ID"""
+        cancelled = []
+        pending = [task_id]
+        while pending:
+            current = pending.pop()
+            task = self.tasks.pop(current, None)
+            if task is None:
+                continue
+            task.token.cancel()
+            task.status = 'cancelled'
+            self._record_failed_locked(current)
+            cancelled.append(current)
+            pending.extend(self.dependents.pop(current, []))
+        return cancelled
+    
+    def _finish(self, task: BackgroundTask, status: str, payload: Any):
+        cancelled = []
+        with self.lock:
+            if self.tasks.get(task.task_id) is task:
+                del self.tasks[task.task_id]
+            self.running[task.executor] -= 1
+            dependents = self.dependents.pop(task.task_id, [])
+            if status == 'completed':
+                for dependent_id in dependents:
+                    dependent = self.tasks.get(dependent_id)
+                    if dependent is not None and dependent.status == 'waiting':
+                        dependent.waiting.discard(task.task_id)
+                        if not dependent.waiting:
+                            self._enqueue_locked(dependent)
+            else:
+                self._record_failed_locked(task.task_id)
+                for dependent_id in dependents:
+                    cancelled.extend(self._remove_cancelled_locked(dependent_id))
+            started = [] if self.stopped else self._dispatch_locked()
         
-        self.executor.shutdown(wait=True)
-        self.is_running = False
+        if status == 'completed':
+            self.task_completed.emit(task.task_id, payload)
+        elif status == 'failed':
+            self.task_error.emit(task.task_id, payload)
+        else:
+            self.task_cancelled.emit(task.task_id)
+        for cancelled_id in cancelled:
+            self.task_cancelled.emit(cancelled_id)
+        self._start(started)
 
 
 class PerformanceOptimizer:
@@ -369,12 +953,16 @@ class PerformanceOptimizer:
         
         # 初始化元件
         self.image_cache = ImageCache(max_cache_size=200 * 1024 * 1024)  # 200MB
-        self.image_loader = ImageLoader(self.image_cache)
         self.memory_manager = MemoryManager()
         self.background_processor = BackgroundProcessor()
         
-        # 註冊快取到記憶體管理器
-        self.memory_manager.register_cache(self.image_cache)
+        # 上一／下一張瀏覽：完整解析度畫面快取與依優先順序的背景載入
+        self.frame_cache = ImageCache(max_cache_size=FRAME_CACHE_SIZE)
+        self.image_loader = ImageLoader(self.frame_cache)
+        
+        # 註冊快取到記憶體管理器（完整解析度畫面重新解碼最貴，權重較高）
+        self.memory_manager.register_cache(self.image_cache, name='圖片')
+        self.memory_manager.register_cache(self.frame_cache, name='畫面', weight=2.0)
         
         # 啟動記憶體監控
         self.memory_manager.start_monitoring()
@@ -390,55 +978,20 @@ class PerformanceOptimizer:
         
         # 連接信號
         self.memory_manager.memory_warning.connect(self.on_memory_warning)
-        self.image_loader.image_loaded.connect(self.on_image_loaded)
+        self.image_loader.image_ready.connect(self.on_image_loaded)
         self.background_processor.task_completed.connect(self.on_background_task_completed)
     
-    def load_image_async(self, image_path: str, priority: bool = False):
-        """非同步載入圖片"""
-        # 檢查快取
-        cached = self.image_cache.get(image_path)
-        if cached:
-            self.stats['cache_hits'] += 1
-            return cached
-        
-        self.stats['cache_misses'] += 1
-        self.image_loader.add_load_request(image_path, priority)
-        return None
-    
-    def preload_images(self, image_paths: list, current_index: int = 0):
-        """預載入圖片"""
-        # 優先載入當前圖片
-        if 0 <= current_index < len(image_paths):
-            self.image_loader.add_load_request(image_paths[current_index], priority=True)
-        
-        # 預載入前後圖片
-        preload_range = 3  # 前後各3張
-        for i in range(max(0, current_index - preload_range), 
-                       min(len(image_paths), current_index + preload_range + 1)):
-            if i != current_index:
-                self.image_loader.add_load_request(image_paths[i], priority=False)
-    
-    def add_background_task(self, task_id: str, func: Callable, *args, **kwargs):
-        """添加背景任務"""
-        self.background_processor.add_task(task_id, func, *args, **kwargs)
+    def add_background_task(self, task_id: str, func: Callable, *args, **kwargs) -> CancellationToken:
+        """添加背景任務（需要優先順序、相依任務或行程池時直接使用 background_processor.submit）"""
+        return self.background_processor.add_task(task_id, func, *args, **kwargs)
     
     def on_memory_warning(self, memory_percent: int):
-        """處理記憶體警告"""
+        """處理記憶體警告（快取預算已由記憶體管理器縮減，記憶體恢復後會再放大）"""
         print(f"記憶體使用警告: {memory_percent}%")
         self.stats['memory_cleanups'] += 1
-        
-        # 根據記憶體使用情況調整快取大小
-        if memory_percent > 90:
-            # 緊急情況：減少快取大小到50MB
-            self.image_cache.max_cache_size = 50 * 1024 * 1024
-            self.memory_manager.emergency_cleanup()
-        elif memory_percent > 80:
-            # 警告情況：減少快取大小到100MB
-            self.image_cache.max_cache_size = 100 * 1024 * 1024
-            self.memory_manager.gentle_cleanup()
-    
-    def on_image_loaded(self, image_path: str, pixmap: QPixmap):
-        """處理圖片載入完成"""
+    
+    def on_image_loaded(self, image_path: str):
+        """處理背景圖片載入完成"""
         self.stats['images_loaded'] += 1
     
     def on_background_task_completed(self, task_id: str, result: Any):
@@ -554,13 +1107,12 @@ class PerformanceOptimizer:
             return {'memory_mb': 0}
     
     def cleanup(self):
-        """清理資源"""
+        """清理資源（關閉程式時呼叫）：停止記憶體監控、圖片解碼執行緒與背景任務的執行緒池和行程池"""
         self.memory_manager.stop_monitoring()
-        self.image_loader.quit()
-        self.image_loader.wait()
-        self.background_processor.quit()
-        self.background_processor.wait()
+        self.image_loader.shutdown()
+        self.background_processor.shutdown()
         self.image_cache.clear()
+        self.frame_cache.clear()
         
     def clear_cache(self):
         """清除所有快取 - main.py介面使用"""
@@ -0,0 +1,126 @@
+"""
+空間索引模組 - 標註框的均勻網格空間索引
+
+以原圖座標將標註框登錄到固定大小的網格，點擊與懸停查詢只需檢查滑鼠所在格子內的標註，
+並維護 ID → 標註 的字典，使選取與查詢不必掃描整個標註清單。
+"""
+
+import itertools
+from typing import Dict, List, Optional, Iterable
+from PyQt5.QtCore import QRect, QPoint
+
+DEFAULT_CELL_SIZE = 128      # 網格邊長（原圖像素）
+MAX_CELLS_PER_ITEM = 256     # 覆蓋超過此格數的大型標註另外存放，避免登錄大量格子
+
+
+class SpatialGridIndex:
+    """標註框的均勻網格索引（標註為 {'id', 'rect': QRect, ...} 字典）"""
+
+    def __init__(self, cell_size: int = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}          # {(格子x, 格子y): set(標註ID)}
+        self.items = {}          # {標註ID: 標註}
+        self.item_cells = {}     # {標註ID: 登錄的格子清單}
+        self.large_items = set() # 覆蓋範圍過大的標註ID
+        self.order = {}          # {標註ID: 繪製順序}，重疊時後繪製者在上層
+        self._order_counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self.items
+
+    def _cells_for_rect(self, rect: QRect):
+        size = self.cell_size
+        return [(cell_x, cell_y)
+                for cell_y in range(rect.top() // size, rect.bottom() // size + 1)
+                for cell_x in range(rect.left() // size, rect.right() // size + 1)]
+
+    def _register(self, item: Dict):
+        rect = item['rect'].normalized()
+        size = self.cell_size
+        cell_count = ((rect.right() // size - rect.left() // size + 1) *
+                      (rect.bottom() // size - rect.top() // size + 1))
+        if cell_count > MAX_CELLS_PER_ITEM:
+            self.large_items.add(item['id'])
+            self.item_cells[item['id']] = []
+            return
+
+        cells = self._cells_for_rect(rect)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(item['id'])
+        self.item_cells[item['id']] = cells
+
+    def _unregister(self, item_id):
+        for cell in self.item_cells.pop(item_id, []):
+            members = self.cells.get(cell)
+            if members is not None:
+                members.discard(item_id)
+                if not members:
+                    del self.cells[cell]
+        self.large_items.discard(item_id)
+
+    def insert(self, item: Dict):
+        """加入標註（置於最上層）"""
+        if item['id'] in self.items:
+            self._unregister(item['id'])
+        self.items[item['id']] = item
+        self.order[item['id']] = next(self._order_counter)
+        self._register(item)
+
+    def update(self, item: Dict):
+        """標註框位置或大小改變後更新索引（保留繪製順序）"""
+        if item['id'] not in self.items:
+            self.insert(item)
+            return
+        self._unregister(item['id'])
+        self.items[item['id']] = item
+        self._register(item)
+
+    def remove(self, item_id) -> Optional[Dict]:
+        """移除標註，回傳被移除的標註"""
+        item = self.items.pop(item_id, None)
+        if item is not None:
+            self._unregister(item_id)
+            self.order.pop(item_id, None)
+        return item
+
+    def rebuild(self, items: Iterable[Dict]):
+        """依清單順序重建索引"""
+        self.clear()
+        for item in items:
+            self.insert(item)
+
+    def clear(self):
+        """清空索引"""
+        self.cells.clear()
+        self.items.clear()
+        self.item_cells.clear()
+        self.large_items.clear()
+        self.order.clear()
+        self._order_counter = itertools.count()
+
+    def get(self, item_id) -> Optional[Dict]:
+        """依ID取得標註"""
+        return self.items.get(item_id)
+
+    def query_point(self, point: QPoint):
+        """取得包含指定點的最上層標註ID，沒有則回傳None"""
+        size = self.cell_size
+        candidates = self.cells.get((point.x() // size, point.y() // size), ())
+        best_id, best_order = None, -1
+        for item_id in itertools.chain(candidates, self.large_items):
+            if self.order[item_id] > best_order and self.items[item_id]['rect'].contains(point):
+                best_id, best_order = item_id, self.order[item_id]
+        return best_id
+
+    def query_rect(self, rect: QRect) -> List:
+        """取得與指定區域相交的標註ID（依繪製順序）"""
+        rect = rect.normalized()
+        candidates = set(self.large_items)
+        for cell in self._cells_for_rect(rect):
+            candidates.update(self.cells.get(cell, ()))
+        hits = [item_id for item_id in candidates if self.items[item_id]['rect'].intersects(rect)]
+        hits.sort(key=self.order.__getitem__)
+        return hits
@@ -0,0 +1,6 @@
+"""pytest 設定：測試直接匯入專案根目錄的模組（不需要顯示器）"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,103 @@
+"""AnnotationStore / ImageAnnotations 測試"""
+
+import math
+
+import numpy as np
+from PyQt5.QtCore import QRect
+
+from annotation_store import Annotation, AnnotationStore, ImageAnnotations
+
+
+def make_items():
+    return [
+        Annotation(1, QRect(10, 20, 30, 40), 0),
+        Annotation(2, QRect(5, 6, 7, 8), 3, confidence=0.75, source='ai_prediction'),
+    ]
+
+
+def test_set_and_get_items_round_trip():
+    store = AnnotationStore()
+    store.set('a.jpg', make_items())
+
+    items = store.get_items('a.jpg')
+    assert [item.id for item in items] == [1, 2]
+    assert items[0].rect == QRect(10, 20, 30, 40)
+    assert items[0].confidence is None and 'confidence' not in items[0]
+    assert items[1].class_id == 3
+    assert math.isclose(items[1].confidence, 0.75, rel_tol=1e-6)
+    assert items[1].source == 'ai_prediction'
+    assert store.count('a.jpg') == 2 and store.total_count() == 2
+
+
+def test_get_items_returns_new_objects():
+    store = AnnotationStore()
+    store.set('a.jpg', make_items())
+
+    items = store.get_items('a.jpg')
+    items[0].rect.translate(100, 100)
+    assert store.get_items('a.jpg')[0].rect == QRect(10, 20, 30, 40)
+
+
+def test_set_empty_removes_image():
+    store = AnnotationStore()
+    store.set('a.jpg', make_items())
+    store.set('a.jpg', [])
+    assert 'a.jpg' not in store
+    assert store.get_items('a.jpg') == []
+    assert store.export_data('a.jpg') is None
+
+
+def test_extend_appends():
+    store = AnnotationStore()
+    store.extend('a.jpg', make_items()[:1])
+    store.extend('a.jpg', make_items()[1:])
+    assert [item.id for item in store.get_items('a.jpg')] == [1, 2]
+    assert store.class_counts() == {0: 1, 3: 1}
+
+
+def test_project_data_round_trip():
+    store = AnnotationStore()
+    store.set('a.jpg', make_items())
+    store.set('b.jpg', [Annotation(7, QRect(0, 0, 1, 1), 2)])
+
+    data = store.to_project_data()
+    assert data['a.jpg'][0] == {'id': 1, 'class': 0, 'x': 10, 'y': 20, 'width': 30, 'height': 40}
+    assert data['a.jpg'][1]['source'] == 'ai_prediction'
+
+    restored = AnnotationStore.from_project_data(data)
+    assert restored.to_project_data() == data
+    assert [item.id for item in restored.get_items('b.jpg')] == [7]
+
+
+def test_from_project_data_accepts_annotator_dicts():
+    data = {'a.jpg': [{'id': 3, 'rect': QRect(1, 2, 3, 4), 'class_id': 5, 'class_name': 'x'}]}
+    store = AnnotationStore.from_project_data(data)
+    item = store.get_items('a.jpg')[0]
+    assert (item.id, item.class_id, item.rect) == (3, 5, QRect(1, 2, 3, 4))
+
+
+def test_export_data_columns():
+    store = AnnotationStore()
+    store.set('a.jpg', make_items())
+
+    data = store.export_data('a.jpg')
+    assert data['path'] == 'a.jpg'
+    assert data['annotations'].dtype == np.float64
+    np.testing.assert_array_equal(data['annotations'], [[0, 10, 20, 30, 40], [3, 5, 6, 7, 8]])
+    np.testing.assert_array_equal(data['ids'], [1, 2])
+    assert np.isnan(data['confidence'][0])
+    np.testing.assert_array_equal(data['source'], [0, 1])
+
+
+def test_from_items_matches_from_annotations():
+    items = make_items()
+    fast = ImageAnnotations.from_annotations(items)
+    generic = ImageAnnotations.from_items([item.copy() for item in items])
+    dict_based = ImageAnnotations.from_items([{'id': item.id, 'rect': item.rect, 'class_id': item.class_id,
+                                               'confidence': item.confidence, 'source': item.source}
+                                              for item in items])
+    for other in (generic, dict_based):
+        np.testing.assert_array_equal(fast.ids, other.ids)
+        np.testing.assert_array_equal(fast.class_ids, other.class_ids)
+        np.testing.assert_array_equal(fast.boxes, other.boxes)
+        np.testing.assert_array_equal(fast.source, other.source)
@@ -0,0 +1,155 @@
+"""增量匯出（清單略過／重寫／孤立檔刪除）與欄式資料表測試"""
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from advanced_exporter import MANIFEST_FILENAME, AdvancedExporter
+
+
+@pytest.fixture
+def images(tmp_path):
+    """三張 100x50 的圖片"""
+    paths = []
+    for name in ('a', 'b', 'c'):
+        path = tmp_path / 'images' / f'{name}.jpg'
+        path.parent.mkdir(exist_ok=True)
+        Image.new('RGB', (100, 50)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def annotations(class_id=0, x=10):
+    return [{'class': class_id, 'bbox': [x, 10, 20, 20]}]
+
+
+def export(exporter, paths_to_annotations, output_dir, **kwargs):
+    images_data = [{'path': path, 'annotations': items} for path, items in paths_to_annotations.items()]
+    return exporter.incremental_export(images_data, str(output_dir), 'YOLO', **kwargs)
+
+
+def label(output_dir, image_path):
+    return output_dir / (os.path.splitext(os.path.basename(image_path))[0] + '.txt')
+
+
+def test_second_export_skips_unchanged(tmp_path, images):
+    exporter = AdvancedExporter()
+    output_dir = tmp_path / 'out'
+    data = {path: annotations() for path in images}
+
+    stats = export(exporter, data, output_dir)
+    assert (stats['written'], stats['skipped']) == (3, 0)
+    assert (output_dir / MANIFEST_FILENAME).exists()
+    assert label(output_dir, images[0]).read_text().split()[0] == '0'
+
+    stats = export(exporter, data, output_dir)
+    assert (stats['written'], stats['skipped'], stats['deleted']) == (0, 3, 0)
+
+
+def test_changed_annotations_rewritten(tmp_path, images):
+    exporter = AdvancedExporter()
+    output_dir = tmp_path / 'out'
+    data = {path: annotations() for path in images}
+    export(exporter, data, output_dir)
+
+    data[images[1]] = annotations(class_id=2)
+    stats = export(exporter, data, output_dir)
+    assert (stats['written'], stats['skipped']) == (1, 2)
+    assert label(output_dir, images[1]).read_text().split()[0] == '2'
+
+
+def test_deleted_label_file_rewritten(tmp_path, images):
+    exporter = AdvancedExporter()
+    output_dir = tmp_path / 'out'
+    data = {path: annotations() for path in images}
+    export(exporter, data, output_dir)
+
+    label(output_dir, images[0]).unlink()
+    stats = export(exporter, data, output_dir)
+    assert stats['written'] == 1 and label(output_dir, images[0]).exists()
+
+
+def test_class_table_change_invalidates_all(tmp_path, images):
+    exporter = AdvancedExporter()
+    output_dir = tmp_path / 'out'
+    data = {path: annotations() for path in images}
+    export(exporter, data, output_dir)
+
+    exporter.vehicle_classes[0] = {'zh': '轎車', 'en': 'sedan'}
+    stats = export(exporter, data, output_dir)
+    assert (stats['written'], stats['skipped']) == (3, 0)
+
+
+def test_orphans_deleted(tmp_path, images):
+    exporter = AdvancedExporter()
+    output_dir = tmp_path / 'out'
+    export(exporter, {path: annotations() for path in images}, output_dir)
+
+    # a：圖片已刪除；b：在匯出範圍內但已無標註；c：範圍外，保留
+    os.remove(images[0])
+    stats = export(exporter, {}, output_dir, scope_paths=[images[1]])
+
+    assert stats['deleted'] == 2
+    assert not label(output_dir, images[0]).exists()
+    assert not label(output_dir, images[1]).exists()
+    assert label(output_dir, images[2]).exists()
+    assert list(exporter.load_export_manifest(str(output_dir))['images']) == [images[2]]
+
+
+def test_failed_export_keeps_previous_label(tmp_path, images, monkeypatch):
+    exporter = AdvancedExporter()
+    output_dir = tmp_path / 'out'
+    data = {path: annotations() for path in images}
+    export(exporter, data, output_dir)
+
+    data[images[0]] = annotations(class_id=4)
+    monkeypatch.setattr(exporter, 'export_yolo', lambda *args, **kwargs: False)
+    stats = export(exporter, data, output_dir, scope_paths=images)
+
+    assert (stats['failed'], stats['deleted']) == (1, 0)
+    assert label(output_dir, images[0]).read_text().split()[0] == '0'
+    entry = exporter.load_export_manifest(str(output_dir))['images'][images[0]]
+    assert entry['fingerprint'] is None  # 下次匯出會重試
+
+    monkeypatch.undo()
+    stats = export(exporter, data, output_dir)
+    assert stats['written'] == 1
+    assert label(output_dir, images[0]).read_text().split()[0] == '4'
+
+
+def test_cancelled_export_resumes(tmp_path, images):
+    exporter = AdvancedExporter()
+    output_dir = tmp_path / 'out'
+    data = {path: annotations() for path in images}
+    progress = []
+
+    stats = export(exporter, data, output_dir, progress_callback=lambda done, total: progress.append(done),
+                   cancel_check=lambda: len(progress) >= 2)
+    assert stats['cancelled'] and stats['written'] == 2
+
+    stats = export(exporter, data, output_dir)
+    assert (stats['written'], stats['skipped']) == (1, 2)
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError):
+        AdvancedExporter().incremental_export([], 'unused', 'COCO')
+
+
+def test_columnar_round_trip(tmp_path, images):
+    exporter = AdvancedExporter()
+    images_data = [
+        {'path': images[0], 'annotations': annotations() + annotations(class_id=3, x=50)},
+        {'path': images[1], 'annotations': []},
+    ]
+    assert exporter.export_columnar(images_data, str(tmp_path))
+
+    annotation_table, image_table = AdvancedExporter.load_columnar(str(tmp_path))
+    np.testing.assert_array_equal(annotation_table['image_id'], [0, 0])
+    np.testing.assert_array_equal(annotation_table['class_id'], [0, 3])
+    np.testing.assert_array_equal(annotation_table['x'], [10, 50])
+    np.testing.assert_array_equal(image_table['annotation_count'], [2, 0])
+    np.testing.assert_array_equal(image_table['width'], [100, 100])
+    assert list(image_table['file_name']) == ['a.jpg', 'b.jpg']
@@ -0,0 +1,122 @@
+"""RawFrameCache（記憶體映射畫面快取）測試"""
+
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from frame_cache import RawFrameCache
+
+
+def save_image(path, size=(40, 30), color=(10, 20, 30), mode='RGB'):
+    Image.new(mode, size, color + ((128,) if mode == 'RGBA' else ())).save(path)
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RawFrameCache(str(tmp_path / 'frames'))
+
+
+def test_load_decodes_then_maps(tmp_path, cache):
+    image_path = save_image(tmp_path / 'a.png')
+
+    frame = cache.load(image_path)
+    assert frame.shape == (30, 40, 4) and frame.dtype == np.uint8
+    np.testing.assert_array_equal(frame[0, 0, :3], [30, 20, 10])  # BGRX
+    assert cache.get_stats()['misses'] == 1 and len(cache.entries) == 1
+
+    again = cache.load(image_path)
+    assert isinstance(again, np.memmap) and not again.flags['WRITEABLE']
+    assert cache.get_stats()['hits'] == 1
+
+
+def test_load_bgr_is_read_only_view(tmp_path, cache):
+    image_path = save_image(tmp_path / 'a.png')
+    bgr = cache.load_bgr(image_path)
+
+    assert bgr.shape == (30, 40, 3)
+    assert not bgr.flags['WRITEABLE'] and not bgr.flags['C_CONTIGUOUS']
+    writable = bgr.copy()
+    writable[0, 0] = 0
+    assert writable.flags['C_CONTIGUOUS']
+
+
+def test_put_get_round_trip(tmp_path, cache):
+    image_path = save_image(tmp_path / 'a.png')
+    pixels = np.arange(30 * 40 * 4, dtype=np.uint8).reshape(30, 40, 4)
+
+    mapped = cache.put(image_path, pixels)
+    np.testing.assert_array_equal(mapped, pixels)
+    np.testing.assert_array_equal(cache.get(image_path), pixels)
+    assert not [name for name in os.listdir(cache.cache_dir) if name.endswith('.tmp')]
+
+
+def test_get_missing(tmp_path, cache):
+    assert cache.get(str(tmp_path / 'missing.png')) is None
+    image_path = save_image(tmp_path / 'a.png')
+    assert cache.get(image_path) is None
+    assert cache.get_stats()['misses'] == 1
+
+
+def test_modified_image_gets_new_frame(tmp_path, cache):
+    image_path = save_image(tmp_path / 'a.png')
+    old_name = cache.frame_name(image_path)
+    cache.load(image_path)
+
+    save_image(tmp_path / 'a.png', size=(20, 10))
+    os.utime(image_path, ns=(0, os.stat(image_path).st_mtime_ns + 1_000_000))
+    assert cache.frame_name(image_path) != old_name
+    assert cache.load(image_path).shape == (10, 20, 4)
+
+
+def test_transparent_image_not_cached(tmp_path, cache):
+    image_path = save_image(tmp_path / 'a.png', mode='RGBA')
+    assert cache.load(image_path) is None
+    assert not cache.entries
+
+
+def test_evicts_least_recently_used(tmp_path):
+    frame_bytes = 30 * 40 * 4
+    cache = RawFrameCache(str(tmp_path / 'frames'), max_disk_size=int(frame_bytes * 2.5))
+    paths = [save_image(tmp_path / f'{name}.png') for name in 'abc']
+
+    cache.load(paths[0])
+    cache.load(paths[1])
+    cache.get(paths[0])  # a 變為最近使用
+    cache.load(paths[2])
+
+    assert cache.get(paths[1]) is None
+    assert cache.get(paths[0]) is not None and cache.get(paths[2]) is not None
+    assert cache.disk_size <= cache.max_disk_size
+    assert len(os.listdir(cache.cache_dir)) == 2
+
+
+def test_oversized_frame_not_written(tmp_path):
+    cache = RawFrameCache(str(tmp_path / 'frames'), max_disk_size=100)
+    image_path = save_image(tmp_path / 'a.png')
+    frame = cache.load(image_path)
+
+    assert frame is not None and not isinstance(frame, np.memmap)  # 回傳解碼的記憶體陣列
+    assert not os.listdir(cache.cache_dir)
+
+
+def test_scan_rebuilds_and_removes_temp_files(tmp_path, cache):
+    paths = [save_image(tmp_path / f'{name}.png') for name in 'ab']
+    for path in paths:
+        cache.load(path)
+    (tmp_path / 'frames' / 'partial.npy.123.tmp').write_bytes(b'x')
+
+    reopened = RawFrameCache(cache.cache_dir)
+    assert set(reopened.entries) == set(cache.entries)
+    assert reopened.disk_size == cache.disk_size
+    assert not (tmp_path / 'frames' / 'partial.npy.123.tmp').exists()
+    assert reopened.get(paths[0]) is not None
+
+
+def test_clear(tmp_path, cache):
+    cache.load(save_image(tmp_path / 'a.png'))
+    cache.clear()
+    assert not cache.entries and cache.disk_size == 0
+    assert not os.listdir(cache.cache_dir)
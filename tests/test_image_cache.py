@@ -0,0 +1,123 @@
+"""ImageCache（LRU / GDSF）測試"""
+
+import numpy as np
+import pytest
+
+from performance_optimizer import ImageCache
+
+
+def block(size):
+    return np.zeros(size, dtype=np.uint8)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ImageCache(max_cache_size=300)
+    for key in 'abc':
+        cache.put(key, block(100))
+    cache.get('a')  # a 變為最近使用
+    cache.put('d', block(100))
+
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.current_size == 300
+    assert cache.evictions == 1
+
+
+def test_hit_ratio_accounting():
+    cache = ImageCache(max_cache_size=1000)
+    cache.put('a', block(10))
+    cache.get('a')
+    cache.get('a')
+    cache.get('missing')
+
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+    assert stats['hit_ratio'] == pytest.approx(2 / 3)
+
+
+def test_size_measured_from_array_and_hint():
+    cache = ImageCache(max_cache_size=1000)
+    cache.put('array', block(64), size=1)   # 可計算大小時忽略提示
+    cache.put('other', object(), size=32)  # 無法計算時使用提示
+    assert cache.current_size == 96
+
+    cache.put('array', block(16))  # 取代舊項目
+    assert cache.current_size == 48
+
+
+def test_oversized_item_not_cached():
+    cache = ImageCache(max_cache_size=100)
+    cache.put('a', block(50))
+    cache.put('huge', block(101))
+    assert 'huge' not in cache and 'a' in cache
+
+
+def test_resize_and_shrink_evict():
+    cache = ImageCache(max_cache_size=1000)
+    for key in 'abcd':
+        cache.put(key, block(100))
+    assert cache.resize(250) == 2
+    assert list(cache.cache) == ['c', 'd']
+    assert cache.shrink(0.5) == 1
+    assert list(cache.cache) == ['d']
+
+
+def test_remove_prefix():
+    cache = ImageCache(max_cache_size=1000)
+    cache.put('img1:0', block(10))
+    cache.put('img1:1', block(10))
+    cache.put('img2:0', block(10))
+    assert cache.remove_prefix('img1:') == 2
+    assert list(cache.cache) == ['img2:0'] and cache.current_size == 10
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        ImageCache(policy='fifo')
+
+
+def test_gdsf_keeps_small_items_over_large():
+    cache = ImageCache(max_cache_size=1000, policy='gdsf')
+    for key in 'abcd':
+        cache.put(key, block(100))
+    cache.put('big', block(500))
+    cache.put('e', block(100))
+    cache.put('f', block(100))  # 大圖的 次數 / 大小 最低，先被淘汰
+
+    assert 'big' not in cache
+    assert all(key in cache for key in 'abcdef')
+
+
+def test_gdsf_frequency_protects_item():
+    cache = ImageCache(max_cache_size=300, policy='gdsf')
+    for key in 'abc':
+        cache.put(key, block(100))
+    for _ in range(5):
+        cache.get('a')
+    cache.put('d', block(100))
+    cache.put('e', block(100))
+
+    assert 'a' in cache
+    assert cache.inflation > 0
+
+
+def test_gdsf_cost_function():
+    cache = ImageCache(max_cache_size=200, policy='gdsf',
+                       cost_function=lambda key, size: 10.0 if key == 'costly' else 1.0)
+    cache.put('costly', block(100))
+    cache.put('cheap', block(100))
+    cache.put('new', block(100))
+    assert 'costly' in cache and 'cheap' not in cache
+
+
+def test_gdsf_heap_stays_bounded_with_hits_only():
+    cache = ImageCache(max_cache_size=10_000, policy='gdsf')
+    for key in range(10):
+        cache.put(str(key), block(100))
+    for i in range(100_000):
+        cache.get(str(i % 10))
+
+    assert len(cache.heap) <= 4 * len(cache.cache) + 64
+    # 壓縮後仍能依優先值淘汰
+    assert cache.resize(500) == 5
+    assert cache.current_size == 500
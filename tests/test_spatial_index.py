@@ -0,0 +1,87 @@
+"""SpatialGridIndex 測試"""
+
+from PyQt5.QtCore import QPoint, QRect
+
+from spatial_index import MAX_CELLS_PER_ITEM, SpatialGridIndex
+
+
+def item(item_id, x, y, w, h):
+    return {'id': item_id, 'rect': QRect(x, y, w, h)}
+
+
+def test_insert_and_query_point():
+    index = SpatialGridIndex(cell_size=100)
+    index.insert(item(1, 10, 10, 50, 50))
+    index.insert(item(2, 250, 250, 30, 30))
+
+    assert len(index) == 2 and 1 in index
+    assert index.query_point(QPoint(20, 20)) == 1
+    assert index.query_point(QPoint(260, 260)) == 2
+    assert index.query_point(QPoint(150, 150)) is None
+
+
+def test_query_point_prefers_topmost():
+    index = SpatialGridIndex(cell_size=100)
+    index.insert(item(1, 0, 0, 100, 100))
+    index.insert(item(2, 50, 50, 100, 100))
+    assert index.query_point(QPoint(60, 60)) == 2
+
+    # 重新插入會移到最上層；update 保留原本的繪製順序
+    index.insert(item(1, 0, 0, 100, 100))
+    assert index.query_point(QPoint(60, 60)) == 1
+    index.update(item(2, 40, 40, 100, 100))
+    assert index.query_point(QPoint(60, 60)) == 1
+
+
+def test_update_moves_item_between_cells():
+    index = SpatialGridIndex(cell_size=100)
+    index.insert(item(1, 10, 10, 20, 20))
+    index.update(item(1, 510, 510, 20, 20))
+
+    assert index.query_point(QPoint(15, 15)) is None
+    assert index.query_point(QPoint(515, 515)) == 1
+    assert (0, 0) not in index.cells  # 舊格子的登錄已移除
+    assert index.item_cells[1] == [(5, 5)]
+
+
+def test_item_spanning_cells_found_from_each_cell():
+    index = SpatialGridIndex(cell_size=100)
+    index.insert(item(1, 50, 50, 200, 200))
+    for point in (QPoint(60, 60), QPoint(160, 160), QPoint(240, 240)):
+        assert index.query_point(point) == 1
+    assert len(index.item_cells[1]) == 9
+
+
+def test_large_items_skip_grid_registration():
+    index = SpatialGridIndex(cell_size=10)
+    side = 10 * (int(MAX_CELLS_PER_ITEM ** 0.5) + 2)
+    index.insert(item(1, 0, 0, side, side))
+
+    assert 1 in index.large_items and not index.cells
+    assert index.query_point(QPoint(side - 1, side - 1)) == 1
+    assert index.query_rect(QRect(5, 5, 2, 2)) == [1]
+
+
+def test_query_rect_in_draw_order():
+    index = SpatialGridIndex(cell_size=100)
+    index.insert(item(3, 0, 0, 10, 10))
+    index.insert(item(1, 20, 20, 10, 10))
+    index.insert(item(2, 500, 500, 10, 10))
+
+    assert index.query_rect(QRect(0, 0, 50, 50)) == [3, 1]
+    assert index.query_rect(QRect(50, 50, -50, -50)) == [3, 1]  # 反向選取框
+    assert index.query_rect(QRect(200, 200, 10, 10)) == []
+
+
+def test_remove_and_rebuild():
+    index = SpatialGridIndex(cell_size=100)
+    index.rebuild([item(1, 0, 0, 10, 10), item(2, 5, 5, 10, 10)])
+    assert index.query_point(QPoint(6, 6)) == 2
+
+    removed = index.remove(2)
+    assert removed['id'] == 2 and 2 not in index
+    assert index.remove(2) is None
+    assert index.query_point(QPoint(6, 6)) == 1
+
+    index.clear()
+    assert len(index) == 0 and not index.cells and index.query_point(QPoint(6, 6)) is None
@@ -0,0 +1,299 @@
+"""
+縮圖快取模組 - 以資料夾為單位的持久化縮圖封裝檔
+
+每個資料夾的縮圖以 JPEG 串接存放在 <快取目錄>/<資料夾路徑雜湊>.bin，
+索引（檔名 → 修改時間、檔案大小、位移、長度、縮圖尺寸）存為同名 .json。
+原圖的修改時間或檔案大小改變時視為過期並重新產生。
+載入資料夾後於背景依序產生缺少的縮圖，重新開啟同一資料夾時直接由封裝檔讀取，不需再解碼原圖。
+"""
+
+import io
+import os
+import json
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Iterable, Tuple
+
+from PIL import Image
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from performance_optimizer import ImageCache
+
+THUMBNAIL_SIZE = (256, 256)                   # 縮圖最大尺寸（保持長寬比）
+THUMBNAIL_QUALITY = 85                        # 縮圖 JPEG 品質
+THUMBNAIL_MEMORY_CACHE_SIZE = 32 * 1024 * 1024  # 已解碼縮圖的記憶體快取上限 32MB
+INDEX_SAVE_INTERVAL = 200                     # 背景產生時每產生多少張寫入一次索引
+PACK_VERSION = 1
+
+
+class FolderThumbnailPack:
+    """單一資料夾的縮圖封裝檔（可由背景執行緒寫入、GUI 執行緒讀取）"""
+
+    def __init__(self, pack_dir: str, folder: str):
+        self.folder = folder
+        key = hashlib.sha1(os.path.normcase(folder).encode('utf-8')).hexdigest()[:20]
+        self.data_path = os.path.join(pack_dir, f'{key}.bin')
+        self.index_path = os.path.join(pack_dir, f'{key}.json')
+        self.entries: Dict[str, List[int]] = {}  # {檔名: [mtime_ns, 檔案大小, 位移, 長度, 寬, 高]}
+        self.garbage = 0                         # 過期縮圖佔用的位元組數
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load_index()
+
+    def load_index(self):
+        """讀取索引（封裝檔不完整的項目捨棄）"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != PACK_VERSION:
+                return
+            data_size = os.path.getsize(self.data_path)
+            self.entries = {name: entry for name, entry in data.get('entries', {}).items()
+                            if entry[2] + entry[3] <= data_size}
+            self.garbage = data.get('garbage', 0)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"讀取縮圖索引錯誤: {e}")
+            self.entries = {}
+
+    def save_index(self):
+        """寫入索引（先寫暫存檔再取代，中斷時不會留下損壞的索引）"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {'version': PACK_VERSION, 'folder': self.folder,
+                    'garbage': self.garbage, 'entries': dict(self.entries)}
+            self.dirty = False
+        try:
+            temp_path = self.index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            print(f"儲存縮圖索引錯誤: {e}")
+
+    @staticmethod
+    def file_signature(image_path: str) -> Optional[Tuple[int, int]]:
+        """原圖的 (修改時間 ns, 檔案大小)，檔案不存在時回傳 None"""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def lookup(self, image_path: str, signature: Optional[Tuple[int, int]] = None) -> Optional[List[int]]:
+        """取得仍有效的索引項目（原圖已修改時回傳 None）"""
+        entry = self.entries.get(os.path.basename(image_path))
+        if entry is None:
+            return None
+        if signature is None:
+            signature = self.file_signature(image_path)
+        if signature is None or (entry[0], entry[1]) != signature:
+            return None
+        return entry
+
+    def read(self, image_path: str) -> Optional[bytes]:
+        """讀取縮圖的 JPEG 資料"""
+        entry = self.lookup(image_path)
+        if entry is None:
+            return None
+        try:
+            with open(self.data_path, 'rb') as f:
+                f.seek(entry[2])
+                return f.read(entry[3])
+        except OSError:
+            return None
+
+    def write(self, image_path: str, signature: Tuple[int, int], data: bytes, width: int, height: int):
+        """附加縮圖到封裝檔並更新索引（索引由 save_index 寫入磁碟）"""
+        name = os.path.basename(image_path)
+        with self.lock:
+            with open(self.data_path, 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+            old = self.entries.get(name)
+            if old is not None:
+                self.garbage += old[3]
+            self.entries[name] = [signature[0], signature[1], offset, len(data), width, height]
+            self.dirty = True
+
+    def compact(self):
+        """過期縮圖超過封裝檔一半時重寫封裝檔"""
+        with self.lock:
+            live = sum(entry[3] for entry in self.entries.values())
+            if self.garbage <= live:
+                return
+            temp_path = self.data_path + '.tmp'
+            entries = {}
+            with open(self.data_path, 'rb') as source, open(temp_path, 'wb') as target:
+                for name, entry in self.entries.items():
+                    source.seek(entry[2])
+                    entries[name] = entry[:2] + [target.tell(), entry[3]] + entry[4:]
+                    target.write(source.read(entry[3]))
+            os.replace(temp_path, self.data_path)
+            self.entries = entries
+            self.garbage = 0
+            self.dirty = True
+        self.save_index()
+
+
+class ThumbnailCache(QObject):
+    """
+    持久化縮圖快取
+
+    get() 由封裝檔讀取（經記憶體快取）；generate() 以背景執行緒依序產生資料夾中缺少或過期的縮圖，
+    prioritize() 讓目前可見的圖片先產生。
+    """
+
+    thumbnail_ready = pyqtSignal(str)          # 背景產生完成的圖片路徑
+    generation_finished = pyqtSignal(int, int)  # 新產生數量, 本次要求總數
+
+    def __init__(self, cache_dir: str, thumbnail_size: Tuple[int, int] = THUMBNAIL_SIZE):
+        super().__init__()
+        self.cache_dir = cache_dir
+        self.thumbnail_size = thumbnail_size
+        os.makedirs(cache_dir, exist_ok=True)
+        self.packs: Dict[str, FolderThumbnailPack] = {}  # {資料夾: 封裝檔}
+        self.packs_lock = threading.Lock()
+        self.memory_cache = ImageCache(max_cache_size=THUMBNAIL_MEMORY_CACHE_SIZE)
+
+        # 背景產生佇列（單一執行緒依序處理，避免與圖片瀏覽搶奪 CPU）
+        self.queue = deque()           # generate 要求的圖片（依清單順序）
+        self.priority_queue = deque()  # 優先產生的圖片（畫面上可見的縮圖），先於 queue 處理
+        self.done = set()              # 本次要求中已處理的圖片（同一路徑可能同時在兩個佇列中，取出時略過）
+        self.queue_lock = threading.Lock()
+        self.requested = 0
+        self.running = False
+        self.stopped = False
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+
+    def pack_for(self, image_path: str) -> FolderThumbnailPack:
+        folder = os.path.dirname(os.path.abspath(image_path))
+        with self.packs_lock:
+            pack = self.packs.get(folder)
+            if pack is None:
+                pack = FolderThumbnailPack(self.cache_dir, folder)
+                self.packs[folder] = pack
+            return pack
+
+    def has(self, image_path: str) -> bool:
+        """是否已有有效的縮圖"""
+        return self.pack_for(image_path).lookup(image_path) is not None
+
+    def get(self, image_path: str) -> Optional[QImage]:
+        """取得縮圖（沒有或已過期時回傳 None，可搭配 prioritize 要求產生）"""
+        pack = self.pack_for(image_path)
+        entry = pack.lookup(image_path)
+        if entry is None:
+            return None
+        key = f'{image_path}:{entry[2]}'
+        image = self.memory_cache.get(key)
+        if image is not None:
+            return image
+
+        data = pack.read(image_path)
+        if data is None:
+            return None
+        image = QImage.fromData(data, 'JPG')
+        if image.isNull():
+            return None
+        self.memory_cache.put(key, image)
+        return image
+
+    @staticmethod
+    def make_thumbnail(image_path: str, thumbnail_size: Tuple[int, int]) -> Tuple[bytes, int, int]:
+        """產生縮圖 JPEG（JPEG 以 DCT 縮小解碼，不需解碼完整解析度）"""
+        with Image.open(image_path) as img:
+            img.draft('RGB', thumbnail_size)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.thumbnail(thumbnail_size, Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            img.save(buffer, 'JPEG', quality=THUMBNAIL_QUALITY)
+            return buffer.getvalue(), img.width, img.height
+
+    def generate(self, image_paths: Iterable[str]):
+        """以背景執行緒產生缺少的縮圖（取代先前尚未處理的要求，例如切換資料夾時）"""
+        paths = list(image_paths)
+        with self.queue_lock:
+            self.queue = deque(paths)
+            self.priority_queue = deque()
+            self.done = set()
+            self.requested = len(paths)
+            self._start_locked()
+
+    def prioritize(self, image_paths: Iterable[str]):
+        """讓指定圖片（例如畫面上可見的縮圖）優先產生，取代先前的優先要求（不從 queue 中間刪除）"""
+        with self.queue_lock:
+            self.priority_queue = deque(path for path in image_paths if path not in self.done)
+            self._start_locked()
+
+    def _start_locked(self):
+        if (self.priority_queue or self.queue) and not self.running and not self.stopped:
+            self.running = True
+            self.executor.submit(self._run)
+
+    def _next_path(self) -> Optional[str]:
+        with self.queue_lock:
+            while not self.stopped and (self.priority_queue or self.queue):
+                path = (self.priority_queue or self.queue).popleft()
+                if path not in self.done:
+                    self.done.add(path)
+                    return path
+            self.running = False
+            return None
+
+    def _run(self):
+        """背景產生縮圖（已存在且未過期者略過）"""
+        generated = 0
+        while True:
+            image_path = self._next_path()
+            if image_path is None:
+                break
+            pack = self.pack_for(image_path)
+            signature = pack.file_signature(image_path)
+            if signature is None or pack.lookup(image_path, signature) is not None:
+                continue
+            try:
+                data, width, height = self.make_thumbnail(image_path, self.thumbnail_size)
+                pack.write(image_path, signature, data, width, height)
+            except Exception as e:
+                print(f"產生縮圖錯誤: {image_path}, {e}")
+                continue
+            generated += 1
+            self.thumbnail_ready.emit(image_path)
+            if generated % INDEX_SAVE_INTERVAL == 0:
+                self.flush()
+        self.flush()
+        self.generation_finished.emit(generated, self.requested)
+
+    def flush(self):
+        """將各資料夾有變動的索引寫入磁碟"""
+        with self.packs_lock:
+            packs = list(self.packs.values())
+        for pack in packs:
+            pack.save_index()
+
+    def compact(self):
+        """重寫過期資料過多的封裝檔"""
+        with self.packs_lock:
+            packs = list(self.packs.values())
+        for pack in packs:
+            try:
+                pack.compact()
+            except Exception as e:
+                print(f"整理縮圖快取錯誤: {e}")
+
+    def shutdown(self):
+        """停止背景產生並寫入索引（關閉程式時呼叫）"""
+        with self.queue_lock:
+            self.stopped = True
+            self.queue.clear()
+            self.priority_queue.clear()
+        self.executor.shutdown(wait=True)
+        self.compact()
+        self.flush()
@@ -342,6 +342,11 @@ class VehicleClassManager:
         """取得車種類別"""
         return self.classes.get(class_id)
     
+    def get_class_name(self, class_id: int) -> Optional[str]:
+        """取得車種名稱（不存在時回傳 None）"""
+        cls = self.classes.get(class_id)
+        return cls.name if cls else None
+    
     def get_all_classes(self, enabled_only: bool = False) -> List[VehicleClass]:
         """取得所有車種類別"""
         classes = list(self.classes.values())